@@ -1,14 +1,222 @@
+import time
+
+STARTUP_ORIGIN = time.perf_counter()  # начало импорта модуля, для --profile-startup
+
 import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox, filedialog
+from tkinter import ttk, messagebox
 import threading
-import time
+import queue
+import os
+from collections import deque, OrderedDict
 import random
-import json
-import numpy as np
-import webbrowser
-from datetime import datetime, timedelta
+from datetime import datetime
+from functools import lru_cache
 import re
-import math
+import heapq
+import bisect
+import struct
+import zlib
+import sys
+from array import array
+# Тяжелые и редко нужные модули (asyncio, concurrent.futures, sqlite3,
+# numpy) импортируются при первом использовании
+
+class StartupProfile:
+    """Замеры этапов запуска приложения"""
+    def __init__(self, origin):
+        self.origin = origin
+        self.marks = []
+
+    def mark(self, name):
+        """Отметка завершения этапа"""
+        self.marks.append((name, time.perf_counter()))
+
+    def elapsed(self, name):
+        """Время от начала импорта до этапа, сек"""
+        for mark, moment in self.marks:
+            if mark == name:
+                return moment - self.origin
+        return None
+
+    def report(self):
+        """Текстовый отчет по этапам"""
+        lines = ["⏱ Профиль запуска:"]
+        previous = self.origin
+        for name, moment in self.marks:
+            lines.append(f"  {name:<28} {(moment - self.origin) * 1000:8.1f} мс "
+                         f"(+{(moment - previous) * 1000:.1f})")
+            previous = moment
+        lines.append(f"  Загружено модулей: {len(sys.modules)}")
+        return "\n".join(lines)
+
+STARTUP = StartupProfile(STARTUP_ORIGIN)
+
+@lru_cache(maxsize=256)
+def color_ramp(from_color, to_color, steps=8):
+    """Предрасчитанная последовательность цветов перехода"""
+    start_rgb = tuple(int(from_color[i:i+2], 16) for i in (1, 3, 5))
+    end_rgb = tuple(int(to_color[i:i+2], 16) for i in (1, 3, 5))
+    ramp = []
+    for step in range(1, steps + 1):
+        ratio = step / steps
+        ramp.append('#{:02x}{:02x}{:02x}'.format(*(
+            int(start_rgb[i] + (end_rgb[i] - start_rgb[i]) * ratio) for i in range(3))))
+    return tuple(ramp)
+
+class AnimationClock:
+    """Общий таймер анимаций: один отложенный вызов Tk на все кнопки окна
+
+    У каждого виджета не больше одной анимации: новая заменяет прежнюю,
+    поэтому число ожидающих вызовов не зависит от скорости курсора.
+    """
+    def __init__(self, root, interval=20):
+        self.root = root
+        self.interval = interval
+        self._tweens = {}
+        self._after_id = None
+
+    @classmethod
+    def for_widget(cls, widget):
+        """Таймер окна, которому принадлежит виджет"""
+        root = widget._root()
+        clock = getattr(root, '_animation_clock', None)
+        if clock is None:
+            clock = root._animation_clock = cls(root)
+        return clock
+
+    @property
+    def pending(self):
+        """Число запланированных вызовов Tk (0 или 1)"""
+        return 0 if self._after_id is None else 1
+
+    def start(self, widget, frames, apply):
+        """Запуск анимации виджета, прежняя анимация отменяется"""
+        self._tweens[widget] = (iter(frames), apply)
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval, self._tick)
+
+    def cancel(self, widget):
+        """Отмена анимации виджета"""
+        self._tweens.pop(widget, None)
+
+    def _tick(self):
+        """Один кадр всех активных анимаций"""
+        self._after_id = None
+        for widget, (frames, apply) in list(self._tweens.items()):
+            frame = next(frames, None)
+            if frame is None:
+                del self._tweens[widget]
+                continue
+            try:
+                apply(frame)
+            except tk.TclError:
+                # Виджет уничтожен
+                del self._tweens[widget]
+        if self._tweens:
+            self._after_id = self.root.after(self.interval, self._tick)
+
+class UIDispatcher:
+    """Канал обновлений UI из фоновых потоков
+
+    Потоки только кладут сообщения в очередь (post) или заменяют последнее
+    значение по ключу (post_latest), а Tk вызывает их из главного потока
+    раз в кадр в пределах frame_budget. Обновления с одним ключом
+    схлопываются: выполняется только последнее. Пока сообщения идут,
+    очередь опрашивается каждый кадр, в простое опрос реже - до idle_interval.
+    """
+    def __init__(self, root, interval=16, idle_interval=100, frame_budget=0.008):
+        self.root = root
+        self.interval = interval
+        self.idle_interval = idle_interval
+        self.frame_budget = frame_budget
+        self._queue = queue.SimpleQueue()
+        self._latest = {}
+        self._latest_lock = threading.Lock()
+        self._delay = idle_interval
+        self._after_id = None
+        self._closed = False
+        self.posted = 0
+        self.coalesced = 0
+        self.drained = 0
+        self.max_batch = 0
+
+    def post(self, callback, *args):
+        """Вызвать callback(*args) в потоке Tk; порядок сообщений сохраняется"""
+        self._queue.put((callback, args))
+        self.posted += 1
+
+    def post_latest(self, key, callback, *args):
+        """Как post, но из нескольких сообщений с ключом key выполнится последнее"""
+        with self._latest_lock:
+            queued = key in self._latest
+            self._latest[key] = (callback, args)
+        if queued:
+            self.coalesced += 1
+        else:
+            self._queue.put((self._run_latest, (key,)))
+            self.posted += 1
+
+    def start(self):
+        """Запуск опроса очереди (из потока Tk)"""
+        self._closed = False
+        if self._after_id is None:
+            self._after_id = self.root.after(self._delay, self._drain)
+
+    def wake(self):
+        """Ожидаются сообщения: перейти на опрос каждый кадр (из потока Tk)"""
+        self._delay = self.interval
+        if self._after_id is not None and not self._closed:
+            self.root.after_cancel(self._after_id)
+            self._after_id = self.root.after(self.interval, self._drain)
+
+    def close(self):
+        """Остановка опроса; неразобранные сообщения отбрасываются"""
+        self._closed = True
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def stats(self):
+        return {
+            'pending': self._queue.qsize(),
+            'posted': self.posted,
+            'coalesced': self.coalesced,
+            'drained': self.drained,
+            'max_batch': self.max_batch,
+            'poll_ms': self._delay
+        }
+
+    def _run_latest(self, key):
+        with self._latest_lock:
+            callback, args = self._latest.pop(key)
+        callback(*args)
+
+    def _drain(self):
+        """Кадр: выполнение накопившихся сообщений в пределах бюджета"""
+        self._after_id = None
+        if self._closed:
+            return
+        started = time.perf_counter()
+        count = 0
+        while time.perf_counter() - started < self.frame_budget:
+            try:
+                callback, args = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            count += 1
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"Ошибка обновления интерфейса: {e}")
+        self.drained += count
+        self.max_batch = max(self.max_batch, count)
+        if count or not self._queue.empty():
+            self._delay = self.interval
+        else:
+            # Простой: опрашиваем все реже, чтобы не будить цикл событий зря
+            self._delay = min(self.idle_interval, self._delay * 2)
+        if not self._closed:
+            self._after_id = self.root.after(self._delay, self._drain)
 
 class SmoothButton(tk.Canvas):
     def __init__(self, master=None, text="", command=None, 
@@ -31,6 +239,10 @@ class SmoothButton(tk.Canvas):
         self.height = height
         self.icon = icon
         self.is_hovered = False
+        self.current_color = None
+        self.clock = AnimationClock.for_widget(self)
+        self._shape = None
+        self._label = None
         
         self.bind("<Enter>", self.on_enter)
         self.bind("<Leave>", self.on_leave)
@@ -43,17 +255,21 @@ class SmoothButton(tk.Canvas):
         """Отрисовка кнопки с закругленными углами"""
         if color is None:
             color = self.hover_color if self.is_hovered else self.fg_color
+        self.current_color = color
         
-        self.delete("all")
+        if self._shape is not None:
+            # Элементы уже созданы - меняем только цвет
+            self.itemconfig(self._shape, fill=color)
+            return
         
         # Рисуем закругленный прямоугольник с тенью
-        self.create_rounded_rect(2, 2, self.width-2, self.height-2, 
-                               self.corner_radius, fill=color, outline="")
+        self._shape = self.create_rounded_rect(2, 2, self.width-2, self.height-2, 
+                                               self.corner_radius, fill=color, outline="")
         
         # Добавляем текст
-        self.create_text(self.width//2, self.height//2, 
-                        text=self.text, fill=self.text_color, 
-                        font=self.font, anchor="center")
+        self._label = self.create_text(self.width//2, self.height//2, 
+                                       text=self.text, fill=self.text_color, 
+                                       font=self.font, anchor="center")
     
     def create_rounded_rect(self, x1, y1, x2, y2, radius=12, **kwargs):
         """Создание прямоугольника с закругленными углами"""
@@ -92,47 +308,25 @@ class SmoothButton(tk.Canvas):
     
     def on_release(self, event):
         """Возврат после клика"""
+        self.clock.cancel(self)
         color = self.hover_color if self.is_hovered else self.fg_color
         self.draw_button(color)
     
     def animate_color(self, from_color, to_color):
         """Плавная анимация изменения цвета"""
-        steps = 8
-        delay = 20
-        
-        def hex_to_rgb(hex_color):
-            hex_color = hex_color.lstrip('#')
-            return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
-        
-        def rgb_to_hex(rgb):
-            return '#{:02x}{:02x}{:02x}'.format(*rgb)
-        
-        start_rgb = hex_to_rgb(from_color)
-        end_rgb = hex_to_rgb(to_color)
-        
-        for step in range(steps + 1):
-            ratio = step / steps
-            current_rgb = [
-                int(start_rgb[i] + (end_rgb[i] - start_rgb[i]) * ratio)
-                for i in range(3)
-            ]
-            current_color = rgb_to_hex(tuple(current_rgb))
-            
-            def update_color(color=current_color):
-                self.draw_button(color)
-            
-            self.after(step * delay, update_color)
+        # Переход начинается с текущего цвета, чтобы прерванная анимация не прыгала
+        start = self.current_color or from_color
+        self.clock.start(self, color_ramp(start, to_color), self.draw_button)
     
     def animate_click(self):
         """Анимация нажатия кнопки"""
-        darker_color = self.darken_color(self.hover_color if self.is_hovered else self.fg_color, 0.7)
+        color = self.hover_color if self.is_hovered else self.fg_color
+        darker_color = self.darken_color(color, 0.7)
         self.draw_button(darker_color)
         
-        def reset_color():
-            color = self.hover_color if self.is_hovered else self.fg_color
-            self.draw_button(color)
-        
-        self.after(120, reset_color)
+        # Удержание темного цвета ~120 мс, затем возврат
+        hold = max(1, 120 // self.clock.interval)
+        self.clock.start(self, (darker_color,) * hold + (color,), self.draw_button)
     
     def darken_color(self, hex_color, factor=0.7):
         """Затемнение цвета"""
@@ -141,96 +335,3010 @@ class SmoothButton(tk.Canvas):
         darker_rgb = tuple(int(c * factor) for c in rgb)
         return '#{:02x}{:02x}{:02x}'.format(*darker_rgb)
 
-class TypeWriter:
-    """Класс для анимации печати текста"""
-    def __init__(self, text_widget):
-        self.text_widget = text_widget
-        self.current_text = ""
-        self.is_typing = False
-        
-    def type_text(self, text, delay=0.03):
-        """Анимированная печать текста"""
-        self.is_typing = True
-        self.text_widget.delete(1.0, tk.END)
-        self.current_text = ""
-        
-        def type_char(i=0):
-            if i < len(text) and self.is_typing:
-                self.current_text += text[i]
-                self.text_widget.delete(1.0, tk.END)
-                self.text_widget.insert(tk.END, self.current_text)
-                self.text_widget.see(tk.END)
-                self.text_widget.after(int(delay * 1000), type_char, i + 1)
+class TypeWriter:
+    """Класс для анимации печати текста
+
+    Текст выводится потоково: в виджет дописывается только новая порция,
+    а размер порции на кадр рассчитывается от дедлайна и измеренной
+    стоимости вставки, поэтому вывод любого объема укладывается в max_duration.
+    """
+    def __init__(self, text_widget, frame_budget=0.016, max_duration=3.0):
+        self.text_widget = text_widget
+        self.frame_budget = frame_budget    # длительность кадра, сек
+        self.max_duration = max_duration    # предел времени вывода очереди, сек
+        self.is_typing = False
+        self.on_complete = None
+        self.chars_per_frame = 1
+        self._typed = []
+        self._pending = deque()
+        self._pending_len = 0
+        self._offset = 0
+        self._closed = True
+        self._after_id = None
+        self._deadline = None
+        self._interval = frame_budget
+        self._base_rate = 1
+        self._frame_cost = 0.0
+
+    @property
+    def current_text(self):
+        """Уже выведенный текст"""
+        if len(self._typed) > 1:
+            self._typed = ["".join(self._typed)]
+        return self._typed[0] if self._typed else ""
+
+    def type_text(self, text, delay=0.03):
+        """Анимированная печать текста"""
+        self.start_stream(delay)
+        self.feed(text)
+        self.end_stream()
+
+    def start_stream(self, delay=0.03):
+        """Начало потокового вывода: очистка виджета и очереди"""
+        self._cancel_tick()
+        self.text_widget.delete(1.0, tk.END)
+        self._typed = []
+        self._pending.clear()
+        self._pending_len = 0
+        self._offset = 0
+        self._deadline = None
+        self._closed = False
+        self.is_typing = True
+        # delay задает скорость анимации: символов за кадр при кадре не короче delay
+        if delay > 0:
+            self._interval = max(self.frame_budget, delay)
+            self._base_rate = max(1, int(round(self._interval / delay)))
+        else:
+            self._interval = self.frame_budget
+            self._base_rate = 0
+        self.chars_per_frame = self._base_rate or 1
+
+    def feed(self, chunk):
+        """Добавление порции текста в очередь вывода"""
+        if not chunk or not self.is_typing:
+            return
+        self._pending.append(chunk)
+        self._pending_len += len(chunk)
+        if self._deadline is None:
+            self._deadline = time.perf_counter() + self.max_duration
+        if self._base_rate == 0:
+            self.complete()
+        elif self._after_id is None:
+            self._after_id = self.text_widget.after_idle(self._tick)
+
+    def end_stream(self):
+        """Больше порций не будет; печать завершится после очереди"""
+        self._closed = True
+        if self.is_typing and self._after_id is None:
+            self._finish_if_done()
+
+    def complete(self):
+        """Мгновенно вывести весь оставшийся текст"""
+        self._cancel_tick()
+        if self._pending_len:
+            self._write(self._take(self._pending_len))
+        self._deadline = None
+        self._finish_if_done()
+
+    def stop_typing(self):
+        """Остановка анимации печати"""
+        self._cancel_tick()
+        self._pending.clear()
+        self._pending_len = 0
+        self._offset = 0
+        self._deadline = None
+        self.is_typing = False
+
+    def _tick(self):
+        """Один кадр печати: вывод порции, рассчитанной по дедлайну"""
+        self._after_id = None
+        if not self.is_typing:
+            return
+        if self._pending_len:
+            # Реальная длительность кадра учитывает стоимость вставки в виджет
+            frame_time = max(self._interval, self._frame_cost * 2)
+            frames_left = max(1.0, (self._deadline - time.perf_counter()) / frame_time)
+            count = max(self._base_rate, int(self._pending_len / frames_left) + 1)
+            self.chars_per_frame = count
+
+            started = time.perf_counter()
+            self._write(self._take(count))
+            cost = time.perf_counter() - started
+            self._frame_cost = (self._frame_cost + cost) / 2
+
+            if self._pending_len:
+                # Оставляем циклу событий не меньше времени, чем ушло на вставку
+                wait = max(self._interval, cost * 2)
+                self._after_id = self.text_widget.after(int(wait * 1000), self._tick)
+                return
+        self._deadline = None
+        self._finish_if_done()
+
+    def _take(self, count):
+        """Извлечение не более count символов из очереди"""
+        parts = []
+        while count > 0 and self._pending:
+            head = self._pending[0]
+            piece = head[self._offset:self._offset + count]
+            parts.append(piece)
+            count -= len(piece)
+            self._offset += len(piece)
+            if self._offset >= len(head):
+                self._pending.popleft()
+                self._offset = 0
+        text = "".join(parts)
+        self._pending_len -= len(text)
+        return text
+
+    def _write(self, text):
+        """Дописывание только новой порции в конец виджета"""
+        if not text:
+            return
+        self._typed.append(text)
+        self.text_widget.insert(tk.END, text)
+        self.text_widget.see(tk.END)
+
+    def _finish_if_done(self):
+        """Завершение печати, если очередь пуста и поток закрыт"""
+        if self._closed and not self._pending_len and self.is_typing:
+            self.is_typing = False
+            if self.on_complete:
+                self.on_complete()
+
+    def _cancel_tick(self):
+        """Отмена запланированного кадра"""
+        if self._after_id is not None:
+            self.text_widget.after_cancel(self._after_id)
+            self._after_id = None
+
+class TextBuffer:
+    """Компактное хранилище большого текста
+
+    Текст лежит в блоках фиксированного размера, начала строк - в массиве
+    смещений, поэтому выборка любой строки и диапазона строк не зависит
+    от общего объема.
+    """
+    BLOCK_SIZE = 1 << 16
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """Очистка буфера"""
+        self._blocks = []       # закрытые блоки ровно по BLOCK_SIZE символов
+        self._tail = []         # недописанный последний блок
+        self._tail_len = 0
+        self.length = 0
+        self.line_starts = array('Q', [0])
+
+    @property
+    def line_count(self):
+        return len(self.line_starts)
+
+    def append(self, text):
+        """Дописывание текста в конец"""
+        if not text:
+            return
+        base = self.length
+        index = text.find('\n')
+        while index != -1:
+            self.line_starts.append(base + index + 1)
+            index = text.find('\n', index + 1)
+        self.length += len(text)
+        self._tail.append(text)
+        self._tail_len += len(text)
+        if self._tail_len >= self.BLOCK_SIZE:
+            tail = "".join(self._tail)
+            size = self.BLOCK_SIZE
+            closed = len(tail) - len(tail) % size
+            self._blocks.extend(tail[i:i + size] for i in range(0, closed, size))
+            rest = tail[closed:]
+            self._tail = [rest] if rest else []
+            self._tail_len = len(rest)
+
+    def slice(self, start, end):
+        """Текст в диапазоне смещений [start, end)"""
+        end = min(end, self.length)
+        size = self.BLOCK_SIZE
+        closed = len(self._blocks) * size
+        parts = []
+        while start < end:
+            if start >= closed:
+                parts.append(self._tail_text()[start - closed:end - closed])
+                break
+            index, offset = divmod(start, size)
+            piece = self._blocks[index][offset:offset + end - start]
+            parts.append(piece)
+            start += len(piece)
+        return "".join(parts)
+
+    def lines(self, first, last):
+        """Строки [first, last) одним текстом без завершающего перевода строки"""
+        last = min(last, self.line_count)
+        if first >= last:
+            return ""
+        end = self.line_starts[last] - 1 if last < self.line_count else self.length
+        return self.slice(self.line_starts[first], end)
+
+    def line_of(self, offset):
+        """Номер строки (с нуля), содержащей смещение"""
+        return bisect.bisect_right(self.line_starts, offset) - 1
+
+    def find(self, pattern, start=0, nocase=False):
+        """Поиск подстроки с позиции start; -1, если не найдена"""
+        if not pattern:
+            return -1
+        if nocase:
+            pattern = pattern.lower()
+        # Окна перекрываются на длину образца, чтобы не пропустить совпадение на стыке блоков
+        window = max(self.BLOCK_SIZE, len(pattern) * 2)
+        while start < self.length:
+            chunk = self.slice(start, start + window + len(pattern) - 1)
+            if nocase:
+                chunk = chunk.lower()
+            index = chunk.find(pattern)
+            if index != -1:
+                return start + index
+            start += window
+        return -1
+
+    def text(self):
+        """Весь текст целиком"""
+        return "".join(self._blocks) + self._tail_text()
+
+    def chunks(self):
+        """Снимок содержимого блоками, без копирования текста"""
+        return self._blocks + [self._tail_text()]
+
+    def memory_usage(self):
+        """Примерный объем памяти буфера в байтах"""
+        return (sum(sys.getsizeof(block) for block in self._blocks) +
+                sys.getsizeof(self._tail_text()) +
+                self.line_starts.itemsize * len(self.line_starts))
+
+    def _tail_text(self):
+        if len(self._tail) > 1:
+            self._tail = ["".join(self._tail)]
+        return self._tail[0] if self._tail else ""
+
+class CodeView(tk.Frame):
+    """Виртуализированное поле вывода кода
+
+    Полный текст хранится в TextBuffer, а в виджет Text попадает только
+    видимое окно строк с запасом margin сверху и снизу. Прокрутка внутри
+    запаса обслуживается самим Text, выход за него перестраивает окно,
+    поэтому задержка прокрутки не зависит от объема вывода. Методы
+    delete/insert/see повторяют tk.Text в объеме, нужном TypeWriter.
+    """
+    def __init__(self, master, margin=200, **text_options):
+        super().__init__(master, bg=text_options.get('bg', '#161b22'))
+        from tkinter import font as tkfont
+        self.buffer = TextBuffer()
+        self.margin = margin
+        self.top = 0                    # первая видимая строка буфера
+        self.visible = 1                # число строк, помещающихся в окне
+        self._window = (0, 1)           # строки буфера, выведенные в виджет
+        self._render_id = None
+        self._match = None              # (смещение, длина) найденного текста
+        self._marked_line = None
+        self.highlighter = None         # SyntaxHighlighter, подключается сам
+        
+        self.text = tk.Text(self, wrap=tk.NONE, state=tk.DISABLED, **text_options)
+        self.vbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.hbar = tk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.text.xview)
+        self.text.configure(xscrollcommand=self.hbar.set, yscrollcommand=self._on_text_scroll)
+        self.text.grid(row=0, column=0, sticky='nsew')
+        self.vbar.grid(row=0, column=1, sticky='ns')
+        self.hbar.grid(row=1, column=0, sticky='ew')
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+        
+        self.text.tag_configure('match', background='#9e6a03', foreground='#ffffff')
+        self.text.tag_configure('marked_line', background='#1f2937')
+        self._linespace = tkfont.Font(font=self.text.cget('font')).metrics('linespace')
+        self.text.bind('<Configure>', self._on_resize)
+        self.text.bind('<Control-Home>', lambda event: self._jump(0))
+        self.text.bind('<Control-End>', lambda event: self._jump(self.buffer.line_count))
+
+    @property
+    def line_count(self):
+        return self.buffer.line_count
+
+    def get_text(self):
+        """Весь выведенный текст"""
+        return self.buffer.text()
+
+    def delete(self, index1, index2=None):
+        """Очистка вывода (поддерживается только удаление всего текста)"""
+        if str(index1) not in ('1.0', '0.0') or index2 != tk.END:
+            raise ValueError("CodeView поддерживает только delete(1.0, END)")
+        self.buffer.clear()
+        self.top = 0
+        self._window = (0, 1)
+        self._match = None
+        self._marked_line = None
+        self._cancel_render()
+        self._write(lambda: self.text.delete('1.0', tk.END))
+        self._update_scrollbar()
+        if self.highlighter is not None:
+            self.highlighter.reset()
+
+    def insert(self, index, text):
+        """Дописывание текста (поддерживается только вставка в конец)"""
+        if index != tk.END:
+            raise ValueError("CodeView поддерживает только insert(END, text)")
+        if not text:
+            return
+        lines_before = self.buffer.line_count
+        self.buffer.append(text)
+        start, end = self._window
+        if end == lines_before:
+            # Хвост буфера уже в виджете - дописываем только новую порцию
+            self._write(lambda: self.text.insert('end-1c', text))
+            self._window = (start, self.buffer.line_count)
+        self._update_scrollbar()
+        if self.highlighter is not None:
+            self.highlighter.on_append()
+
+    def see(self, index):
+        """Прокрутка к концу вывода или к строке 'N.M'"""
+        if index == tk.END:
+            self._follow_tail()
+        else:
+            self.scroll_to(int(str(index).split('.')[0]) - 1)
+
+    def yview(self, *args):
+        """Команда вертикальной полосы прокрутки в координатах всего буфера"""
+        if not args:
+            return self._fractions()
+        if args[0] == tk.MOVETO:
+            self.scroll_to(int(float(args[1]) * self.buffer.line_count))
+        elif args[0] == tk.SCROLL:
+            step = self.visible if args[2] == tk.PAGES else 1
+            self.scroll_to(self.top + int(args[1]) * step)
+
+    def scroll_to(self, line):
+        """Показать буфер начиная со строки line (с нуля)"""
+        self.top = max(0, min(line, self.buffer.line_count - self.visible))
+        start, end = self._window
+        edge = self.margin // 4
+        if (self.top < start or self.top + self.visible > end or
+                (start > 0 and self.top - start < edge) or
+                (end < self.buffer.line_count and end - self.top - self.visible < edge)):
+            self._render()
+        else:
+            self.text.yview(f"{self.top - start + 1}.0")
+        self._update_scrollbar()
+
+    def goto_line(self, number):
+        """Переход к строке number (с единицы) с подсветкой"""
+        line = max(0, min(number - 1, self.buffer.line_count - 1))
+        self._marked_line = line
+        self.scroll_to(line - self.visible // 2)
+        self._apply_marks()
+        return line + 1
+
+    def find_next(self, pattern, nocase=True):
+        """Поиск следующего вхождения после текущего с переходом по кругу
+
+        Возвращает номер строки (с единицы) или None.
+        """
+        start = self._match[0] + 1 if self._match else 0
+        offset = self.buffer.find(pattern, start, nocase)
+        if offset == -1 and start:
+            offset = self.buffer.find(pattern, 0, nocase)
+        if offset == -1:
+            self._match = None
+            self._apply_marks()
+            return None
+        self._match = (offset, len(pattern))
+        line = self.buffer.line_of(offset)
+        self.scroll_to(line - self.visible // 2)
+        self._apply_marks()
+        return line + 1
+
+    def _follow_tail(self):
+        """Прокрутка к концу; при потоковом выводе срезаем ушедшие вверх строки"""
+        count = self.buffer.line_count
+        self.top = max(0, count - self.visible)
+        start, end = self._window
+        if end == count and self.top >= start:
+            cut = self.top - self.margin - start
+            if cut > self.margin:
+                self._write(lambda: self.text.delete('1.0', f"{cut + 1}.0"))
+                start += cut
+                self._window = (start, end)
+            self.text.yview(f"{self.top - start + 1}.0")
+            self._update_scrollbar()
+        else:
+            self.scroll_to(self.top)
+
+    def _jump(self, line):
+        self.scroll_to(line)
+        return 'break'
+
+    def _render(self):
+        """Перестроение окна строк вокруг self.top"""
+        self._cancel_render()
+        count = self.buffer.line_count
+        start = max(0, self.top - self.margin)
+        end = min(count, self.top + self.visible + self.margin)
+        content = self.buffer.lines(start, end)
+        
+        def replace():
+            self.text.delete('1.0', tk.END)
+            self.text.insert('1.0', content)
+        self._write(replace)
+        self._window = (start, end)
+        self.text.yview(f"{self.top - start + 1}.0")
+        self._apply_marks()
+        if self.highlighter is not None:
+            self.highlighter.on_render(start, end, content)
+
+    def _apply_marks(self):
+        """Подсветка найденного текста и отмеченной строки в текущем окне"""
+        start, end = self._window
+        self.text.tag_remove('match', '1.0', tk.END)
+        self.text.tag_remove('marked_line', '1.0', tk.END)
+        if self._marked_line is not None and start <= self._marked_line < end:
+            row = self._marked_line - start + 1
+            self.text.tag_add('marked_line', f"{row}.0", f"{row + 1}.0")
+        if self._match is not None:
+            offset, length = self._match
+            line = self.buffer.line_of(offset)
+            if start <= line < end:
+                column = offset - self.buffer.line_starts[line]
+                first = f"{line - start + 1}.{column}"
+                self.text.tag_add('match', first, f"{first}+{length}c")
+
+    def _on_text_scroll(self, first, last):
+        """Виджет прокрутился сам (колесо, клавиши, выделение) - синхронизация"""
+        start, end = self._window
+        top = start + int(self.text.index('@0,0').split('.')[0]) - 1
+        if top != self.top:
+            self.top = top
+            edge = self.margin // 4
+            if ((start > 0 and top - start < edge) or
+                    (end < self.buffer.line_count and end - top - self.visible < edge)):
+                if self._render_id is None:
+                    self._render_id = self.after_idle(self._render)
+        self._update_scrollbar()
+
+    def _on_resize(self, event):
+        visible = max(1, event.height // self._linespace)
+        if visible != self.visible:
+            self.visible = visible
+            self.scroll_to(self.top)
+
+    def _update_scrollbar(self):
+        self.vbar.set(*self._fractions())
+
+    def _fractions(self):
+        count = self.buffer.line_count
+        return self.top / count, min(1.0, (self.top + self.visible) / count)
+
+    def _write(self, action):
+        """Изменение виджета, который для пользователя только для чтения"""
+        self.text.configure(state=tk.NORMAL)
+        action()
+        self.text.configure(state=tk.DISABLED)
+
+    def _cancel_render(self):
+        if self._render_id is not None:
+            self.after_cancel(self._render_id)
+            self._render_id = None
+
+class PythonLexer:
+    """Построчный лексер Python для подсветки
+
+    Состояние между строками - открытая тройная кавычка, поэтому разбор
+    можно продолжать с любой строки, зная только состояние на ее начало.
+    """
+    STATES = (None, '"""', "'''")
+    KEYWORDS = frozenset((
+        'False', 'None', 'True', 'and', 'as', 'assert', 'async', 'await', 'break',
+        'class', 'continue', 'def', 'del', 'elif', 'else', 'except', 'finally', 'for',
+        'from', 'global', 'if', 'import', 'in', 'is', 'lambda', 'nonlocal', 'not', 'or',
+        'pass', 'raise', 'return', 'try', 'while', 'with', 'yield', 'self'
+    ))
+    BUILTINS = frozenset((
+        'print', 'len', 'range', 'int', 'float', 'str', 'list', 'dict', 'set', 'tuple',
+        'bool', 'open', 'isinstance', 'enumerate', 'zip', 'map', 'filter', 'sorted',
+        'sum', 'min', 'max', 'abs', 'input', 'super', 'type', 'Exception', 'ValueError',
+        'TypeError', 'KeyError', 'RuntimeError'
+    ))
+    TOKEN = re.compile(r'''
+        (?P<comment>\#.*)
+      | (?P<triple>(?<![^\W\d])[rRbBuUfF]{0,2}(?:"""|\'\'\'))
+      | (?P<string>(?<![^\W\d])[rRbBuUfF]{0,2}(?:"(?:\\.|[^"\\])*"?|'(?:\\.|[^'\\])*'?))
+      | (?P<number>\b(?:0[xXoObB][\da-fA-F_]+|\d[\d_]*(?:\.\d*)?(?:[eE][+-]?\d+)?j?)\b)
+      | (?P<decorator>^\s*@[\w.]+)
+      | (?P<name>[^\W\d]\w*)
+    ''', re.VERBOSE)
+
+    def tokenize(self, line, state=0):
+        """Токены строки [(начало, конец, тег)] и состояние на начало следующей"""
+        tokens = []
+        pos = 0
+        if state:
+            close = line.find(self.STATES[state])
+            if close == -1:
+                return [(0, len(line), 'string')] if line else tokens, state
+            pos = close + 3
+            tokens.append((0, pos, 'string'))
+            state = 0
+        definition = False
+        for match in self.TOKEN.finditer(line, pos):
+            if match.start() < pos:
+                continue
+            kind = match.lastgroup
+            start, end = match.span()
+            if kind == 'triple':
+                quote = match.group()[-3:]
+                close = line.find(quote, end)
+                if close == -1:
+                    tokens.append((start, len(line), 'string'))
+                    return tokens, self.STATES.index(quote)
+                pos = close + 3
+                tokens.append((start, pos, 'string'))
+                continue
+            if kind == 'name':
+                word = match.group()
+                if definition:
+                    tokens.append((start, end, 'definition'))
+                elif word in self.KEYWORDS:
+                    tokens.append((start, end, 'keyword'))
+                elif word in self.BUILTINS:
+                    tokens.append((start, end, 'builtin'))
+                definition = word in ('def', 'class')
+                continue
+            definition = False
+            tokens.append((start, end, kind))
+        return tokens, state
+
+    def scan(self, line, state=0):
+        """Только состояние на начало следующей строки, без токенов"""
+        if '"""' not in line and "'''" not in line:
+            return state
+        return self.tokenize(line, state)[1]
+
+class SyntaxHighlighter:
+    """Инкрементальная подсветка синтаксиса в CodeView
+
+    Разбор идет в фоновом потоке: дописанные полные строки, недописанная
+    последняя строка и перестроенное окно CodeView уходят в очередь заданий.
+    Для строк вне видимого окна воркер только переносит состояние лексера,
+    для строк в окне возвращает токены. Результаты применяются пачками
+    раз в кадр в пределах frame_budget.
+    """
+    TAG_COLORS = {
+        'keyword': '#ff7b72',
+        'builtin': '#ffa657',
+        'string': '#a5d6ff',
+        'comment': '#8b949e',
+        'number': '#79c0ff',
+        'decorator': '#d2a8ff',
+        'definition': '#d2a8ff'
+    }
+
+    def __init__(self, view, frame_budget=0.008, interval=16):
+        self.view = view
+        self.lexer = PythonLexer()
+        self.frame_budget = frame_budget
+        self.interval = interval
+        self._jobs = queue.SimpleQueue()
+        self._results = queue.SimpleQueue()
+        self._generation = 0
+        self._sent_line = 0         # первая полная строка, еще не отправленная воркеру
+        self._sent_tail = ""        # последняя отправленная недописанная строка
+        self._inflight = 0
+        self._after_id = None
+        self._worker = None
+        # Поля воркера: состояние лексера на начало каждой разобранной строки
+        self._states = bytearray()
+        self._next_state = 0
+        self._worker_generation = 0
+        
+        for tag, color in self.TAG_COLORS.items():
+            view.text.tag_configure(tag, foreground=color)
+        view.text.tag_raise('match')
+        view.highlighter = self
+
+    def reset(self):
+        """Вывод очищен: результаты старых заданий отбрасываются"""
+        self._generation += 1
+        self._sent_line = 0
+        self._sent_tail = ""
+        self._submit('reset', 0, "")
+
+    def on_append(self):
+        """В буфер дописан текст"""
+        self._schedule()
+
+    def on_render(self, start, end, content):
+        """CodeView перестроил окно строк - нужна подсветка всего окна"""
+        self._submit('window', start, content)
+
+    def stop(self):
+        """Остановка фонового потока"""
+        self._cancel_tick()
+        if self._worker is not None:
+            self._jobs.put(None)
+            self._worker = None
+
+    def _submit(self, kind, first, text):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._work, name="vurtix-highlighter", daemon=True)
+            self._worker.start()
+        self._jobs.put((self._generation, kind, first, text))
+        self._inflight += 1
+        self._schedule()
+
+    def _schedule(self):
+        if self._after_id is None:
+            self._after_id = self.view.after(self.interval, self._tick)
+
+    def _tick(self):
+        """Кадр: отправка новых строк и применение готовых результатов"""
+        self._after_id = None
+        self._send_appended()
+        started = time.perf_counter()
+        while self._inflight and time.perf_counter() - started < self.frame_budget:
+            try:
+                result = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._inflight -= 1
+            self._apply(*result)
+        if self._inflight:
+            self._schedule()
+
+    def _send_appended(self):
+        buffer = self.view.buffer
+        complete = buffer.line_count - 1
+        if complete > self._sent_line:
+            self._submit('lines', self._sent_line, buffer.lines(self._sent_line, complete))
+            self._sent_line = complete
+            self._sent_tail = ""
+        tail = buffer.lines(complete, complete + 1)
+        if tail != self._sent_tail:
+            self._sent_tail = tail
+            self._submit('tail', complete, tail)
+
+    def _apply(self, generation, first, last, spans):
+        """Замена тегов подсветки в строках [first, last), попавших в окно"""
+        start, end = self.view._window
+        first, last = max(first, start), min(last, end)
+        if generation != self._generation or first >= last:
+            return
+        text = self.view.text
+        for tag in self.TAG_COLORS:
+            text.tag_remove(tag, f"{first - start + 1}.0", f"{last - start + 1}.0")
+        ranges = {}
+        for line, column, stop, tag in spans:
+            if first <= line < last:
+                row = line - start + 1
+                ranges.setdefault(tag, []).extend((f"{row}.{column}", f"{row}.{stop}"))
+        for tag, indices in ranges.items():
+            text.tag_add(tag, *indices)
+
+    def _work(self):
+        """Фоновый разбор заданий по порядку поступления"""
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            generation, kind, first, text = job
+            if generation != self._worker_generation:
+                self._worker_generation = generation
+                self._states = bytearray()
+                self._next_state = 0
+            spans = []
+            lines = text.split('\n')
+            if kind == 'lines':
+                self._lex_appended(first, lines, spans)
+            elif kind in ('window', 'tail'):
+                self._lex_known(first, lines, spans)
+            self._results.put((generation, first, first + len(lines), spans))
+
+    def _lex_appended(self, first, lines, spans):
+        """Новые полные строки: состояние переносится, токены - только для окна"""
+        states = self._states
+        state = self._next_state
+        start, end = self.view._window
+        for line, content in enumerate(lines, first):
+            states.append(state)
+            if start <= line < end:
+                tokens, state = self.lexer.tokenize(content, state)
+                spans.extend((line, column, stop, tag) for column, stop, tag in tokens)
+            else:
+                state = self.lexer.scan(content, state)
+        self._next_state = state
+
+    def _lex_known(self, first, lines, spans):
+        """Строки с уже известным состоянием на начало: окно или недописанная строка"""
+        states = self._states
+        if first < len(states):
+            state = states[first]
+        elif first == len(states):
+            state = self._next_state
+        else:
+            return
+        for line, content in enumerate(lines, first):
+            tokens, state = self.lexer.tokenize(content, state)
+            spans.extend((line, column, stop, tag) for column, stop, tag in tokens)
+            # Дальше разобранных строк состояние неизвестно; их подсветит задание 'lines'
+            if line + 1 < len(states):
+                state = states[line + 1]
+            elif line + 1 > len(states):
+                break
+
+class TimerHandle:
+    """Таймер в EventScheduler"""
+    def __init__(self, scheduler, deadline, callback, interval=None):
+        self.scheduler = scheduler
+        self.deadline = deadline
+        self.callback = callback
+        self.interval = interval
+        self.cancelled = False
+
+    def cancel(self):
+        """Немедленная отмена таймера"""
+        self.scheduler.cancel(self)
+
+class EventScheduler:
+    """Планировщик таймеров на одном потоке
+
+    Дедлайны хранятся в куче; поток спит ровно до ближайшего и не
+    просыпается совсем, если таймеров нет. Обратные вызовы выполняются
+    в потоке планировщика и должны быть короткими.
+    """
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self):
+        self._heap = []
+        self._counter = 0
+        self._condition = threading.Condition()
+        self._thread = None
+
+    @classmethod
+    def shared(cls):
+        """Общий планировщик процесса"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def schedule(self, delay, callback, interval=None):
+        """Вызов callback через delay секунд (и далее каждые interval)"""
+        handle = TimerHandle(self, time.monotonic() + delay, callback, interval)
+        with self._condition:
+            self._push(handle)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="vurtix-timers", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return handle
+
+    def cancel(self, handle):
+        """Удаление таймера из кучи"""
+        with self._condition:
+            handle.cancelled = True
+            self._heap = [entry for entry in self._heap if entry[2] is not handle]
+            heapq.heapify(self._heap)
+            self._condition.notify()
+
+    @property
+    def pending(self):
+        """Число активных таймеров"""
+        with self._condition:
+            return len(self._heap)
+
+    def _push(self, handle):
+        self._counter += 1
+        heapq.heappush(self._heap, (handle.deadline, self._counter, handle))
+
+    def _loop(self):
+        """Ожидание ближайшего дедлайна и вызов таймеров"""
+        with self._condition:
+            while True:
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                deadline, _, handle = self._heap[0]
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+                if handle.interval:
+                    handle.deadline += handle.interval
+                    self._push(handle)
+                
+                self._condition.release()
+                try:
+                    handle.callback()
+                except Exception as e:
+                    print(f"Ошибка таймера: {e}")
+                finally:
+                    self._condition.acquire()
+
+KNOWLEDGE_PATH = os.path.join(os.path.expanduser("~"), ".vurtixai", "knowledge.bin")
+
+class KnowledgeStore:
+    """Компактное хранилище изученных концептов
+
+    Записи лежат в кольцевом буфере из массивов array (тема, концепт,
+    время, ссылка на следующую запись темы - 20 байт на запись), строки
+    тем и концептов интернируются. При заполнении вытесняется самая
+    старая запись. Записи каждой темы связаны в список, поэтому число
+    записей и последняя запись темы находятся за O(1).
+    """
+    SNAPSHOT_MAGIC = b'VKS1'
+    SNAPSHOT_HEADER = struct.Struct('<4sIIIII')
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self._topic = array('I', bytes(4 * capacity))
+        self._concept = array('I', bytes(4 * capacity))
+        self._time = array('d', bytes(8 * capacity))
+        self._next = array('i', bytes(4 * capacity))
+        self._start = 0
+        self._count = 0
+        # Строковые таблицы и индексы тем
+        self._topic_names = []
+        self._topic_ids = {}
+        self._concept_names = []
+        self._concept_ids = {}
+        self._topic_head = array('i')
+        self._topic_tail = array('i')
+        self._topic_count = array('I')
+
+    def __len__(self):
+        return self._count
+
+    def add(self, topic, concept, timestamp=None):
+        """Добавление записи; при заполнении вытесняется самая старая"""
+        topic_id = self._topic_id(topic)
+        concept_id = self._intern(concept, self._concept_names, self._concept_ids)
+        if self._count < self.capacity:
+            slot = (self._start + self._count) % self.capacity
+            self._count += 1
+        else:
+            slot = self._start
+            self._evict(slot)
+            self._start = (self._start + 1) % self.capacity
+        
+        self._topic[slot] = topic_id
+        self._concept[slot] = concept_id
+        self._time[slot] = time.time() if timestamp is None else timestamp
+        self._next[slot] = -1
+        tail = self._topic_tail[topic_id]
+        if tail == -1:
+            self._topic_head[topic_id] = slot
+        else:
+            self._next[tail] = slot
+        self._topic_tail[topic_id] = slot
+        self._topic_count[topic_id] += 1
+        return slot
+
+    def count(self, topic):
+        """Число записей темы"""
+        topic_id = self._topic_ids.get(topic)
+        return 0 if topic_id is None else self._topic_count[topic_id]
+
+    def latest(self, topic):
+        """Последняя запись темы: (концепт, время) или None"""
+        topic_id = self._topic_ids.get(topic)
+        if topic_id is None or self._topic_tail[topic_id] == -1:
+            return None
+        slot = self._topic_tail[topic_id]
+        return self._concept_names[self._concept[slot]], self._time[slot]
+
+    def entries(self, topic=None):
+        """Записи от старых к новым: (тема, концепт, время)"""
+        if topic is None:
+            slots = ((self._start + i) % self.capacity for i in range(self._count))
+        else:
+            slots = self._topic_slots(self._topic_ids.get(topic))
+        for slot in slots:
+            yield (self._topic_names[self._topic[slot]],
+                   self._concept_names[self._concept[slot]],
+                   self._time[slot])
+
+    def topics(self):
+        """Темы с записями и их количество"""
+        return {name: self._topic_count[topic_id]
+                for topic_id, name in enumerate(self._topic_names)
+                if self._topic_count[topic_id]}
+
+    def memory_usage(self):
+        """Объем массивов записей и индексов, байт"""
+        arrays = (self._topic, self._concept, self._time, self._next,
+                  self._topic_head, self._topic_tail, self._topic_count)
+        return sum(a.itemsize * len(a) for a in arrays)
+
+    def save(self, path):
+        """Бинарный снимок: заголовок, строковые таблицы, сырые массивы"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        topics = "\0".join(self._topic_names).encode('utf-8')
+        concepts = "\0".join(self._concept_names).encode('utf-8')
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(self.SNAPSHOT_HEADER.pack(self.SNAPSHOT_MAGIC, self.capacity, self._count,
+                                              self._start, len(topics), len(concepts)))
+            f.write(topics)
+            f.write(concepts)
+            for values in self._arrays():
+                if sys.byteorder != 'little':
+                    values = array(values.typecode, values)
+                    values.byteswap()
+                values.tofile(f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Загрузка снимка, сохраненного save()"""
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, capacity, count, start, topics_size, concepts_size = \
+            cls.SNAPSHOT_HEADER.unpack_from(data)
+        if magic != cls.SNAPSHOT_MAGIC:
+            raise ValueError(f"Неизвестный формат снимка: {path}")
+        
+        store = cls.__new__(cls)
+        store.capacity = capacity
+        store._count = count
+        store._start = start
+        offset = cls.SNAPSHOT_HEADER.size
+        topics = data[offset:offset + topics_size].decode('utf-8')
+        offset += topics_size
+        concepts = data[offset:offset + concepts_size].decode('utf-8')
+        offset += concepts_size
+        store._topic_names = topics.split("\0") if topics_size else []
+        store._concept_names = concepts.split("\0") if concepts_size else []
+        store._topic_ids = {name: i for i, name in enumerate(store._topic_names)}
+        store._concept_ids = {name: i for i, name in enumerate(store._concept_names)}
+        
+        sizes = (capacity,) * 4 + (len(store._topic_names),) * 3
+        view = memoryview(data)
+        arrays = []
+        for typecode, size in zip('IIdiiiI', sizes):
+            values = array(typecode)
+            end = offset + values.itemsize * size
+            values.frombytes(view[offset:end])
+            if sys.byteorder != 'little':
+                values.byteswap()
+            arrays.append(values)
+            offset = end
+        (store._topic, store._concept, store._time, store._next,
+         store._topic_head, store._topic_tail, store._topic_count) = arrays
+        return store
+
+    def _arrays(self):
+        return (self._topic, self._concept, self._time, self._next,
+                self._topic_head, self._topic_tail, self._topic_count)
+
+    def _topic_slots(self, topic_id):
+        """Слоты записей темы от старых к новым"""
+        if topic_id is None:
+            return
+        slot = self._topic_head[topic_id]
+        while slot != -1:
+            yield slot
+            slot = self._next[slot]
+
+    def _topic_id(self, topic):
+        topic_id = self._topic_ids.get(topic)
+        if topic_id is None:
+            topic_id = self._intern(topic, self._topic_names, self._topic_ids)
+            self._topic_head.append(-1)
+            self._topic_tail.append(-1)
+            self._topic_count.append(0)
+        return topic_id
+
+    @staticmethod
+    def _intern(name, names, ids):
+        index = ids.get(name)
+        if index is None:
+            index = ids[name] = len(names)
+            names.append(name)
+        return index
+
+    def _evict(self, slot):
+        """Снятие самой старой записи (она всегда голова списка своей темы)"""
+        topic_id = self._topic[slot]
+        self._topic_head[topic_id] = self._next[slot]
+        self._topic_count[topic_id] -= 1
+        if self._topic_count[topic_id] == 0:
+            self._topic_tail[topic_id] = -1
+
+class AISelfLearner:
+    CONCEPTS = {
+        "Python Syntax": ["Variables", "Functions", "Loops", "Conditionals"],
+        "Data Structures": ["Lists", "Dictionaries", "Tuples", "Sets"],
+        "Algorithms": ["Sorting", "Searching", "Recursion", "Dynamic Programming"]
+    }
+    
+    def __init__(self, scheduler=None, learn_interval=10, total_capacity=1000):
+        self.total_capacity = total_capacity
+        self.knowledge_base = KnowledgeStore(total_capacity)
+        self.learning_progress = 0
+        self.is_learning = False
+        self.learn_interval = learn_interval
+        self.scheduler = scheduler
+        self.last_learn_time = datetime.now()
+        self.learning_topics = [
+            "Python Syntax", "Data Structures", "Algorithms", "Machine Learning",
+            "Web Development", "GUI Programming", "Data Analysis", "OOP Concepts",
+            "Error Handling", "Optimization", "Async Programming", "Design Patterns"
+        ]
+        self._timer = None
+        self._subscribers = []
+        
+    def auto_learn(self):
+        """Автоматическое обучение каждые 10 секунд"""
+        if self._timer is not None:
+            return
+        self.is_learning = True
+        scheduler = self.scheduler or EventScheduler.shared()
+        self._timer = scheduler.schedule(self.learn_interval, self._learn_tick,
+                                         interval=self.learn_interval)
+        self._notify()
+    
+    def _learn_tick(self):
+        """Такт обучения из планировщика"""
+        if self.is_learning:
+            self.learn_new_concept()
+            self.learning_progress += 1
+            self._notify()
+    
+    def subscribe(self, callback):
+        """Подписка на изменения состояния обучения: callback(learner)"""
+        self._subscribers.append(callback)
+    
+    def unsubscribe(self, callback):
+        """Отписка от изменений"""
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+    
+    def _notify(self):
+        for callback in list(self._subscribers):
+            try:
+                callback(self)
+            except Exception as e:
+                print(f"Ошибка подписчика обучения: {e}")
+    
+    def learn_new_concept(self):
+        """Изучение нового концепта"""
+        topic = random.choice(self.learning_topics)
+        concept = random.choice(self.CONCEPTS.get(topic, ["Programming Concept"]))
+        self.last_learn_time = datetime.now()
+        self.knowledge_base.add(topic, concept, self.last_learn_time.timestamp())
+        
+        return f"Изучено: {concept} в {topic}"
+    
+    def save_knowledge(self, path=KNOWLEDGE_PATH):
+        """Сохранение базы знаний и прогресса"""
+        self.knowledge_base.save(path)
+    
+    def load_knowledge(self, path=KNOWLEDGE_PATH):
+        """Загрузка базы знаний, если снимок есть"""
+        if not os.path.exists(path):
+            return False
+        try:
+            store = KnowledgeStore.load(path)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Ошибка загрузки базы знаний: {e}")
+            return False
+        self.knowledge_base = store
+        self.total_capacity = store.capacity
+        self.learning_progress = len(store)
+        self._notify()
+        return True
+    
+    def stop_learning(self):
+        """Остановка обучения"""
+        self.is_learning = False
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._notify()
+
+# Этапы DeepThink: (название, время обдумывания в секундах)
+DEEP_THINK_STAGES = (
+    ("Анализ запроса", 0.0),
+    ("Подбор шаблона", 0.5),
+    ("Построение решения", 1.2),
+    ("Проверка кода", 0.8)
+)
+DEEP_THINK_DELAY = sum(delay for _, delay in DEEP_THINK_STAGES)
+SECTION_BOUNDARY = re.compile(r'\n\n(?=\S)')
+
+def split_code_sections(code):
+    """Разбиение кода на секции верхнего уровня (функции, классы, main)"""
+    sections = []
+    start = 0
+    for match in SECTION_BOUNDARY.finditer(code):
+        sections.append(code[start:match.end()])
+        start = match.end()
+    sections.append(code[start:])
+    return sections
+
+IMPORT_LINE = re.compile(r'^(?:import\s+[\w.]+(?:\s+as\s+\w+)?(?:\s*,\s*[\w.]+(?:\s+as\s+\w+)?)*'
+                         r'|from\s+([\w.]+)\s+import\s+([\w\s,]+))\s*$')
+MAIN_GUARD = re.compile(r'''^if\s+__name__\s*==\s*['"]__main__['"]\s*:\s*$''')
+TOP_LEVEL_NAME = re.compile(r'^(?:def|class)\s+(\w+)', re.M)
+
+def split_fragment(code):
+    """Разбор шаблона: (импорты верхнего уровня, тело, строки блока __main__ без отступа)"""
+    imports, body, main = [], [], []
+    in_main = False
+    for line in code.split('\n'):
+        if in_main:
+            if line and not line[0].isspace():
+                in_main = False
+            else:
+                main.append(line[4:] if line.startswith('    ') else line.strip())
+                continue
+        if MAIN_GUARD.match(line):
+            # Комментарий вроде "# Пример использования" относится к блоку main
+            while body and (body[-1].startswith('#') or not body[-1].strip()):
+                body.pop()
+            in_main = True
+        elif IMPORT_LINE.match(line):
+            imports.append(line.strip())
+        else:
+            body.append(line)
+    return imports, "\n".join(body).strip('\n'), "\n".join(main).strip('\n')
+
+def merge_imports(imports):
+    """Импорты без повторов; from-импорты одного модуля объединяются"""
+    merged = OrderedDict()
+    for line in imports:
+        match = IMPORT_LINE.match(line)
+        if match.group(1):
+            names = merged.setdefault(('from', match.group(1)), [])
+            for name in match.group(2).split(','):
+                name = ' '.join(name.split())
+                if name and name not in names:
+                    names.append(name)
+        else:
+            merged.setdefault(('import', ' '.join(line.split())), None)
+    return [f"from {target} import {', '.join(names)}" if kind == 'from' else target
+            for (kind, target), names in merged.items()]
+
+def compose_fragments(fragments):
+    """Сборка шаблонов [(намерение, код)] в один модуль
+
+    Импорты объединяются, одноименные функции и классы из следующих
+    фрагментов получают суффикс намерения, примеры использования
+    сводятся в один блок __main__; блокирующий mainloop идет последним.
+    """
+    imports, bodies, mains = [], [], []
+    defined = set()
+    for intent, code in fragments:
+        fragment_imports, body, main = split_fragment(code)
+        for name in TOP_LEVEL_NAME.findall(body):
+            if name in defined:
+                pattern = re.compile(rf'\b{re.escape(name)}\b')
+                body = pattern.sub(f"{name}_{intent}", body)
+                main = pattern.sub(f"{name}_{intent}", main)
+        defined.update(TOP_LEVEL_NAME.findall(body))
+        imports.extend(fragment_imports)
+        bodies.append(f"# === {intent} ===\n{body}")
+        if main:
+            mains.append((intent, main))
+    
+    mains.sort(key=lambda item: 'mainloop(' in item[1])
+    parts = []
+    merged = merge_imports(imports)
+    if merged:
+        parts.append("\n".join(merged))
+    parts.extend(bodies)
+    if mains:
+        blocks = []
+        for intent, main in mains:
+            lines = [f"# {intent}"] + main.split('\n')
+            blocks.append("\n".join(f"    {line}" if line else "" for line in lines))
+        parts.append('if __name__ == "__main__":\n' + "\n\n".join(blocks))
+    return "\n\n".join(parts) + "\n"
+
+class RollingHistogram:
+    """Скользящее окно замеров с перцентилями"""
+    def __init__(self, size=512):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def summary(self):
+        """Число замеров и перцентили окна, мс"""
+        ordered = sorted(self.samples)
+        
+        def percentile(p):
+            return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000 if ordered else 0.0
+        
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1000 if self.count else 0.0,
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95),
+            'p99_ms': percentile(0.99)
+        }
+
+class _Span:
+    """Замер длительности этапа в блоке with"""
+    __slots__ = ('trace', 'stage', 'started')
+
+    def __init__(self, trace, stage):
+        self.trace = trace
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.stage, time.perf_counter() - self.started)
+        return False
+
+class Trace:
+    """Трасса одного запроса: длительности этапов от постановки в очередь до вывода"""
+    __slots__ = ('tracer', 'started', 'template', 'spans', 'finished')
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+        self.started = time.perf_counter()
+        self.template = None
+        self.spans = {}
+        self.finished = False
+
+    def span(self, stage):
+        """Контекст замера длительности этапа"""
+        return _Span(self, stage)
+
+    def add(self, stage, seconds):
+        """Длительность этапа (повторные замеры суммируются)"""
+        self.spans[stage] = self.spans.get(stage, 0.0) + seconds
+        self.tracer.observe(stage, seconds)
+
+    def mark(self, stage):
+        """Время от начала трассы до события; учитывается только первое событие
+
+        Запрос, к которому подключились повторно (или объединенный с
+        другим), выводится снова - повторная отметка не в счет.
+        """
+        if stage not in self.spans:
+            self.add(stage, time.perf_counter() - self.started)
+
+    def set_template(self, template):
+        self.template = template
+
+    def finish(self, status='ok'):
+        """Завершение трассы с исходом 'ok', 'error' или 'cancelled' (учитывается один раз)"""
+        if not self.finished:
+            self.finished = True
+            self.tracer.finish(self, status)
+
+class _NullTrace:
+    """Трасса отключенной трассировки: все операции пустые"""
+    __slots__ = ()
+
+    def span(self, stage):
+        return _NULL_SPAN
+
+    def add(self, stage, seconds):
+        pass
+
+    def mark(self, stage):
+        pass
+
+    def set_template(self, template):
+        pass
+
+    def finish(self, status='ok'):
+        pass
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_TRACE = _NullTrace()
+_NULL_SPAN = _NullSpan()
+
+class Tracer:
+    """Трассировка запросов: гистограммы по этапам и по шаблонам
+
+    Гистограмма шаблона считает успешные запросы; отмененные и
+    завершенные ошибкой идут отдельной строкой "шаблон [исход]".
+    При enabled=False start() возвращает пустую трассу, и замеры
+    сводятся к вызову пустого метода.
+    """
+    def __init__(self, enabled=True, window=512):
+        self.enabled = enabled
+        self.window = window
+        self.stages = {}
+        self.templates = {}
+        self.recent = deque(maxlen=100)
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Новая трасса запроса"""
+        return Trace(self) if self.enabled else NULL_TRACE
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = RollingHistogram(self.window)
+            histogram.add(seconds)
+
+    def finish(self, trace, status='ok'):
+        total = time.perf_counter() - trace.started
+        template = trace.template or 'general'
+        key = template if status == 'ok' else f"{template} [{status}]"
+        with self._lock:
+            histogram = self.templates.get(key)
+            if histogram is None:
+                histogram = self.templates[key] = RollingHistogram(self.window)
+            histogram.add(total)
+            self.recent.append({
+                'template': template,
+                'status': status,
+                'total_ms': total * 1000,
+                'spans_ms': {stage: seconds * 1000 for stage, seconds in trace.spans.items()}
+            })
+
+    def snapshot(self):
+        """Сводка по этапам, шаблонам и последним запросам"""
+        with self._lock:
+            return {
+                'stages': {stage: h.summary() for stage, h in self.stages.items()},
+                'templates': {template: h.summary() for template, h in self.templates.items()},
+                'recent': list(self.recent)
+            }
+
+    def dump(self, path):
+        """Сохранение сводки в JSON"""
+        import json
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+
+class CodePlan:
+    """План генерации: маршрут, код и этапы выдачи секций"""
+    def __init__(self, prompt, deep_think, route, code, cached=False, trace=NULL_TRACE,
+                 compose=False, fingerprint=""):
+        self.prompt = prompt
+        self.deep_think = deep_think
+        self.compose = compose
+        self.fingerprint = fingerprint
+        self.route = route
+        self.code = code
+        self.cached = cached
+        self.trace = trace
+        self.stage = None
+        self.started = time.perf_counter()
+        self.stages = self._split_stages(split_code_sections(code))
+
+    def _split_stages(self, sections):
+        """Секции по этапам: [(этап, пауза, [секции])]"""
+        if not self.deep_think or self.cached:
+            return [(None, 0.0, sections)]
+        # Первая секция выдается сразу, остальные - по мере обдумывания
+        stages = [(DEEP_THINK_STAGES[0][0], DEEP_THINK_STAGES[0][1], sections[:1])]
+        rest = sections[1:]
+        count = len(DEEP_THINK_STAGES) - 1
+        for index, (stage, delay) in enumerate(DEEP_THINK_STAGES[1:]):
+            part = rest[len(rest) * index // count:len(rest) * (index + 1) // count]
+            stages.append((stage, delay, part))
+        return stages
+
+class CodeStream:
+    """Поток фрагментов кода с замером времени до первого фрагмента"""
+    def __init__(self, chunks, route=None, cached=False, plan=None):
+        self._chunks = chunks
+        self.route = route
+        self.cached = cached
+        self.plan = plan
+        self.started = time.perf_counter()
+        self.first_chunk_time = None
+        self.total_time = None
+
+    @property
+    def stage(self):
+        """Текущий этап DeepThink"""
+        return self.plan.stage if self.plan is not None else None
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            if self.first_chunk_time is None:
+                self.first_chunk_time = time.perf_counter() - self.started
+            yield chunk
+        self.total_time = time.perf_counter() - self.started
+
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".vurtixai", "cache.sqlite3")
+PROMPT_NOISE = re.compile(r'[^\w\s]+')
+
+def normalize_prompt(prompt):
+    """Нормализация запроса: регистр, пробелы и пунктуация не различаются"""
+    return " ".join(PROMPT_NOISE.sub(" ", prompt.lower()).split())
+
+class ResponseCache:
+    """Кэш ответов: LRU в памяти и SQLite на диске
+
+    Ключ - нормализованный запрос, режим (обычный/DeepThink) и отпечаток
+    маршрутизации: после смены шаблонов, описаний или наборов на диске
+    старые записи не находятся и вытесняются по давности. Дисковый
+    уровень переживает перезапуск, ограничен по числу записей и возрасту;
+    при открытии самые свежие записи подгружаются в память. Возраст
+    проверяется и при попадании в память; время использования таких
+    попаданий копится и пишется на диск пачкой (не реже чем через
+    TOUCH_BATCH попаданий, при записи и при закрытии).
+    """
+    TOUCH_BATCH = 64
+
+    def __init__(self, path=None, memory_size=128, max_entries=5000,
+                 max_age=7 * 24 * 3600, warm_size=32):
+        self.path = path
+        self.memory_size = memory_size
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.hit_time = 0.0
+        self.miss_time = 0.0
+        self._memory = OrderedDict()       # ключ -> (route, code, created)
+        self._touched = {}                  # ключ -> время попадания в память, еще не на диске
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._db = None
+        if path:
+            import sqlite3
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("""CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY, route TEXT, code TEXT NOT NULL,
+                created REAL NOT NULL, accessed REAL NOT NULL)""")
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+            self._evict_disk()
+            self._warm_start(warm_size)
+
+    @staticmethod
+    def make_key(prompt, deep_think=False, compose=False, fingerprint=""):
+        """Ключ кэша: режим, отпечаток маршрутизации и нормализованный запрос"""
+        mode = "deepthink:" if deep_think else "normal:"
+        if compose:
+            mode += "compose:"
+        if fingerprint:
+            mode += fingerprint + ":"
+        return mode + normalize_prompt(prompt)
+
+    def get(self, prompt, deep_think=False, compose=False, fingerprint=""):
+        """Поиск ответа: (route, code) или None"""
+        key = self.make_key(prompt, deep_think, compose, fingerprint)
+        with self._lock:
+            now = time.time()
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[2] <= self.max_age:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    if self._db is not None:
+                        self._touched[key] = now
+                        if len(self._touched) >= self.TOUCH_BATCH:
+                            self._flush_touched()
+                    return entry[:2]
+                del self._memory[key]
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT route, code, created FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None and now - row[2] <= self.max_age:
+                    self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    self._remember(key, row)
+                    self.disk_hits += 1
+                    return row[:2]
+            self.misses += 1
+            return None
+
+    def put(self, prompt, deep_think, route, code, compose=False, fingerprint=""):
+        """Сохранение ответа в оба уровня"""
+        key = self.make_key(prompt, deep_think, compose, fingerprint)
+        now = time.time()
+        with self._lock:
+            self._remember(key, (route, code, now))
+            if self._db is not None:
+                self._touched.pop(key, None)
+                self._flush_touched(commit=False)
+                self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                                 (key, route, code, now, now))
+                self._db.commit()
+                self._puts += 1
+                if self._puts % 64 == 0:
+                    self._evict_disk()
+
+    def record(self, cached, seconds):
+        """Учет времени ответа для сравнения попаданий и промахов"""
+        with self._lock:
+            if cached:
+                self.hit_time += seconds
+            else:
+                self.miss_time += seconds
+
+    def stats(self):
+        """Счетчики попаданий и промахов"""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': hits / (hits + self.misses) if hits + self.misses else 0.0,
+                'avg_hit_time': self.hit_time / hits if hits else 0.0,
+                'avg_miss_time': self.miss_time / self.misses if self.misses else 0.0,
+                'memory_entries': len(self._memory)
+            }
+
+    def clear(self):
+        """Очистка обоих уровней"""
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def close(self):
+        """Закрытие дискового уровня"""
+        with self._lock:
+            if self._db is not None:
+                self._flush_touched()
+                self._db.close()
+                self._db = None
+
+    def _remember(self, key, entry):
+        """Запись в LRU с вытеснением самых давних"""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _flush_touched(self, commit=True):
+        """Запись на диск времени попаданий в память"""
+        if self._touched:
+            self._db.executemany("UPDATE responses SET accessed = ? WHERE key = ?",
+                                 [(accessed, key) for key, accessed in self._touched.items()])
+            self._touched.clear()
+            if commit:
+                self._db.commit()
+
+    def _evict_disk(self):
+        """Удаление устаревших записей и лишних по давности использования"""
+        self._flush_touched(commit=False)
+        self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.max_age,))
+        self._db.execute("""DELETE FROM responses WHERE key IN (
+            SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)""",
+                         (self.max_entries,))
+        self._db.commit()
+
+    def _warm_start(self, warm_size):
+        """Подгрузка самых свежих записей в память"""
+        rows = self._db.execute(
+            "SELECT key, route, code, created FROM responses ORDER BY accessed DESC LIMIT ?",
+            (min(warm_size, self.memory_size),)).fetchall()
+        for key, route, code, created in reversed(rows):
+            self._memory[key] = (route, code, created)
+
+HISTORY_TOKEN = re.compile(r'\w{2,}')
+
+class HistoryEntry:
+    """Запись истории; код хранится в HistoryStore один раз на одинаковые ответы"""
+    __slots__ = ('id', 'prompt', 'route', 'deep_think', 'compose', 'created', 'digest')
+
+    def __init__(self, entry_id, prompt, route, deep_think, compose, digest):
+        self.id = entry_id
+        self.prompt = prompt
+        self.route = route
+        self.deep_think = deep_think
+        self.compose = compose
+        self.created = time.time()
+        self.digest = digest
+
+class HistoryStore:
+    """История запросов сессии с ограничением по памяти
+
+    Записи вытесняются от старых к новым, когда суммарный объем запросов
+    и уникальных ответов превышает byte_budget. Одинаковые ответы хранятся
+    один раз со счетчиком ссылок. Обратный индекс по словам запросов и
+    ответов дает поиск без перебора записей: слова индекса хранятся еще и
+    в отсортированных списках, и префикс ищется двоичным поиском.
+
+    В объем входит и оценка памяти самого индекса: TERM_OVERHEAD на слово
+    (строка, множество, ячейки словаря и списка) и POSTING_OVERHEAD на
+    элемент множества.
+    """
+    ENTRY_OVERHEAD = 256
+    TERM_OVERHEAD = 320
+    POSTING_OVERHEAD = 40
+
+    def __init__(self, byte_budget=32 * 1024 * 1024, max_entries=100_000):
+        self.byte_budget = byte_budget
+        self.max_entries = max_entries
+        self.size = 0
+        self._entries = OrderedDict()       # id -> HistoryEntry, от старых к новым
+        self._outputs = {}                  # digest -> [код, число ссылок]
+        self._prompt_index = {}             # слово -> {id}
+        self._output_index = {}             # слово -> {digest}
+        self._prompt_terms = []             # слова _prompt_index по возрастанию
+        self._output_terms = []             # слова _output_index по возрастанию
+        self._by_output = {}                # digest -> {id}
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, prompt, code, route=None, deep_think=False, compose=False):
+        """Запись результата; возвращает HistoryEntry"""
+        import hashlib
+        digest = hashlib.blake2b(code.encode('utf-8'), digest_size=16).digest()
+        with self._lock:
+            entry = HistoryEntry(self._next_id, prompt, route, deep_think, compose, digest)
+            self._next_id += 1
+            self._entries[entry.id] = entry
+            self.size += len(prompt.encode('utf-8')) + self.ENTRY_OVERHEAD
+            for token in self._tokens(prompt):
+                self._index_add(self._prompt_index, self._prompt_terms, token, entry.id)
+            
+            output = self._outputs.get(digest)
+            if output is None:
+                self._outputs[digest] = [code, 1]
+                self._by_output[digest] = set()
+                self.size += len(code.encode('utf-8')) + self.TERM_OVERHEAD
+                for token in self._tokens(code):
+                    self._index_add(self._output_index, self._output_terms, token, digest)
+            else:
+                output[1] += 1
+            self._by_output[digest].add(entry.id)
+            self.size += self.POSTING_OVERHEAD
+            
+            # Новая запись не вытесняется: запись больше byte_budget живет до следующей
+            while len(self._entries) > 1 and (self.size > self.byte_budget or
+                                              len(self._entries) > self.max_entries):
+                self._evict()
+            return entry
+
+    def get(self, entry_id):
+        """Запись по номеру или None"""
+        with self._lock:
+            return self._entries.get(entry_id)
+
+    def code(self, entry):
+        """Код записи без повторной генерации"""
+        with self._lock:
+            output = self._outputs.get(entry.digest)
+            return output[0] if output else None
+
+    def recent(self, limit=100):
+        """Последние записи, новые первыми"""
+        with self._lock:
+            entries = []
+            for entry_id in reversed(self._entries):
+                if len(entries) >= limit:
+                    break
+                entries.append(self._entries[entry_id])
+            return entries
+
+    def search(self, query, limit=100):
+        """Записи, где в запросе или ответе есть все слова query (слово - префикс)"""
+        tokens = self._tokens(query)
+        if not tokens:
+            return self.recent(limit)
+        with self._lock:
+            matches = None
+            for token in sorted(tokens, key=len, reverse=True):
+                ids = self._lookup(token)
+                matches = ids if matches is None else matches & ids
+                if not matches:
+                    return []
+            return [self._entries[entry_id] for entry_id in sorted(matches, reverse=True)[:limit]]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'unique_outputs': len(self._outputs),
+                'bytes': self.size,
+                'byte_budget': self.byte_budget,
+                'terms': len(self._prompt_index) + len(self._output_index)
+            }
+
+    def _lookup(self, token):
+        """Номера записей со словом, начинающимся с token"""
+        ids = set()
+        for term in self._prefixed(self._prompt_terms, token):
+            ids |= self._prompt_index[term]
+        for term in self._prefixed(self._output_terms, token):
+            for digest in self._output_index[term]:
+                ids |= self._by_output[digest]
+        return ids
+
+    @staticmethod
+    def _prefixed(terms, prefix):
+        """Слова отсортированного списка terms, начинающиеся с prefix"""
+        index = bisect.bisect_left(terms, prefix)
+        while index < len(terms) and terms[index].startswith(prefix):
+            yield terms[index]
+            index += 1
+
+    def _index_add(self, index, terms, token, key):
+        keys = index.get(token)
+        if keys is None:
+            keys = index[token] = set()
+            bisect.insort(terms, token)
+            self.size += self.TERM_OVERHEAD + len(token)
+        keys.add(key)
+        self.size += self.POSTING_OVERHEAD
+
+    def _index_remove(self, index, terms, token, key):
+        keys = index[token]
+        keys.discard(key)
+        self.size -= self.POSTING_OVERHEAD
+        if not keys:
+            del index[token]
+            del terms[bisect.bisect_left(terms, token)]
+            self.size -= self.TERM_OVERHEAD + len(token)
+
+    def _evict(self):
+        """Вытеснение самой старой записи"""
+        _, entry = self._entries.popitem(last=False)
+        self.size -= len(entry.prompt.encode('utf-8')) + self.ENTRY_OVERHEAD
+        for token in self._tokens(entry.prompt):
+            self._index_remove(self._prompt_index, self._prompt_terms, token, entry.id)
+        
+        self._by_output[entry.digest].discard(entry.id)
+        self.size -= self.POSTING_OVERHEAD
+        output = self._outputs[entry.digest]
+        output[1] -= 1
+        if output[1] == 0:
+            del self._outputs[entry.digest]
+            del self._by_output[entry.digest]
+            self.size -= len(output[0].encode('utf-8')) + self.TERM_OVERHEAD
+            for token in self._tokens(output[0]):
+                self._index_remove(self._output_index, self._output_terms, token, entry.digest)
+
+    @staticmethod
+    def _tokens(text):
+        return set(HISTORY_TOKEN.findall(text.lower()))
+
+class Exporter:
+    """Потоковый экспорт кода и истории на диск в фоновом потоке
+
+    Данные пишутся по одной записи (код - блоками TextBuffer) через
+    буферизованный файл, поэтому объем памяти не зависит от объема
+    экспорта. Форматы истории: 'jsonl' - один файл, 'zip' - архив с
+    файлом на запись и index.jsonl, 'files' - файл на запись в каталоге.
+    on_progress(готово, всего, байт) и on_done(путь, записей, байт, сек,
+    ошибка, прерван) вызываются из фонового потока; on_done - всегда,
+    при любом исходе.
+    """
+    FORMATS = ('jsonl', 'zip', 'files')
+
+    def __init__(self, history, on_progress=None, on_done=None,
+                 buffer_size=1 << 20, progress_interval=0.1):
+        self.history = history
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.buffer_size = buffer_size
+        self.progress_interval = progress_interval
+        self._thread = None
+        self._cancel = threading.Event()
+        self._reported = 0.0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def export_code(self, chunks, path):
+        """Экспорт кода, переданного последовательностью фрагментов, в один файл"""
+        self._start(self._write_code, list(chunks), path)
+
+    def export_history(self, entries, path, fmt='jsonl'):
+        """Экспорт записей истории в формате fmt"""
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Неизвестный формат экспорта: {fmt}")
+        self._start(getattr(self, f"_write_{fmt}"), list(entries), path)
+
+    def cancel(self):
+        """Прерывание экспорта; уже записанная часть остается на диске"""
+        self._cancel.set()
+
+    def wait(self, timeout=None):
+        """Ожидание завершения фонового потока; True - поток завершился"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return not self.running
+
+    def _start(self, writer, items, path):
+        if self.running:
+            raise RuntimeError("Экспорт уже выполняется")
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(writer, items, path),
+                                        name="vurtix-export", daemon=True)
+        self._thread.start()
+
+    def _run(self, writer, items, path):
+        started = time.perf_counter()
+        self._reported = 0.0
+        done, written, error, cancelled = 0, 0, None, False
+        steps = writer(items, path)
+        try:
+            for done, written in steps:
+                self._progress(done, len(items), written)
+                if self._cancel.is_set():
+                    cancelled = True
+                    break
+        except Exception as e:
+            error = e
+        finally:
+            # Закрытие генератора закрывает и файл экспорта
+            steps.close()
+        if self.on_progress:
+            self.on_progress(done, len(items), written)
+        if self.on_done:
+            self.on_done(path, done, written, time.perf_counter() - started, error, cancelled)
+
+    def _progress(self, done, total, written):
+        """Отчет о прогрессе не чаще progress_interval"""
+        now = time.perf_counter()
+        if self.on_progress and now - self._reported >= self.progress_interval:
+            self._reported = now
+            self.on_progress(done, total, written)
+
+    def _write_code(self, chunks, path):
+        written = 0
+        with open(path, 'wb', buffering=self.buffer_size) as file:
+            for index, chunk in enumerate(chunks, 1):
+                written += file.write(chunk.encode('utf-8'))
+                yield index, written
+
+    def _records(self, entries):
+        """(номер, запись, код) для записей, код которых еще не вытеснен"""
+        for index, entry in enumerate(entries, 1):
+            code = self.history.code(entry)
+            if code is not None:
+                yield index, entry, code
+
+    def _write_jsonl(self, entries, path):
+        import json
+        written = 0
+        with open(path, 'wb', buffering=self.buffer_size) as file:
+            for index, entry, code in self._records(entries):
+                line = json.dumps(self._metadata(entry, code=code), ensure_ascii=False) + "\n"
+                written += file.write(line.encode('utf-8'))
+                yield index, written
+
+    def _write_zip(self, entries, path):
+        import json
+        import tempfile
+        import zipfile
+        written = 0
+        # Индекс копится во временном файле, а не в памяти, и добавляется в конце
+        with tempfile.TemporaryFile() as index_file, \
+                zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+            for index, entry, code in self._records(entries):
+                name = self._file_name(entry)
+                data = self._file_content(entry, code).encode('utf-8')
+                archive.writestr(name, data)
+                written += len(data)
+                index_file.write((json.dumps(self._metadata(entry, file=name), ensure_ascii=False)
+                                  + "\n").encode('utf-8'))
+                yield index, written
+            index_file.seek(0)
+            with archive.open('index.jsonl', 'w') as member:
+                while True:
+                    block = index_file.read(self.buffer_size)
+                    if not block:
+                        break
+                    member.write(block)
+
+    def _write_files(self, entries, path):
+        os.makedirs(path, exist_ok=True)
+        written = 0
+        for index, entry, code in self._records(entries):
+            with open(os.path.join(path, self._file_name(entry)), 'wb') as file:
+                written += file.write(self._file_content(entry, code).encode('utf-8'))
+            yield index, written
+
+    @staticmethod
+    def _metadata(entry, **extra):
+        return dict({
+            'id': entry.id,
+            'created': datetime.fromtimestamp(entry.created).isoformat(timespec='seconds'),
+            'prompt': entry.prompt,
+            'route': entry.route,
+            'deep_think': entry.deep_think,
+            'compose': entry.compose
+        }, **extra)
+
+    @staticmethod
+    def _file_name(entry):
+        slug = re.sub(r'\W+', '_', entry.prompt.lower()).strip('_')[:40] or 'entry'
+        return f"{entry.id:06d}_{slug}.py"
+
+    @staticmethod
+    def _file_content(entry, code):
+        prompt = " ".join(entry.prompt.split())
+        return f"# Запрос: {prompt}\n# Шаблон: {entry.route or 'general'}\n\n{code}"
+
+class IntentIndex:
+    """Индекс ключевых слов намерений (автомат Ахо-Корасик)
+
+    Строится один раз из реестра шаблонов и находит все ключевые слова
+    за один проход по запросу, независимо от их количества. Счет намерения -
+    суммарная длина найденных слов; при равенстве выигрывает более раннее
+    намерение реестра.
+    """
+    def __init__(self, keywords):
+        self.intents = list(keywords)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for priority, words in enumerate(keywords.values()):
+            for word in words:
+                self._add(word.lower(), priority)
+        self._build()
+
+    def _add(self, word, priority):
+        """Добавление слова в бор"""
+        node = 0
+        for char in word:
+            child = self._goto[node].get(char)
+            if child is None:
+                child = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+                self._goto[node][char] = child
+            node = child
+        self._out[node] += ((priority, len(word)),)
+
+    def _build(self):
+        """Построение суффиксных ссылок обходом в ширину"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._out[child] += self._out[self._fail[child]]
+
+    def scores(self, text):
+        """Счет каждого намерения (по приоритету) за один проход"""
+        goto, fail, out = self._goto, self._fail, self._out
+        hits = {}
+        node = 0
+        for char in text.lower():
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for priority, length in out[node]:
+                hits[priority] = hits.get(priority, 0) + length
+        return hits
+
+    def rank(self, text):
+        """Все найденные намерения по убыванию счета"""
+        hits = self.scores(text)
+        ranked = sorted(hits.items(), key=lambda item: (-item[1], item[0]))
+        return [(self.intents[priority], score) for priority, score in ranked]
+
+    def best(self, text):
+        """Лучшее намерение или None"""
+        ranked = self.rank(text)
+        return ranked[0][0] if ranked else None
+
+TEMPLATE_PACK_DIR = os.path.join(os.path.expanduser("~"), ".vurtixai", "packs")
+PACK_WORD = re.compile(r'\w+')
+
+class FuzzyRouter:
+    """Нечеткая маршрутизация по символьным триграммам (TF-IDF на NumPy)
+
+    Описания маршрутов разбиваются на слова-термины; термин - вектор
+    TF-IDF триграмм слова с пробелами по краям (" сор", "орт", ...,
+    "ка "), нормированный по длине. Триграмма кодируется в int64 из
+    трех кодовых точек, поэтому коллизий хеша нет. Сходство слова
+    запроса с термином - косинус векторов: опечатка "factoral" и
+    "factorial" дают около 0.7, несвязанные слова - меньше 0.3.
+
+    Матрица терминов хранится по столбцам: отсортированные триграммы,
+    границы списков и пары (термин, вес). Пакет запросов оценивается
+    одним разреженным произведением матрицы слов запросов на матрицу
+    терминов средствами NumPy, без циклов Python по словам и терминам.
+    Триграммы, входящие более чем в max_postings терминов (по
+    умолчанию 2% словаря, но не меньше 256), в произведении не
+    участвуют - вес по IDF у них и так мал, - но учитываются в норме
+    слова. Сходства считаются блоками слов: блок - плотная матрица
+    слов на термины не больше block_size ячеек, так что память не
+    растет с размером пакета.
+
+    Счет маршрута для запроса - наибольшее сходство слова запроса с
+    термином маршрута; ниже threshold совпадения нет. Лучшие термины
+    уже оцененных слов хранятся в кэше на cache_size слов: в запросах
+    одни и те же слова повторяются постоянно.
+    """
+    MIN_WORD = 3
+    THRESHOLD = 0.55
+
+    def __init__(self, descriptions, threshold=THRESHOLD, max_postings=None, block_size=1 << 22,
+                 cache_size=1 << 16):
+        import numpy as np
+        self._np = np
+        self.threshold = threshold
+        self.block_size = block_size
+        self.cache_size = cache_size
+        self._word_cache = {}
+        self.routes = list(descriptions)
+        term_ids = {}
+        term_routes = []
+        for route_id, route in enumerate(self.routes):
+            for phrase in descriptions[route]:
+                for word in PACK_WORD.findall(phrase.lower()):
+                    # Общий термин достается маршруту, описанному раньше
+                    if word not in term_ids:
+                        term_ids[word] = len(term_ids)
+                        term_routes.append(route_id)
+        self.terms = list(term_ids)
+        self._term_routes = np.array(term_routes, dtype=np.int64)
+        
+        term_of, keys, counts = self._count(*self._grams(self.terms))
+        grams, gram_of = np.unique(keys, return_inverse=True)
+        df = np.bincount(gram_of, minlength=len(grams))
+        idf = np.log((1 + len(self.terms)) / (1 + df)) + 1
+        weights = counts * idf[gram_of]
+        norms = np.sqrt(np.bincount(term_of, weights * weights, minlength=len(self.terms)))
+        weights /= norms[term_of]
+        order = np.argsort(gram_of, kind='stable')
+        self._gram_keys = grams
+        self._idf = idf
+        self._unseen_idf = float(np.log1p(len(self.terms))) + 1
+        self._indptr = np.concatenate(([0], np.cumsum(df)))
+        self._postings = term_of[order]
+        self._weights = weights[order]
+        if max_postings is None:
+            max_postings = max(256, len(self.terms) // 50)
+        self._frequent = df > max_postings
+
+    def __len__(self):
+        return len(self.terms)
+
+    def _grams(self, words):
+        """Триграммы слов: (номер слова, код триграммы) для каждой"""
+        np = self._np
+        text = "".join(f" {word} " for word in words)
+        codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+        keys = (codes[:-2] << 42) | (codes[1:-1] << 21) | codes[2:]
+        # Средний символ - не пробел: триграмма не пересекает границу слов
+        inside = codes[1:-1] != 32
+        lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+        return np.repeat(np.arange(len(words)), lengths), keys[inside]
+
+    def _count(self, word_of, keys):
+        """Слияние повторов триграммы в слове: (слово, триграмма, tf)"""
+        np = self._np
+        order = np.lexsort((keys, word_of))
+        word_of, keys = word_of[order], keys[order]
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = (keys[1:] != keys[:-1]) | (word_of[1:] != word_of[:-1])
+        starts = np.flatnonzero(first)
+        counts = np.diff(np.append(starts, len(keys))).astype(np.float64)
+        return word_of[starts], keys[starts], counts
+
+    def _match_words(self, words):
+        """Лучший термин каждого слова: массивы (номер маршрута или -1, сходство)"""
+        np = self._np
+        routes = np.full(len(words), -1, dtype=np.int64)
+        scores = np.zeros(len(words))
+        if not words or not len(self._gram_keys):
+            return routes, scores
+        word_of, keys, tf = self._count(*self._grams(words))
+        index = np.searchsorted(self._gram_keys, keys)
+        index[index == len(self._gram_keys)] = 0
+        found = self._gram_keys[index] == keys
+        weights = tf * np.where(found, self._idf[index], self._unseen_idf)
+        norms = np.sqrt(np.bincount(word_of, weights * weights, minlength=len(words)))
+        weights /= norms[word_of]
+        
+        # Разреженное произведение: все пары (слово, термин) с общей триграммой
+        joined = found & ~self._frequent[index]
+        word_of, index, weights = word_of[joined], index[joined], weights[joined]
+        starts = self._indptr[index]
+        counts = self._indptr[index + 1] - starts
+        rows = max(1, self.block_size // len(self.terms))
+        bounds = np.searchsorted(word_of, np.arange(0, len(words) + rows, rows))
+        for block, (low, high) in enumerate(zip(bounds[:-1], bounds[1:])):
+            first = block * rows
+            self._score_block(first, min(rows, len(words) - first), word_of[low:high] - first,
+                              starts[low:high], counts[low:high], weights[low:high],
+                              routes, scores)
+        return routes, scores
+
+    def _score_block(self, first, size, word_of, starts, counts, weights, routes, scores):
+        """Сходства блока слов со всеми терминами и выбор лучшего термина слова"""
+        np = self._np
+        terms = len(self.terms)
+        ends = np.cumsum(counts)
+        positions = np.repeat(starts - (ends - counts), counts) + np.arange(ends[-1] if len(ends) else 0)
+        cells = np.repeat(word_of * terms, counts) + self._postings[positions]
+        similarity = np.bincount(cells, np.repeat(weights, counts) * self._weights[positions],
+                                 minlength=size * terms).reshape(size, terms)
+        # argmax берет первый максимум: при равенстве побеждает термин раньше по порядку
+        best = similarity.argmax(axis=1)
+        block_scores = similarity[np.arange(size), best]
+        scores[first:first + size] = block_scores
+        routes[first:first + size] = np.where(block_scores > 0, self._term_routes[best], -1)
+
+    def _words(self, prompt):
+        return {word for word in PACK_WORD.findall(prompt.lower()) if len(word) >= self.MIN_WORD}
+
+    def _word_matches(self, words):
+        """{слово: (номер маршрута или -1, сходство)}; оцененные слова берутся из кэша"""
+        cache = self._word_cache
+        matches = {}
+        missing = []
+        for word in words:
+            match = cache.get(word)
+            if match is None:
+                missing.append(word)
+            else:
+                matches[word] = match
+        if missing:
+            routes, scores = self._match_words(missing)
+            computed = dict(zip(missing, zip(routes.tolist(), scores.tolist())))
+            matches.update(computed)
+            if self.cache_size:
+                if len(cache) + len(computed) > self.cache_size:
+                    cache.clear()
+                cache.update(computed)
+        return matches
+
+    def match_batch(self, prompts):
+        """Лучший маршрут каждого запроса: [(маршрут, сходство) или None]"""
+        word_sets = [self._words(prompt) for prompt in prompts]
+        matches = self._word_matches(set().union(*word_sets))
+        results = []
+        for words in word_sets:
+            route_id, score = max((matches[word] for word in words),
+                                  key=lambda match: (match[1], -match[0]), default=(-1, 0.0))
+            if route_id >= 0 and score >= self.threshold:
+                results.append((self.routes[route_id], score))
+            else:
+                results.append(None)
+        return results
+
+    def rank(self, prompt):
+        """Все маршруты выше порога по убыванию сходства: [(маршрут, сходство)]"""
+        best = {}
+        for route_id, score in self._word_matches(self._words(prompt)).values():
+            if route_id >= 0 and score >= self.threshold and score > best.get(route_id, 0):
+                best[route_id] = score
+        ranked = sorted(best.items(), key=lambda item: (-item[1], item[0]))
+        return [(self.routes[route_id], score) for route_id, score in ranked]
+
+    def best(self, prompt):
+        """(маршрут, сходство) или None - ниже порога"""
+        return self.match_batch([prompt])[0]
+
+class TemplatePack:
+    """Набор шаблонов на диске с индексом, отображаемым в память
+
+    Файл .vtp: заголовок, таблица шаблонов (смещение и длина тела,
+    имя), хеш-таблица с открытой адресацией (ключевое слово или имя ->
+    список номеров шаблонов), списки номеров, строки и тела в UTF-8.
+    При открытии читается только заголовок: индекс используется прямо
+    из mmap, тело шаблона читается и декодируется при первом обращении
+    и хранится в LRU на cache_size тел. Время открытия и память не
+    зависят от числа шаблонов в наборе.
+
+    Ключевые слова сопоставляются с началом слов запроса (не короче
+    min_prefix символов), счет шаблона - суммарная длина совпадений.
+    """
+    MAGIC = b'VTP1'
+    HEADER = struct.Struct('<4sIIIQQQQ')    # магия, шаблонов, слотов, номеров, смещения таблиц
+    TEMPLATE = struct.Struct('<QIII')       # тело: смещение, длина; имя: смещение, длина
+    SLOT = struct.Struct('<IIHBxII')        # crc32, смещение слова, длина, вид, начало и число номеров
+    KIND_KEYWORD, KIND_NAME = 1, 2
+
+    def __init__(self, path, cache_size=64, min_prefix=3):
+        import mmap
+        self.path = path
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        self.cache_size = cache_size
+        self.min_prefix = min_prefix
+        self._bodies = OrderedDict()
+        self._lock = threading.Lock()
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self._count, self._slots, _, self._table_offset, self._slots_offset,
+         self._postings_offset, self._strings_offset) = self.HEADER.unpack_from(self._map)
+        if magic != self.MAGIC:
+            self._map.close()
+            raise ValueError(f"Неизвестный формат набора шаблонов: {path}")
+        self._mask = self._slots - 1
+
+    def __len__(self):
+        return self._count
+
+    @classmethod
+    def build(cls, path, templates):
+        """Сборка набора из [(имя, ключевые слова, тело)]"""
+        entries = []
+        strings = bytearray()
+        string_ids = {}
+        
+        def intern(text):
+            data = text.encode('utf-8')
+            if data not in string_ids:
+                string_ids[data] = len(strings)
+                strings.extend(data)
+            return string_ids[data], len(data)
+        
+        bodies = []
+        words = {}                          # (слово, вид) -> [номера шаблонов]
+        for template_id, (name, keywords, body) in enumerate(templates):
+            entries.append(intern(name))
+            bodies.append(body.encode('utf-8'))
+            words.setdefault((name.lower(), cls.KIND_NAME), []).append(template_id)
+            for keyword in {keyword.lower() for keyword in keywords if keyword}:
+                words.setdefault((keyword, cls.KIND_KEYWORD), []).append(template_id)
+        
+        slot_count = 1
+        while slot_count < len(words) * 2:
+            slot_count *= 2
+        slots = [None] * slot_count
+        postings = array('I')
+        for (word, kind), template_ids in words.items():
+            crc = zlib.crc32(word.encode('utf-8'))
+            offset, length = intern(word)
+            index = crc & (slot_count - 1)
+            while slots[index] is not None:
+                index = (index + 1) & (slot_count - 1)
+            slots[index] = (crc, offset, length, kind, len(postings), len(template_ids))
+            postings.extend(template_ids)
+        if sys.byteorder != 'little':
+            postings.byteswap()
+        
+        table_offset = cls.HEADER.size
+        slots_offset = table_offset + cls.TEMPLATE.size * len(entries)
+        postings_offset = slots_offset + cls.SLOT.size * slot_count
+        strings_offset = postings_offset + postings.itemsize * len(postings)
+        body_offset = strings_offset + len(strings)
+        
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, len(entries), slot_count, len(postings),
+                                    table_offset, slots_offset, postings_offset, strings_offset))
+            for (name_offset, name_length), body in zip(entries, bodies):
+                f.write(cls.TEMPLATE.pack(body_offset, len(body), name_offset, name_length))
+                body_offset += len(body)
+            empty = cls.SLOT.pack(0, 0, 0, 0, 0, 0)
+            for slot in slots:
+                f.write(empty if slot is None else cls.SLOT.pack(*slot))
+            postings.tofile(f)
+            f.write(strings)
+            for body in bodies:
+                f.write(body)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def build_from_directory(cls, source, path):
+        """Сборка набора из каталога *.py: имя - имя файла,
+        ключевые слова - первая строка вида "# keywords: a, b"
+        """
+        templates = []
+        for file_name in sorted(os.listdir(source)):
+            if not file_name.endswith('.py'):
+                continue
+            with open(os.path.join(source, file_name), encoding='utf-8') as f:
+                body = f.read()
+            keywords = ()
+            first, _, rest = body.partition('\n')
+            if first.startswith('# keywords:'):
+                keywords = [word.strip() for word in first.split(':', 1)[1].split(',')]
+                body = rest
+            templates.append((file_name[:-3], keywords, body))
+        return cls.build(path, templates)
+
+    def template_name(self, template_id):
+        _, _, offset, length = self.TEMPLATE.unpack_from(
+            self._map, self._table_offset + template_id * self.TEMPLATE.size)
+        start = self._strings_offset + offset
+        return self._map[start:start + length].decode('utf-8')
+
+    def find(self, name):
+        """Номер шаблона по имени или None"""
+        template_ids = self._lookup(name.lower(), self.KIND_NAME)
+        return template_ids[0] if template_ids else None
+
+    def body(self, template_id):
+        """Текст шаблона: при первом обращении читается из файла"""
+        with self._lock:
+            body = self._bodies.get(template_id)
+            if body is not None:
+                self._bodies.move_to_end(template_id)
+                return body
+        offset, length, _, _ = self.TEMPLATE.unpack_from(
+            self._map, self._table_offset + template_id * self.TEMPLATE.size)
+        body = self._map[offset:offset + length].decode('utf-8')
+        with self._lock:
+            self._bodies[template_id] = body
+            if len(self._bodies) > self.cache_size:
+                self._bodies.popitem(last=False)
+        return body
+
+    def render(self, name):
+        """Текст шаблона по имени или None"""
+        template_id = self.find(name)
+        return None if template_id is None else self.body(template_id)
+
+    def scores(self, text):
+        """Счет шаблонов по ключевым словам: {номер: суммарная длина совпадений}"""
+        hits = {}
+        for word in set(PACK_WORD.findall(text.lower())):
+            for end in range(self.min_prefix, len(word) + 1):
+                for template_id in self._lookup(word[:end], self.KIND_KEYWORD):
+                    hits[template_id] = hits.get(template_id, 0) + end
+        return hits
+
+    def best(self, text):
+        """(имя, счет) лучшего шаблона или None"""
+        hits = self.scores(text)
+        if not hits:
+            return None
+        template_id = min(hits, key=lambda key: (-hits[key], key))
+        return self.template_name(template_id), hits[template_id]
+
+    def close(self):
+        self._bodies.clear()
+        self._map.close()
+
+    def _lookup(self, word, kind):
+        """Номера шаблонов со словом word данного вида (пустой кортеж, если нет)"""
+        data = word.encode('utf-8')
+        crc = zlib.crc32(data)
+        index = crc & self._mask
+        while True:
+            slot_crc, offset, length, slot_kind, start, count = self.SLOT.unpack_from(
+                self._map, self._slots_offset + index * self.SLOT.size)
+            if not slot_kind:
+                return ()
+            if slot_crc == crc and slot_kind == kind and length == len(data):
+                position = self._strings_offset + offset
+                if self._map[position:position + length] == data:
+                    return struct.unpack_from(f'<{count}I', self._map, self._postings_offset + start * 4)
+            index = (index + 1) & self._mask
+
+def load_template_packs(directory=TEMPLATE_PACK_DIR, cache_size=64):
+    """Открытие всех наборов *.vtp каталога (пустой список, если каталога нет)"""
+    packs = []
+    try:
+        names = sorted(os.listdir(directory))
+    except OSError:
+        return packs
+    for file_name in names:
+        if file_name.endswith('.vtp'):
+            try:
+                packs.append(TemplatePack(os.path.join(directory, file_name), cache_size))
+            except (OSError, ValueError, struct.error) as e:
+                print(f"Ошибка загрузки набора шаблонов {file_name}: {e}")
+    return packs
+
+DOC_INDEX_PATH = os.path.join(os.path.expanduser("~"), ".vurtixai", "docs.vdi")
+DOC_DIRS = (os.path.join(os.path.expanduser("~"), ".vurtixai", "docs"),)
+DOC_TOKEN = re.compile(r'\w{2,64}')
+DOC_HEADING = re.compile(r'^#{1,3}\s+(.+?)\s*#*\s*$')
+# Каталоги без документации API: тесты, демо, вложенные site-packages (обходятся отдельно)
+DOC_SKIP_DIRS = {'site-packages', 'dist-packages', '__pycache__', 'test', 'tests',
+                 'idlelib', 'turtledemo'}
+DOC_TEXT_LIMIT = 4000
+
+def doc_tokens(text):
+    """Термины текста: слова от 2 символов в нижнем регистре, составные - и по частям"""
+    for word in DOC_TOKEN.findall(text.lower()):
+        yield word
+        if '_' in word:
+            for part in word.split('_'):
+                if len(part) > 1:
+                    yield part
+
+def _file_fingerprint(path):
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+def doc_sources(doc_dirs=DOC_DIRS, modules=True):
+    """Источники документации: [(ключ, отпечаток, вид, цель)]
+
+    Виды: 'python' - исходник модуля (цель - (путь, имя модуля)),
+    'module' - встроенный модуль или модуль-расширение стандартной
+    библиотеки (цель - имя), 'markdown' и 'html' - локальные документы.
+    Отпечаток файла - время изменения и размер, встроенного модуля -
+    версия Python. modules=False - только локальные документы doc_dirs.
+    """
+    import sysconfig
+    sources = []
+    paths = sysconfig.get_paths()
+    roots = []
+    for name in ('stdlib', 'purelib', 'platlib') if modules else ():
+        root = paths.get(name)
+        if root and os.path.isdir(root) and root not in roots:
+            roots.append(root)
+    for root in roots:
+        for directory, dirs, files in os.walk(root):
+            # Только пакеты: каталоги dist-info, data и т.п. пропускаются
+            dirs[:] = sorted(d for d in dirs if d not in DOC_SKIP_DIRS and d.isidentifier())
+            relative = os.path.relpath(directory, root)
+            package = [] if relative == '.' else relative.split(os.sep)
+            for file_name in sorted(files):
+                if not file_name.endswith('.py') or not file_name[:-3].isidentifier():
+                    continue
+                parts = package + ([] if file_name == '__init__.py' else [file_name[:-3]])
+                if not parts:
+                    continue
+                path = os.path.join(directory, file_name)
+                try:
+                    sources.append((path, _file_fingerprint(path), 'python', (path, ".".join(parts))))
+                except OSError:
+                    continue
+    
+    # Модули на C без исходника: встроенные и расширения lib-dynload
+    for name in sorted(sys.builtin_module_names) if modules else ():
+        if not name.startswith('_'):
+            sources.append((f"builtin:{name}", sys.version, 'module', name))
+    dynload = os.path.join(paths['stdlib'], 'lib-dynload')
+    if modules and os.path.isdir(dynload):
+        for file_name in sorted(os.listdir(dynload)):
+            name = file_name.split('.', 1)[0]
+            if name.startswith('_') or name == 'readline' or not file_name.endswith(('.so', '.pyd')):
+                continue
+            path = os.path.join(dynload, file_name)
+            sources.append((path, _file_fingerprint(path), 'module', name))
+    
+    for root in doc_dirs:
+        for directory, dirs, files in os.walk(root):
+            dirs.sort()
+            for file_name in sorted(files):
+                kind = ('markdown' if file_name.endswith(('.md', '.markdown')) else
+                        'html' if file_name.endswith(('.html', '.htm')) else None)
+                if kind:
+                    path = os.path.join(directory, file_name)
+                    sources.append((path, _file_fingerprint(path), kind, path))
+    return sources
+
+def _python_docs(path, module):
+    """Документы исходника без импорта: докстринги модуля, классов и функций (ast)"""
+    import ast
+    with open(path, 'rb') as f:
+        tree = ast.parse(f.read(), path)
+    docs = []
+    doc = ast.get_docstring(tree)
+    if doc:
+        docs.append((module, f"{path}:1", doc))
+    
+    def walk(node, prefix):
+        for child in node.body:
+            if not isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                continue
+            if child.name.startswith('_') and child.name != '__init__':
+                continue
+            name = f"{prefix}.{child.name}"
+            doc = ast.get_docstring(child)
+            if doc:
+                title = name if isinstance(child, ast.ClassDef) else f"{name}({ast.unparse(child.args)})"
+                docs.append((title[:200], f"{path}:{child.lineno}", doc))
+            if isinstance(child, ast.ClassDef):
+                walk(child, name)
+    walk(tree, module)
+    return docs
+
+def _module_docs(name):
+    """Документы модуля без исходника через inspect: модуль, функции, классы и их методы"""
+    import importlib
+    import inspect
+    module = importlib.import_module(name)
+    docs = []
+    
+    def add(title, obj):
+        doc = inspect.getdoc(obj)
+        if doc:
+            try:
+                if callable(obj) and not inspect.isclass(obj):
+                    title += str(inspect.signature(obj))
+            except (TypeError, ValueError):
+                pass
+            docs.append((title[:200], name, doc))
+    add(name, module)
+    for member_name, member in sorted(vars(module).items()):
+        if member_name.startswith('_'):
+            continue
+        if inspect.isclass(member):
+            if getattr(member, '__module__', None) != name:
+                continue
+            add(f"{name}.{member_name}", member)
+            for method_name, method in sorted(vars(member).items()):
+                if not method_name.startswith('_') and callable(method):
+                    add(f"{name}.{member_name}.{method_name}", method)
+        elif inspect.isroutine(member):
+            add(f"{name}.{member_name}", member)
+    return docs
+
+def _markdown_docs(path):
+    """Разделы Markdown по заголовкам до третьего уровня"""
+    with open(path, encoding='utf-8', errors='replace') as f:
+        lines = f.read().splitlines()
+    base = os.path.basename(path)
+    docs = []
+    title, start, body = base, 1, []
+    for number, line in enumerate(lines, 1):
+        heading = DOC_HEADING.match(line)
+        if heading:
+            if any(text.strip() for text in body):
+                docs.append((title, f"{path}:{start}", "\n".join(body).strip()))
+            title, start, body = f"{base} › {heading.group(1)}", number, []
+        else:
+            body.append(line)
+    if any(text.strip() for text in body):
+        docs.append((title, f"{path}:{start}", "\n".join(body).strip()))
+    return docs
+
+def _html_docs(path):
+    """Разделы HTML по заголовкам h1-h3; script и style пропускаются"""
+    from html.parser import HTMLParser
+    base = os.path.basename(path)
+    
+    class Sections(HTMLParser):
+        def __init__(self):
+            super().__init__(convert_charrefs=True)
+            self.sections = [[base, []]]
+            self.heading = None
+            self.skip = 0
+        
+        def handle_starttag(self, tag, attrs):
+            if tag in ('script', 'style'):
+                self.skip += 1
+            elif tag in ('h1', 'h2', 'h3'):
+                self.heading = []
+            elif tag in ('p', 'br', 'li', 'pre', 'div', 'tr'):
+                self.sections[-1][1].append("\n")
+        
+        def handle_endtag(self, tag):
+            if tag in ('script', 'style'):
+                self.skip = max(0, self.skip - 1)
+            elif tag in ('h1', 'h2', 'h3') and self.heading is not None:
+                self.sections.append([f"{base} › {' '.join(''.join(self.heading).split())}", []])
+                self.heading = None
+        
+        def handle_data(self, data):
+            if self.skip:
+                return
+            if self.heading is not None:
+                self.heading.append(data)
+            else:
+                self.sections[-1][1].append(data)
+    
+    parser = Sections()
+    with open(path, encoding='utf-8', errors='replace') as f:
+        parser.feed(f.read())
+    parser.close()
+    docs = []
+    for title, parts in parser.sections:
+        text = re.sub(r'\n\s*\n+', '\n', "".join(parts)).strip()
+        if text:
+            docs.append((title, path, text))
+    return docs
+
+class DocHit:
+    """Результат поиска по документации"""
+    __slots__ = ('doc_id', 'score', 'title', 'location', 'snippet')
+
+    def __init__(self, doc_id, score, title, location, snippet):
+        self.doc_id = doc_id
+        self.score = score
+        self.title = title
+        self.location = location
+        self.snippet = snippet
+
+class DocIndex:
+    """Офлайн-поиск по документации: обратный индекс в файле, отображаемом в память
+
+    Файл .vdi: заголовок; таблица документов (заголовок, место, текст,
+    источник) и массив их длин; словарь терминов, отсортированный по
+    UTF-8 (строка, df, начало списка); списки номеров документов
+    (uint32) и частот (uint16); таблица источников с отпечатками;
+    строки и тексты. Поиск - двоичный поиск термина в словаре и BM25
+    по спискам средствами NumPy прямо из mmap; в памяти процесса
+    ничего не собирается.
+
+    update() пересобирает индекс инкрементально: разбираются только
+    новые и изменившиеся источники, записи и списки остальных
+    переносятся из старого файла без повторного разбора.
+    """
+    MAGIC = b'VDI1'
+    HEADER = struct.Struct('<4sIIIQdQQQQQQQ')  # магия, документов, терминов, источников, номеров, avgdl, смещения
+    DOC = struct.Struct('<QIQIQII')           # заголовок, место, текст: смещение и длина; источник
+    TERM = struct.Struct('<QHIQ')             # строка: смещение, длина; df; начало списка
+    SOURCE = struct.Struct('<QIQIII')         # ключ, отпечаток: смещение и длина; первый документ, число
+    TITLE_WEIGHT = 3
+
+    def __init__(self, path=DOC_INDEX_PATH, k1=1.2, b=0.75):
+        import mmap
+        import numpy as np
+        self._np = np
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.doc_count, self.term_count, self.source_count, self._posting_count,
+         self._avgdl, self._docs_offset, self._lengths_offset, self._terms_offset,
+         self._post_docs_offset, self._post_tf_offset, self._sources_offset,
+         self._strings_offset) = self.HEADER.unpack_from(self._map)
+        if magic != self.MAGIC:
+            self._map.close()
+            raise ValueError(f"Неизвестный формат индекса документации: {path}")
+        self._lengths = np.frombuffer(self._map, np.uint32, self.doc_count, self._lengths_offset)
+
+    def __len__(self):
+        return self.doc_count
+
+    def close(self):
+        # Представления NumPy держат буфер mmap - их нужно отпустить до закрытия
+        self._lengths = None
+        self._map.close()
+
+    def _string(self, offset, length):
+        start = self._strings_offset + offset
+        return self._map[start:start + length].decode('utf-8')
+
+    def document(self, doc_id):
+        """(заголовок, место, текст, номер источника) документа"""
+        (title_offset, title_length, location_offset, location_length,
+         text_offset, text_length, source_id) = self.DOC.unpack_from(
+            self._map, self._docs_offset + doc_id * self.DOC.size)
+        return (self._string(title_offset, title_length),
+                self._string(location_offset, location_length),
+                self._string(text_offset, text_length), source_id)
+
+    def _term_entry(self, index):
+        """(термин в UTF-8, df, начало списка) по номеру в словаре"""
+        offset, length, df, start = self.TERM.unpack_from(
+            self._map, self._terms_offset + index * self.TERM.size)
+        position = self._strings_offset + offset
+        return self._map[position:position + length], df, start
+
+    def _lower_bound(self, key):
+        low, high = 0, self.term_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._term_entry(middle)[0] < key:
+                low = middle + 1
             else:
-                self.is_typing = False
-                
-        type_char()
-    
-    def stop_typing(self):
-        """Остановка анимации печати"""
-        self.is_typing = False
+                high = middle
+        return low
 
-class AISelfLearner:
-    def __init__(self):
-        self.knowledge_base = {}
-        self.learning_progress = 0
-        self.total_capacity = 1000
-        self.is_learning = False
-        self.learning_thread = None
-        self.last_learn_time = datetime.now()
-        self.learning_topics = [
-            "Python Syntax", "Data Structures", "Algorithms", "Machine Learning",
-            "Web Development", "GUI Programming", "Data Analysis", "OOP Concepts",
-            "Error Handling", "Optimization", "Async Programming", "Design Patterns"
-        ]
-        
-    def auto_learn(self):
-        """Автоматическое обучение каждые 10 секунд"""
-        self.is_learning = True
+    def _postings(self, term, max_expansions=32):
+        """Списки термина: [(df, начало)]; неизвестный термин от 3 символов - как префикс"""
+        key = term.encode('utf-8')
+        index = self._lower_bound(key)
+        found = []
+        while index < self.term_count and len(found) < max_expansions:
+            entry, df, start = self._term_entry(index)
+            if entry == key:
+                return [(df, start)]
+            if len(term) < 3 or not entry.startswith(key):
+                break
+            found.append((df, start))
+            index += 1
+        return found
+
+    def search(self, query, limit=20):
+        """Ранжированные документы по BM25: [DocHit] по убыванию счета"""
+        np = self._np
+        terms = set(doc_tokens(query))
+        if not terms or not self.doc_count:
+            return []
+        scores = np.zeros(self.doc_count, dtype=np.float32)
+        for term in terms:
+            for df, start in self._postings(term):
+                docs = np.frombuffer(self._map, np.uint32, df, self._post_docs_offset + start * 4)
+                tf = np.frombuffer(self._map, np.uint16, df,
+                                   self._post_tf_offset + start * 2).astype(np.float32)
+                idf = np.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[docs] / self._avgdl)
+                scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm)
+        if limit < self.doc_count:
+            top = np.argpartition(-scores, limit)[:limit]
+        else:
+            top = np.arange(self.doc_count)
+        top = top[scores[top] > 0]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        hits = []
+        for doc_id in top.tolist():
+            title, location, text, _ = self.document(doc_id)
+            hits.append(DocHit(doc_id, float(scores[doc_id]), title, location,
+                               self._snippet(text, terms)))
+        return hits
+
+    @staticmethod
+    def _snippet(text, terms, width=240):
+        """Фрагмент текста вокруг строки с наибольшим числом терминов запроса"""
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        best, best_hits = 0, 0
+        for number, line in enumerate(lines):
+            hits = len(terms.intersection(doc_tokens(line)))
+            if hits > best_hits:
+                best, best_hits = number, hits
+        snippet = " ".join(lines[best:best + 3])
+        return snippet if len(snippet) <= width else snippet[:width - 1] + "…"
+
+    def _sources(self):
+        """{ключ: (отпечаток, первый документ, число документов)}"""
+        sources = {}
+        for index in range(self.source_count):
+            (key_offset, key_length, print_offset, print_length,
+             first, count) = self.SOURCE.unpack_from(self._map, self._sources_offset + index * self.SOURCE.size)
+            sources[self._string(key_offset, key_length)] = (
+                self._string(print_offset, print_length), first, count)
+        return sources
+
+    @classmethod
+    def update(cls, path=DOC_INDEX_PATH, sources=None, on_progress=None, install=True):
+        """Сборка или обновление индекса по источникам (по умолчанию doc_sources())
+
+        on_progress(готово, всего) вызывается из потока сборки. Возвращает
+        статистику: источников, разобрано, перенесено, ошибок, документов,
+        терминов, секунд. С install=False новый индекс остается рядом,
+        путь - в stats['pending']: файл, открытый в mmap, в Windows не
+        заменить - его закрывают и вызывают install() сами.
+        """
+        started = time.perf_counter()
+        sources = doc_sources() if sources is None else sources
+        old = None
+        try:
+            old = cls(path)
+        except (OSError, ValueError, struct.error):
+            pass
+        tmp_path = path + ".tmp"
+        try:
+            collected = cls._collect(sources, old, on_progress)
+            postings = cls._merge(old, *collected['new_postings'], collected['remap'])
+            cls._write(tmp_path, collected, *postings)
+        except BaseException:
+            cls.discard(tmp_path)
+            raise
+        finally:
+            if old is not None:
+                old.close()
+        stats = collected['stats']
+        stats.update(docs=len(collected['docs']), terms=len(postings[0]))
+        if install:
+            cls.install(tmp_path, path)
+        else:
+            stats['pending'] = tmp_path
+        stats['seconds'] = time.perf_counter() - started
+        return stats
+
+    @classmethod
+    def install(cls, pending, path=DOC_INDEX_PATH):
+        """Замена индекса path собранным файлом pending; при ошибке pending удаляется"""
+        try:
+            os.replace(pending, path)
+        except OSError:
+            cls.discard(pending)
+            raise
+
+    @staticmethod
+    def discard(pending):
+        try:
+            os.remove(pending)
+        except OSError:
+            pass
+
+    @classmethod
+    def _collect(cls, sources, old, on_progress):
+        """Документы всех источников: неизменившиеся переносятся из old, остальные разбираются"""
+        import numpy as np
+        old_sources = old._sources() if old is not None else {}
+        docs = []                   # (заголовок, место, текст, номер источника)
+        lengths = array('I')
+        source_records = []
+        remap = np.full(old.doc_count if old is not None else 0, -1, dtype=np.int64)
+        new_terms, new_docs, new_tfs = [], [], []
+        stats = {'sources': len(sources), 'parsed': 0, 'reused': 0, 'failed': 0}
+        extractors = {'python': lambda target: _python_docs(*target), 'module': _module_docs,
+                      'markdown': _markdown_docs, 'html': _html_docs}
         
-        def learning_loop():
-            while self.is_learning:
+        for done, (key, fingerprint, kind, target) in enumerate(sources, 1):
+            first = len(docs)
+            previous = old_sources.get(key)
+            if previous is not None and previous[0] == fingerprint:
+                _, old_first, old_count = previous
+                for old_id in range(old_first, old_first + old_count):
+                    title, location, text, _ = old.document(old_id)
+                    remap[old_id] = len(docs)
+                    docs.append((title, location, text, len(source_records)))
+                    lengths.append(int(old._lengths[old_id]))
+                stats['reused'] += 1
+            else:
                 try:
-                    # Ждем 10 секунд между обучениями
-                    time.sleep(10)
-                    
-                    if self.is_learning:
-                        self.learn_new_concept()
-                        self.learning_progress += 1
-                        
-                except Exception as e:
-                    print(f"Ошибка автообучения: {e}")
+                    extracted = extractors[kind](target)
+                except Exception:
+                    # Битый исходник или модуль, который не импортируется, - пропускаем
+                    extracted = []
+                    stats['failed'] += 1
+                stats['parsed'] += 1
+                for title, location, text in extracted:
+                    counts = {}
+                    for term in doc_tokens(text):
+                        counts[term] = counts.get(term, 0) + 1
+                    for term in doc_tokens(title):
+                        counts[term] = counts.get(term, 0) + cls.TITLE_WEIGHT
+                    for term, count in counts.items():
+                        new_terms.append(term)
+                        new_docs.append(len(docs))
+                        new_tfs.append(min(count, 0xFFFF))
+                    docs.append((title, location, text[:DOC_TEXT_LIMIT], len(source_records)))
+                    lengths.append(sum(counts.values()))
+            source_records.append((key, fingerprint, first, len(docs) - first))
+            if on_progress is not None:
+                on_progress(done, len(sources))
+        return {'docs': docs, 'lengths': lengths, 'sources': source_records, 'remap': remap,
+                'new_postings': (new_terms, new_docs, new_tfs), 'stats': stats}
+
+    @staticmethod
+    def _merge(old, new_terms, new_docs, new_tfs, remap):
+        """Слияние списков старого индекса (номера через remap) с новыми
+
+        Возвращает словарь, df и начала списков терминов, номера
+        документов и частоты, сгруппированные по терминам.
+        """
+        import numpy as np
+        old_terms = [old._term_entry(index)[0].decode('utf-8')
+                     for index in range(old.term_count)] if old is not None else []
+        vocabulary = sorted(set(old_terms).union(new_terms))
+        term_ids = {term: index for index, term in enumerate(vocabulary)}
+        term_of = np.fromiter((term_ids[term] for term in new_terms), dtype=np.int64, count=len(new_terms))
+        doc_of = np.array(new_docs, dtype=np.int64)
+        tf_of = np.array(new_tfs, dtype=np.uint16)
+        if old is not None and old._posting_count:
+            old_df = np.array([old._term_entry(index)[1] for index in range(old.term_count)], dtype=np.int64)
+            old_term_of = np.repeat(np.fromiter((term_ids[term] for term in old_terms), dtype=np.int64,
+                                                count=len(old_terms)), old_df)
+            moved = remap[np.frombuffer(old._map, np.uint32, old._posting_count, old._post_docs_offset)]
+            kept = moved >= 0
+            old_tf = np.frombuffer(old._map, np.uint16, old._posting_count, old._post_tf_offset)[kept]
+            term_of = np.concatenate((old_term_of[kept], term_of))
+            doc_of = np.concatenate((moved[kept], doc_of))
+            tf_of = np.concatenate((old_tf, tf_of))
+        # Порядок документов внутри списка для BM25 не важен; перенесенная часть
+        # уже отсортирована по термину, и устойчивая сортировка почти линейна
+        order = np.argsort(term_of, kind='stable')
+        term_of, doc_of, tf_of = term_of[order], doc_of[order], tf_of[order]
+        df = np.bincount(term_of, minlength=len(vocabulary))
+        # Термины, оставшиеся только в удаленных документах, в словарь не попадают
+        used = np.flatnonzero(df)
+        starts = np.cumsum(df) - df
+        return ([vocabulary[index] for index in used.tolist()], df[used].tolist(),
+                starts[used].tolist(), doc_of, tf_of)
+
+    @classmethod
+    def _write(cls, path, collected, vocabulary, df, starts, doc_of, tf_of):
+        """Запись индекса в файл path"""
+        docs, lengths, sources = collected['docs'], collected['lengths'], collected['sources']
+        strings = bytearray()
         
-        self.learning_thread = threading.Thread(target=learning_loop, daemon=True)
-        self.learning_thread.start()
-    
-    def learn_new_concept(self):
-        """Изучение нового концепта"""
-        topic = random.choice(self.learning_topics)
-        concepts = {
-            "Python Syntax": ["Variables", "Functions", "Loops", "Conditionals"],
-            "Data Structures": ["Lists", "Dictionaries", "Tuples", "Sets"],
-            "Algorithms": ["Sorting", "Searching", "Recursion", "Dynamic Programming"]
-        }
+        def intern(text):
+            data = text.encode('utf-8', errors='replace')
+            strings.extend(data)
+            return len(strings) - len(data), len(data)
         
-        concept = random.choice(concepts.get(topic, ["Programming Concept"]))
-        self.last_learn_time = datetime.now()
+        table_offset = cls.HEADER.size
+        lengths_offset = table_offset + cls.DOC.size * len(docs)
+        terms_offset = lengths_offset + lengths.itemsize * len(lengths)
+        post_docs_offset = terms_offset + cls.TERM.size * len(vocabulary)
+        post_tf_offset = post_docs_offset + 4 * len(doc_of)
+        sources_offset = post_tf_offset + 2 * len(tf_of)
+        strings_offset = sources_offset + cls.SOURCE.size * len(sources)
+        avgdl = sum(lengths) / len(lengths) if lengths else 1.0
         
-        return f"Изучено: {concept} в {topic}"
-    
-    def stop_learning(self):
-        """Остановка обучения"""
-        self.is_learning = False
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, len(docs), len(vocabulary), len(sources), len(doc_of),
+                                    avgdl, table_offset, lengths_offset, terms_offset,
+                                    post_docs_offset, post_tf_offset, sources_offset, strings_offset))
+            for title, location, text, source_id in docs:
+                f.write(cls.DOC.pack(*intern(title), *intern(location), *intern(text), source_id))
+            if sys.byteorder != 'little':
+                lengths.byteswap()
+            lengths.tofile(f)
+            for term, term_df, start in zip(vocabulary, df, starts):
+                f.write(cls.TERM.pack(*intern(term), term_df, start))
+            f.write(doc_of.astype('<u4').tobytes())
+            f.write(tf_of.astype('<u2').tobytes())
+            for key, fingerprint, first, count in sources:
+                f.write(cls.SOURCE.pack(*intern(key), *intern(fingerprint), first, count))
+            f.write(strings)
 
 class ChatGPTStyleAI:
-    def __init__(self):
+    def __init__(self, cache=None, packs=None):
+        self.cache = cache
+        self.packs = list(packs or ())
         self.code_templates = {
             'factorial': self._factorial_template,
             'calculator': self._calculator_template,
             'sorting': self._sorting_template,
             'web': self._web_template,
-            'gui': self._gui_template
+            'gui': self._gui_template,
+            'sorting_fast': self._sorting_fast_template,
+            'factorial_fast': self._factorial_fast_template,
+            'web_fast': self._web_fast_template
+        }
+        # Ключевые слова шаблонов; порядок задает приоритет при равном счете
+        self.template_keywords = {
+            'factorial': ('factorial', 'факториал'),
+            'calculator': ('calculator', 'calc', 'калькулятор'),
+            'sorting': ('sort', 'сортиров'),
+            'web': ('web', 'scraping', 'парсинг'),
+            'gui': ('gui', 'interface', 'интерфейс')
         }
+        self.intent_index = IntentIndex(self.template_keywords)
+        # Описания для нечеткой маршрутизации: синонимы, формы слов, смежные темы.
+        # Только слова, однозначные для темы: одно совпадение слова решает маршрут,
+        # поэтому общие слова ("order", "window", "math", "html") уводят посторонние запросы
+        self.template_descriptions = {
+            'factorial': self.template_keywords['factorial'] + (
+                'recursion', 'recursive', 'рекурсия', 'permutation', 'перестановки',
+                'combinatorics', 'комбинаторика'),
+            'calculator': self.template_keywords['calculator'] + (
+                'arithmetic', 'арифметика'),
+            'sorting': self.template_keywords['sorting'] + (
+                'sorted', 'sorting', 'сортировка', 'сортировать', 'упорядочить',
+                'quicksort', 'mergesort'),
+            'web': self.template_keywords['web'] + (
+                'scraper', 'scrape', 'crawler', 'парсер', 'beautifulsoup'),
+            'gui': self.template_keywords['gui'] + (
+                'tkinter', 'pyqt', 'widget', 'виджет')
+        }
+        self._fuzzy = None
+        self._fuzzy_lock = threading.Lock()
+        self._fuzzy_hints = {}
+        # Быстрые варианты шаблонов - если запрос просит производительность
+        self.fast_variants = {
+            'sorting': 'sorting_fast',
+            'factorial': 'factorial_fast',
+            'web': 'web_fast'
+        }
+        self.performance_index = IntentIndex({
+            'fast': ('fast', 'performance', 'optimiz', 'speed', 'concurren', 'parallel',
+                     'быстр', 'производительн', 'оптимиз', 'скорост', 'параллел', 'многопоточ')
+        })
+        self._fingerprint = None            # (наборы, отпечаток маршрутизации)
+        self._builtin_fingerprint = None
         
     def _sorting_template(self):
         return '''def bubble_sort(arr):
@@ -305,7 +3413,8 @@ def scrape_website(url):
         soup = BeautifulSoup(response.content, 'html.parser')
         
         # Извлечение данных
-        title = soup.find('title').get_text() if soup.find('title') else 'No title'
+        title_tag = soup.find('title')
+        title = title_tag.get_text() if title_tag else 'No title'
         paragraphs = [p.get_text() for p in soup.find_all('p')][:5]
         
         return {
@@ -327,6 +3436,251 @@ if __name__ == "__main__":
         for i, p in enumerate(data['paragraphs'], 1):
             print(f"{i}. {p}")'''
     
+    def _web_fast_template(self):
+        return '''import json
+import multiprocessing
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from html.parser import HTMLParser
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+from requests.adapters import HTTPAdapter
+
+class PageParser(HTMLParser):
+    """
+    Потоковый разбор HTML: заголовок и первые абзацы без построения дерева.
+    
+    Данные подаются порциями через feed(); как только все нужное найдено,
+    done становится True и загрузку можно прервать.
+    """
+    def __init__(self, max_paragraphs=5):
+        super().__init__(convert_charrefs=True)
+        self.title = None
+        self.paragraphs = []
+        self.max_paragraphs = max_paragraphs
+        self._tag = None
+        self._text = []
+    
+    @property
+    def done(self):
+        return self.title is not None and len(self.paragraphs) >= self.max_paragraphs
+    
+    def handle_starttag(self, tag, attrs):
+        if tag in ('title', 'p') and self._tag is None:
+            self._tag = tag
+            self._text = []
+    
+    def handle_endtag(self, tag):
+        if tag != self._tag:
+            return
+        text = " ".join("".join(self._text).split())
+        if tag == 'title' and self.title is None:
+            self.title = text
+        elif tag == 'p' and text and len(self.paragraphs) < self.max_paragraphs:
+            self.paragraphs.append(text)
+        self._tag = None
+    
+    def handle_data(self, data):
+        if self._tag is not None:
+            self._text.append(data)
+
+class Scraper:
+    """
+    Конкурентный скрепер с пулом соединений.
+    
+    У каждого потока своя Session с keep-alive, одновременно выполняется
+    не больше concurrency запросов, результаты выдаются по мере готовности.
+    """
+    def __init__(self, concurrency=16, timeout=10, max_paragraphs=5):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_paragraphs = max_paragraphs
+        self._local = threading.local()
+    
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['User-Agent'] = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+            self._local.session = session
+        return session
+    
+    def fetch(self, url):
+        """
+        Загрузка и разбор одной страницы.
+        
+        Args:
+            url (str): URL веб-страницы
+            
+        Returns:
+            dict: url, title, paragraphs, status_code или error
+        """
+        started = time.perf_counter()
+        try:
+            with self._session().get(url, timeout=self.timeout, stream=True) as response:
+                response.raise_for_status()
+                response.encoding = response.encoding or 'utf-8'
+                parser = PageParser(self.max_paragraphs)
+                for chunk in response.iter_content(chunk_size=16384, decode_unicode=True):
+                    parser.feed(chunk)
+                    if parser.done:
+                        break
+                return {
+                    'url': url,
+                    'title': parser.title or 'No title',
+                    'paragraphs': parser.paragraphs,
+                    'status_code': response.status_code,
+                    'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+                }
+        except requests.RequestException as e:
+            return {'url': url, 'error': str(e)}
+    
+    def scrape(self, urls):
+        """
+        Конкурентная загрузка: генератор результатов в порядке готовности.
+        
+        В работе не больше concurrency * 2 задач, поэтому список URL
+        может быть любым длинным итератором.
+        """
+        urls = iter(urls)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            pending = set()
+            for url in urls:
+                pending.add(pool.submit(self.fetch, url))
+                if len(pending) >= self.concurrency * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            for future in pending:
+                yield future.result()
+    
+    def scrape_to_file(self, urls, path):
+        """
+        Загрузка с потоковой записью результатов в JSONL.
+        
+        Returns:
+            dict: число страниц, ошибок и время
+        """
+        started = time.perf_counter()
+        pages = errors = 0
+        with open(path, 'w', encoding='utf-8') as output:
+            for result in self.scrape(urls):
+                output.write(json.dumps(result, ensure_ascii=False) + "\\n")
+                pages += 1
+                errors += 'error' in result
+        return {'pages': pages, 'errors': errors, 'seconds': time.perf_counter() - started}
+
+# Исходная версия - для сравнения: по одному URL, без Session, разбор всего ответа
+def scrape_website_baseline(url):
+    try:
+        response = requests.get(url, timeout=10)
+        response.raise_for_status()
+        parser = PageParser(max_paragraphs=5)
+        parser.feed(response.text)
+        return {'url': url, 'title': parser.title or 'No title', 'paragraphs': parser.paragraphs}
+    except requests.RequestException as e:
+        return {'url': url, 'error': str(e)}
+
+STAND_IN_PAGE = ("<html><head><title>Страница {index}</title></head><body>"
+                 + "".join(f"<p>Абзац {i}: " + "текст " * 40 + "</p>" for i in range(200))
+                 + "</body></html>")
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Локальная замена сайта: фиксированная задержка сети и одинаковые страницы"""
+    protocol_version = 'HTTP/1.1'
+    latency = 0.05
+    
+    def do_GET(self):
+        time.sleep(self.latency)
+        body = STAND_IN_PAGE.replace("{index}", self.path.rsplit('/', 1)[-1]).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+    
+    def handle(self):
+        try:
+            super().handle()
+        except ConnectionResetError:
+            # Клиент закрыл соединение, дочитав нужное
+            pass
+    
+    def log_message(self, format, *args):
+        pass
+
+def _serve_stand_in(latency, ports):
+    StandInHandler.latency = latency
+    ThreadingHTTPServer.request_queue_size = 128
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    server.daemon_threads = True
+    ports.put(server.server_port)
+    server.serve_forever()
+
+def start_stand_in_server(latency=0.05):
+    """
+    Запуск локального сервера в отдельном процессе, чтобы он не делил GIL
+    с измеряемым клиентом; возвращает (процесс, базовый URL).
+    """
+    ports = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve_stand_in, args=(latency, ports), daemon=True)
+    process.start()
+    return process, f"http://127.0.0.1:{ports.get(timeout=10)}"
+
+def benchmark(count=200, concurrency=32, latency=0.05, output='scraped.jsonl'):
+    """
+    Сравнение с исходной версией на локальном сервере, без выхода в сеть.
+    
+    Args:
+        count (int): Число страниц
+        concurrency (int): Одновременных запросов
+        latency (float): Задержка ответа сервера, сек
+        output (str): Файл JSONL для результатов
+    """
+    process, base = start_stand_in_server(latency)
+    urls = [f"{base}/page/{i}" for i in range(count)]
+    try:
+        started = time.perf_counter()
+        baseline = [scrape_website_baseline(url) for url in urls]
+        baseline_time = time.perf_counter() - started
+        
+        stats = Scraper(concurrency=concurrency).scrape_to_file(urls, output)
+        with open(output, encoding='utf-8') as file:
+            titles = sorted(json.loads(line)['title'] for line in file)
+        assert titles == sorted(page['title'] for page in baseline)
+    finally:
+        process.terminate()
+    
+    print(f"{count} страниц, задержка сервера {latency * 1000:.0f} мс")
+    print(f"Исходная версия: {baseline_time:.2f} с ({count / baseline_time:.0f} стр/с)")
+    print(f"Scraper x{concurrency}: {stats['seconds']:.2f} с ({count / stats['seconds']:.0f} стр/с), "
+          f"ошибок: {stats['errors']}, ускорение {baseline_time / stats['seconds']:.1f}x")
+
+# Пример использования
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--benchmark':
+        benchmark()
+    else:
+        scraper = Scraper(concurrency=8)
+        urls = sys.argv[1:] or ['https://example.com']
+        for data in scraper.scrape(urls):
+            if 'error' in data:
+                print(f"Ошибка запроса {data['url']}: {data['error']}")
+                continue
+            print(f"Заголовок: {data['title']}")
+            print("Первые параграфы:")
+            for i, p in enumerate(data['paragraphs'], 1):
+                print(f"{i}. {p}")'''
+    
     def _gui_template(self):
         return '''import tkinter as tk
 from tkinter import ttk
@@ -393,7 +3747,272 @@ if __name__ == "__main__":
     def _factorial_template(self):
         return '''def factorial(n: int) -> int:
     """
-    Вычисляет факториал числа с обработкой ошибок.
+    Вычисляет факториал числа с обработкой ошибок.
+    
+    Args:
+        n (int): Неотрицательное целое число
+        
+    Returns:
+        int: Факториал числа n
+        
+    Raises:
+        TypeError: Если n не целое число
+        ValueError: Если n отрицательное
+    """
+    if not isinstance(n, int):
+        raise TypeError("Факториал определён только для целых чисел")
+    
+    if n < 0:
+        raise ValueError("Факториал не определён для отрицательных чисел")
+    
+    if n == 0:
+        return 1
+    
+    result = 1
+    for i in range(1, n + 1):
+        result *= i
+    
+    return result
+
+# Пример использования
+if __name__ == "__main__":
+    try:
+        print(f"Факториал 5: {factorial(5)}")  # 120
+        print(f"Факториал 0: {factorial(0)}")  # 1
+    except (TypeError, ValueError) as e:
+        print(f"Ошибка: {e}")'''
+    
+    def _sorting_fast_template(self):
+        return '''import heapq
+import random
+import sys
+import timeit
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def quick_sort_inplace(arr):
+    """
+    Итеративная быстрая сортировка на месте.
+    
+    Медиана трех в качестве опорного, без рекурсии и без копий списка;
+    короткие отрезки досортировываются вставками.
+    
+    Args:
+        arr (list): Список для сортировки (изменяется)
+        
+    Returns:
+        list: Тот же список, отсортированный
+    """
+    stack = [(0, len(arr) - 1)]
+    while stack:
+        lo, hi = stack.pop()
+        while hi - lo > 16:
+            mid = (lo + hi) // 2
+            if arr[mid] < arr[lo]:
+                arr[lo], arr[mid] = arr[mid], arr[lo]
+            if arr[hi] < arr[lo]:
+                arr[lo], arr[hi] = arr[hi], arr[lo]
+            if arr[hi] < arr[mid]:
+                arr[mid], arr[hi] = arr[hi], arr[mid]
+            pivot = arr[mid]
+            i, j = lo, hi
+            while i <= j:
+                while arr[i] < pivot:
+                    i += 1
+                while arr[j] > pivot:
+                    j -= 1
+                if i <= j:
+                    arr[i], arr[j] = arr[j], arr[i]
+                    i += 1
+                    j -= 1
+            # Меньшая часть - в стек, большая - в цикле: стек не глубже log n
+            if j - lo < hi - i:
+                stack.append((lo, j))
+                lo = i
+            else:
+                stack.append((i, hi))
+                hi = j
+        for k in range(lo + 1, hi + 1):
+            item = arr[k]
+            m = k - 1
+            while m >= lo and arr[m] > item:
+                arr[m + 1] = arr[m]
+                m -= 1
+            arr[m + 1] = item
+    return arr
+
+def heap_sort(arr):
+    """
+    Пирамидальная сортировка на heapq (C-реализация кучи).
+    
+    Args:
+        arr (list): Список для сортировки
+        
+    Returns:
+        list: Новый отсортированный список
+    """
+    heap = list(arr)
+    heapq.heapify(heap)
+    return [heapq.heappop(heap) for _ in range(len(heap))]
+
+def numpy_sort(arr):
+    """
+    Векторизованная сортировка числового массива в NumPy.
+    
+    Args:
+        arr (list | numpy.ndarray): Числа для сортировки
+        
+    Returns:
+        numpy.ndarray: Отсортированный массив
+    """
+    return np.sort(np.asarray(arr), kind='stable')
+
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+def fast_sort(arr):
+    """
+    Самый быстрый доступный способ: NumPy для однородных чисел, иначе Timsort (sorted).
+    
+    NumPy используется, только если все элементы - float или все - int
+    в пределах int64 (bool и подклассы не подходят): тогда результат
+    совпадает с sorted() вплоть до типов элементов. В остальных случаях
+    (смешанные типы, строки, большие целые) - sorted().
+    
+    Args:
+        arr (list): Список для сортировки
+        
+    Returns:
+        list: Новый отсортированный список
+    """
+    if np is not None and arr:
+        kinds = set(map(type, arr))
+        if kinds == {float}:
+            return np.sort(np.array(arr, dtype=np.float64), kind='stable').tolist()
+        if kinds == {int} and INT64_MIN <= min(arr) and max(arr) <= INT64_MAX:
+            return np.sort(np.array(arr, dtype=np.int64), kind='stable').tolist()
+    return sorted(arr)
+
+ALGORITHMS = {
+    'quick_sort_inplace': lambda arr: quick_sort_inplace(list(arr)),
+    'heap_sort': heap_sort,
+    'sorted': sorted,
+    'fast_sort': fast_sort
+}
+if np is not None:
+    ALGORITHMS['numpy_sort'] = numpy_sort
+
+def sort(arr, algorithm='fast_sort'):
+    """Сортировка выбранным алгоритмом из ALGORITHMS"""
+    return ALGORITHMS[algorithm](arr)
+
+# Исходные версии - для сравнения в микробенчмарке
+def bubble_sort_baseline(arr):
+    n = len(arr)
+    for i in range(n):
+        swapped = False
+        for j in range(0, n-i-1):
+            if arr[j] > arr[j+1]:
+                arr[j], arr[j+1] = arr[j+1], arr[j]
+                swapped = True
+        if not swapped:
+            break
+    return arr
+
+def quick_sort_baseline(arr):
+    if len(arr) <= 1:
+        return arr
+    pivot = arr[len(arr) // 2]
+    left = [x for x in arr if x < pivot]
+    middle = [x for x in arr if x == pivot]
+    right = [x for x in arr if x > pivot]
+    return quick_sort_baseline(left) + middle + quick_sort_baseline(right)
+
+def benchmark(size=200_000, repeat=3):
+    """
+    Микробенчмарк: время каждого алгоритма и ускорение относительно исходного quick_sort.
+    
+    Args:
+        size (int): Размер случайного списка
+        repeat (int): Число повторов, берется лучшее время
+    """
+    rng = random.Random(42)
+    data = [rng.random() for _ in range(size)]
+    expected = sorted(data)
+    
+    def measure(func, values):
+        return min(timeit.repeat(lambda: func(values), number=1, repeat=repeat))
+    
+    baseline = measure(quick_sort_baseline, data)
+    print(f"Список из {size} чисел, лучшее из {repeat}")
+    print(f"{'quick_sort (исходный)':<24}{baseline * 1000:>10.1f} мс     1.0x")
+    for name, func in ALGORITHMS.items():
+        assert list(func(data)) == expected, name
+        elapsed = measure(func, data)
+        print(f"{name:<24}{elapsed * 1000:>10.1f} мс{baseline / elapsed:>8.1f}x")
+    
+    # Пузырек квадратичен: сравниваем на небольшом списке
+    small = data[:3000]
+    bubble = measure(lambda values: bubble_sort_baseline(list(values)), small)
+    fast = measure(fast_sort, small)
+    print(f"bubble_sort на {len(small)}: {bubble * 1000:.1f} мс, "
+          f"fast_sort: {fast * 1000:.2f} мс ({bubble / fast:.0f}x)")
+
+# Пример использования
+if __name__ == "__main__":
+    numbers = [64, 34, 25, 12, 22, 11, 90]
+    print(f"Исходный список: {numbers}")
+    print(f"Быстрая сортировка на месте: {quick_sort_inplace(numbers.copy())}")
+    print(f"Пирамидальная сортировка: {heap_sort(numbers)}")
+    print(f"Лучший способ: {fast_sort(numbers)}")
+    print()
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)'''
+    
+    def _factorial_fast_template(self):
+        return '''import math
+import sys
+import timeit
+
+
+def check_argument(n):
+    """
+    Проверка аргумента факториала.
+    
+    Raises:
+        ValueError: Если n отрицательное
+        TypeError: Если n не целое число
+    """
+    if not isinstance(n, int):
+        raise TypeError("Аргумент должен быть целым числом")
+    if n < 0:
+        raise ValueError("Факториал определен только для неотрицательных чисел")
+
+def factorial(n: int) -> int:
+    """
+    Вычисляет факториал числа n встроенным math.factorial.
+    
+    CPython считает его делением диапазона пополам с умножением
+    больших чисел примерно равного размера - это быстрее любого цикла.
+    
+    Args:
+        n (int): Неотрицательное целое число
+        
+    Returns:
+        int: Факториал числа n
+        
+    Raises:
+        ValueError: Если n отрицательное
+        TypeError: Если n не целое число
+    """
+    check_argument(n)
+    return math.factorial(n)
+
+def factorial_prod(n: int) -> int:
+    """
+    Факториал через math.prod: произведение считается в C, без цикла Python.
     
     Args:
         n (int): Неотрицательное целое число
@@ -402,31 +4021,73 @@ if __name__ == "__main__":
         int: Факториал числа n
         
     Raises:
-        TypeError: Если n не целое число
         ValueError: Если n отрицательное
+        TypeError: Если n не целое число
     """
-    if not isinstance(n, int):
-        raise TypeError("Факториал определён только для целых чисел")
+    check_argument(n)
+    return math.prod(range(2, n + 1))
+
+def factorial_split(n: int) -> int:
+    """
+    Факториал бинарным разбиением: произведение [lo, hi) делится пополам,
+    поэтому перемножаются числа близкой длины и работает быстрое
+    умножение больших чисел.
     
-    if n < 0:
-        raise ValueError("Факториал не определён для отрицательных чисел")
+    Args:
+        n (int): Неотрицательное целое число
+        
+    Returns:
+        int: Факториал числа n
+        
+    Raises:
+        ValueError: Если n отрицательное
+        TypeError: Если n не целое число
+    """
+    check_argument(n)
     
-    if n == 0:
-        return 1
+    def product(lo, hi):
+        if hi - lo <= 16:
+            return math.prod(range(lo, hi))
+        mid = (lo + hi) // 2
+        return product(lo, mid) * product(mid, hi)
     
+    return product(2, n + 1) if n > 1 else 1
+
+# Исходная версия - для сравнения в микробенчмарке
+def factorial_baseline(n: int) -> int:
     result = 1
     for i in range(1, n + 1):
         result *= i
-    
     return result
 
+def benchmark(n=20_000, repeat=3):
+    """
+    Микробенчмарк: время каждого варианта и ускорение относительно исходного цикла.
+    
+    Args:
+        n (int): Аргумент факториала
+        repeat (int): Число повторов, берется лучшее время
+    """
+    expected = math.factorial(n)
+    baseline = min(timeit.repeat(lambda: factorial_baseline(n), number=1, repeat=repeat))
+    digits = int(expected.bit_length() * math.log10(2)) + 1
+    print(f"Факториал {n} (~{digits} цифр), лучшее из {repeat}")
+    print(f"{'цикл (исходный)':<20}{baseline * 1000:>10.2f} мс     1.0x")
+    for name, func in (('math.prod', factorial_prod), ('бинарное разбиение', factorial_split),
+                       ('math.factorial', factorial)):
+        assert func(n) == expected, name
+        elapsed = min(timeit.repeat(lambda: func(n), number=1, repeat=repeat))
+        print(f"{name:<20}{elapsed * 1000:>10.2f} мс{baseline / elapsed:>8.1f}x")
+
 # Пример использования
 if __name__ == "__main__":
     try:
         print(f"Факториал 5: {factorial(5)}")  # 120
         print(f"Факториал 0: {factorial(0)}")  # 1
     except (TypeError, ValueError) as e:
-        print(f"Ошибка: {e}")'''
+        print(f"Ошибка: {e}")
+    print()
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)'''
     
     def _calculator_template(self):
         return '''class Calculator:
@@ -513,29 +4174,726 @@ if __name__ == "__main__":
     result = solution()
     print(f"Результат: {{result}}")'''
     
-    def generate_code(self, prompt, deep_think=False):
+    def generate_code(self, prompt, deep_think=False, compose=False):
         """Генерация кода в стиле ChatGPT"""
-        if deep_think:
-            time.sleep(2.5)  # DeepThink задержка
-            
-        prompt_lower = prompt.lower()
-        
-        # Определяем тип запроса
-        if any(word in prompt_lower for word in ['factorial', 'факториал']):
-            return self._factorial_template()
-        elif any(word in prompt_lower for word in ['calculator', 'calc', 'калькулятор']):
-            return self._calculator_template()
-        elif any(word in prompt_lower for word in ['sort', 'сортиров']):
-            return self._sorting_template()
-        elif any(word in prompt_lower for word in ['web', 'scraping', 'парсинг']):
-            return self._web_template()
-        elif any(word in prompt_lower for word in ['gui', 'interface', 'интерфейс']):
-            return self._gui_template()
+        return "".join(self.generate_code_stream(prompt, deep_think, compose=compose))
+
+    def generate_code_stream(self, prompt, deep_think=False, cancel=None, trace=NULL_TRACE,
+                             compose=False):
+        """Потоковая генерация кода: фрагменты выдаются по мере готовности"""
+        plan = self.plan_code(prompt, deep_think, trace, compose)
+        return CodeStream(self._run_plan(plan, cancel), plan.route,
+                          cached=plan.cached, plan=plan)
+
+    def plan_code(self, prompt, deep_think=False, trace=NULL_TRACE, compose=False):
+        """Маршрутизация и рендер шаблона (или ответ из кэша) без ожиданий
+
+        compose=True: код собирается из шаблонов всех найденных намерений.
+        """
+        fingerprint = ""
+        if self.cache is not None:
+            with trace.span('cache_lookup'):
+                fingerprint = self.routing_fingerprint()
+                cached = self.cache.get(prompt, deep_think, compose, fingerprint)
+            if cached is not None:
+                route, code = cached
+                if route is None:
+                    # Общий шаблон содержит текст запроса: под нормализованным ключом
+                    # лежит ответ на чужую формулировку - рендерим для этой
+                    code = self._render(route, prompt)
+                trace.set_template(route)
+                return CodePlan(prompt, deep_think, route, code, cached=True, trace=trace,
+                                compose=compose, fingerprint=fingerprint)
+        with trace.span('route'):
+            route = self.route_for(prompt, compose)
+        trace.set_template(route)
+        with trace.span('render'):
+            if route is not None and '+' in route:
+                code = self._render_composite(route.split('+'), prompt)
+            else:
+                code = self._render(route, prompt)
+            return CodePlan(prompt, deep_think, route, code, trace=trace, compose=compose,
+                            fingerprint=fingerprint)
+
+    def routing_fingerprint(self):
+        """Отпечаток маршрутизации для ключа кэша
+
+        Учитываются ключевые слова и описания маршрутов, параметры
+        нечеткого маршрутизатора, код встроенных шаблонов и наборы на
+        диске (имя, размер, время изменения). Считается заново только
+        при смене списка наборов.
+        """
+        packs = tuple(self.packs)
+        if self._fingerprint is None or self._fingerprint[0] != packs:
+            import hashlib
+            if self._builtin_fingerprint is None:
+                self._builtin_fingerprint = repr((
+                    sorted(self.template_keywords.items()),
+                    sorted(self.template_descriptions.items()),
+                    sorted(self.fast_variants.items()),
+                    FuzzyRouter.MIN_WORD, FuzzyRouter.THRESHOLD,
+                    [(route, template()) for route, template in sorted(self.code_templates.items())]))
+            digest = hashlib.blake2b(self._builtin_fingerprint.encode('utf-8'), digest_size=8)
+            for pack in packs:
+                try:
+                    info = os.stat(pack.path)
+                    digest.update(repr((pack.name, info.st_size, info.st_mtime_ns)).encode('utf-8'))
+                except OSError:
+                    digest.update(repr((pack.name, None)).encode('utf-8'))
+            self._fingerprint = (packs, digest.hexdigest())
+        return self._fingerprint[1]
+
+    def route_for(self, prompt, compose=False):
+        """Маршрут запроса: шаблон, "a+b" для составного ответа или None - общий шаблон"""
+        if not compose:
+            return self._route(prompt)
+        ranked = self.intent_index.rank(prompt) + self._pack_matches(prompt)
+        if not ranked and self.fuzzy_router() is not None:
+            ranked = self.fuzzy_router().rank(prompt)
+        ranked.sort(key=lambda item: -item[1])
+        return "+".join(self._variant(route, prompt) for route, _ in ranked) or None
+
+    def _pack_matches(self, prompt):
+        """Лучший шаблон каждого набора: [("набор/шаблон", счет)]"""
+        matches = []
+        for pack in self.packs:
+            found = pack.best(prompt)
+            if found is not None:
+                matches.append((f"{pack.name}/{found[0]}", found[1]))
+        return matches
+
+    def _render(self, route, prompt):
+        """Код шаблона: встроенного, из набора на диске или общего"""
+        template = self.code_templates.get(route)
+        if template is not None:
+            return template()
+        if route is not None and '/' in route:
+            pack_name, name = route.split('/', 1)
+            for pack in self.packs:
+                if pack.name == pack_name:
+                    body = pack.render(name)
+                    if body is not None:
+                        return body
+        return self._general_template(prompt)
+
+    def _variant(self, route, prompt):
+        """Быстрый вариант шаблона, если он есть и запрос просит производительность"""
+        if route in self.fast_variants and self.performance_index.best(prompt):
+            return self.fast_variants[route]
+        return route
+
+    def _render_composite(self, routes, prompt):
+        """Рендер фрагментов и сборка в один модуль
+
+        Шаблоны - строковые литералы и тела из mmap с LRU: рендер занимает
+        микросекунды, и пул потоков под GIL только добавил бы накладные расходы.
+        """
+        return compose_fragments([(route, self._render(route, prompt)) for route in routes])
+
+    def _route(self, prompt):
+        """Определение шаблона по запросу (None - общий шаблон)"""
+        ranked = self.intent_index.rank(prompt)
+        route, score = ranked[0] if ranked else (None, 0)
+        for pack_route, pack_score in self._pack_matches(prompt):
+            if pack_score > score:
+                route, score = pack_route, pack_score
+        if route is None:
+            route = self._fuzzy_route(prompt)
+        return self._variant(route, prompt)
+
+    def fuzzy_router(self):
+        """Нечеткий маршрутизатор встроенных шаблонов (None без NumPy)"""
+        if self._fuzzy is None:
+            with self._fuzzy_lock:
+                if self._fuzzy is None:
+                    try:
+                        self._fuzzy = FuzzyRouter(self.template_descriptions)
+                    except ImportError:
+                        self._fuzzy = False
+        return self._fuzzy or None
+
+    def prefetch_routes(self, prompts):
+        """Нечеткая маршрутизация пачки запросов одним проходом
+
+        Запросы без точного совпадения оцениваются вместе, результат
+        забирает _route при генерации каждого из них. Подсказки
+        прошлой пачки отбрасываются.
+        """
+        router = self.fuzzy_router()
+        if router is None:
+            return
+        misses = [prompt for prompt in set(prompts)
+                  if not self.intent_index.scores(prompt) and not self._pack_matches(prompt)]
+        self._fuzzy_hints = dict(zip(misses, router.match_batch(misses)))
+
+    def _fuzzy_route(self, prompt):
+        """Шаблон по сходству слов запроса или None - ниже порога уверенности"""
+        if prompt in self._fuzzy_hints:
+            match = self._fuzzy_hints.pop(prompt)
+        else:
+            router = self.fuzzy_router()
+            match = router.best(prompt) if router is not None else None
+        return match[0] if match else None
+
+    def _run_plan(self, plan, cancel=None):
+        """Синхронное выполнение плана: паузы этапов с возможностью отмены"""
+        cancel = cancel or threading.Event()
+        for stage, delay, chunks in plan.stages:
+            plan.stage = stage
+            if delay:
+                waited = time.perf_counter()
+                if cancel.wait(delay):
+                    return
+                plan.trace.add('deepthink_wait', time.perf_counter() - waited)
+            for chunk in chunks:
+                if cancel.is_set():
+                    return
+                yield chunk
+        self.finish_plan(plan)
+
+    def finish_plan(self, plan):
+        """Сохранение ответа в кэш и учет времени"""
+        if self.cache is not None:
+            if not plan.cached:
+                self.cache.put(plan.prompt, plan.deep_think, plan.route, plan.code, plan.compose,
+                               plan.fingerprint)
+            self.cache.record(plan.cached, time.perf_counter() - plan.started)
+
+class DeepThinkPipeline:
+    """Неблокирующий конвейер DeepThink на общем цикле asyncio
+
+    Все запросы выполняются корутинами в одном фоновом потоке: ожидание
+    этапа - asyncio.sleep, а не занятый поток ОС, поэтому одновременные
+    запросы DeepThink не требуют по потоку на каждый. Отмена задачи
+    прерывает ожидание сразу.
+    """
+    def __init__(self, ai):
+        self.ai = ai
+        self.loop = None
+        self.active = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    async def stream(self, prompt, trace=NULL_TRACE, compose=False):
+        """Асинхронный поток событий: (этап, номер, всего этапов, фрагмент или None)"""
+        import asyncio
+        plan = self.ai.plan_code(prompt, deep_think=True, trace=trace, compose=compose)
+        total = len(plan.stages)
+        self.active += 1
+        try:
+            for index, (stage, delay, chunks) in enumerate(plan.stages):
+                plan.stage = stage
+                yield stage, index, total, None
+                if delay:
+                    waited = time.perf_counter()
+                    await asyncio.sleep(delay)
+                    trace.add('deepthink_wait', time.perf_counter() - waited)
+                for chunk in chunks:
+                    yield stage, index, total, chunk
+        finally:
+            self.active -= 1
+        self.ai.finish_plan(plan)
+
+    async def run(self, prompt, on_progress=None, on_chunk=None, trace=NULL_TRACE, compose=False):
+        """Выполнение запроса с обратными вызовами прогресса и фрагментов"""
+        chunks = []
+        async for stage, index, total, chunk in self.stream(prompt, trace, compose):
+            if chunk is None:
+                if on_progress and stage is not None:
+                    on_progress(stage, index, total)
+            else:
+                chunks.append(chunk)
+                if on_chunk:
+                    on_chunk(chunk)
+        return "".join(chunks)
+
+    def submit(self, prompt, on_progress=None, on_chunk=None, trace=NULL_TRACE, compose=False):
+        """Запуск из любого потока; возвращает отменяемый Future"""
+        import asyncio
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(
+            self.run(prompt, on_progress, on_chunk, trace, compose), loop)
+
+    def stop(self):
+        """Остановка цикла событий"""
+        with self._lock:
+            if self.loop is not None:
+                self.loop.call_soon_threadsafe(self.loop.stop)
+                self.loop = None
+
+    def _ensure_loop(self):
+        """Ленивый запуск цикла событий в фоновом потоке"""
+        with self._lock:
+            if self.loop is None:
+                import asyncio
+                self.loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self.loop.run_forever,
+                                                name="vurtix-deepthink", daemon=True)
+                self._thread.start()
+            return self.loop
+
+class GenerationRequest:
+    """Запрос генерации, проходящий через планировщик"""
+    def __init__(self, prompt, deep_think, key, trace=NULL_TRACE, compose=False):
+        self.prompt = prompt
+        self.deep_think = deep_think
+        self.compose = compose
+        self.key = key
+        self.trace = trace
+        self.cancel_event = threading.Event()
+        self.future = None
+        self.stream = None
+        self.chunks = []
+        self.stage = None
+        self.error = None
+        self.done = False
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.finished = None
+        self._listener = None
+        self._lock = threading.RLock()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    @property
+    def code(self):
+        """Полученный на данный момент код"""
+        return "".join(self.chunks)
+
+    @property
+    def wait_time(self):
+        """Время ожидания в очереди, сек"""
+        end = self.started if self.started is not None else time.perf_counter()
+        return end - self.submitted
+
+    @property
+    def run_time(self):
+        """Время выполнения, сек"""
+        if self.started is None:
+            return 0.0
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return end - self.started
+
+    def attach(self, on_chunk=None, on_done=None, on_progress=None):
+        """Подписка на фрагменты; уже полученные фрагменты повторяются"""
+        with self._lock:
+            self._listener = (on_chunk, on_done, on_progress)
+            if on_progress and self.stage is not None:
+                on_progress(self, *self.stage)
+            if on_chunk:
+                for chunk in self.chunks:
+                    on_chunk(self, chunk)
+            if self.done and on_done:
+                on_done(self)
+
+    def detach(self):
+        """Отписка от фрагментов"""
+        with self._lock:
+            self._listener = None
+
+    def _emit(self, chunk):
+        with self._lock:
+            self.chunks.append(chunk)
+            if self._listener and self._listener[0]:
+                self._listener[0](self, chunk)
+
+    def _progress(self, stage, index, total):
+        with self._lock:
+            self.stage = (stage, index, total)
+            if self._listener and self._listener[2]:
+                self._listener[2](self, stage, index, total)
+
+    def _finish(self, error=None):
+        with self._lock:
+            self.error = error
+            self.done = True
+            if self._listener and self._listener[1]:
+                self._listener[1](self)
+
+class GenerationScheduler:
+    """Планировщик генераций на ограниченном пуле потоков
+
+    Дословно одинаковые запросы, уже находящиеся в работе, объединяются; новый
+    запрос отменяет предыдущий (на экран выводится только последний);
+    при заполненной очереди новые запросы отклоняются. DeepThink идет
+    через асинхронный конвейер и не занимает поток пула.
+    """
+    def __init__(self, ai, max_workers=2, max_pending=8, pipeline=None, tracer=None):
+        self.ai = ai
+        self.pipeline = pipeline or DeepThinkPipeline(ai)
+        self.tracer = tracer or Tracer(enabled=False)
+        self.max_pending = max_pending
+        self.max_workers = max_workers
+        self.executor = None
+        self.latest = None
+        self.completed = 0
+        self.cancelled = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.wait_times = deque(maxlen=100)
+        self.run_times = deque(maxlen=100)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, prompt, deep_think=False, on_chunk=None, on_done=None, on_progress=None,
+               compose=False):
+        """Постановка запроса в очередь; None, если очередь заполнена"""
+        # Объединяются только дословно одинаковые запросы: общий шаблон содержит
+        # текст запроса, и ответ на другую формулировку отдавать нельзя
+        key = (prompt, deep_think, compose)
+        start = False
+        with self._lock:
+            request = self._inflight.get(key)
+            if request is not None and not request.cancelled:
+                self.coalesced += 1
+            else:
+                if len(self._inflight) >= self.max_pending:
+                    self.rejected += 1
+                    return None
+                request = GenerationRequest(prompt, deep_think, key, self.tracer.start(), compose)
+                self._inflight[key] = request
+                start = True
+            previous, self.latest = self.latest, request
+        
+        request.attach(on_chunk, on_done, on_progress)
+        if start:
+            self._start(request)
+        if previous is not None and previous is not request:
+            self.cancel(previous)
+        return request
+
+    def cancel(self, request):
+        """Отмена запроса: ожидающий снимается с очереди, работающий прерывается"""
+        request.detach()
+        if request.done or request.cancelled:
+            return
+        request.cancel_event.set()
+        with self._lock:
+            self.cancelled += 1
+        if request.future is not None and request.future.cancel():
+            self._complete(request)
+
+    @property
+    def queue_depth(self):
+        """Число запросов, ожидающих свободного потока"""
+        with self._lock:
+            return sum(1 for request in self._inflight.values() if request.started is None)
+
+    def stats(self):
+        """Глубина очереди и времена ожидания/выполнения"""
+        with self._lock:
+            running = sum(1 for request in self._inflight.values() if request.started is not None)
+            waits, runs = list(self.wait_times), list(self.run_times)
+            return {
+                'queue_depth': len(self._inflight) - running,
+                'running': running,
+                'completed': self.completed,
+                'cancelled': self.cancelled,
+                'coalesced': self.coalesced,
+                'rejected': self.rejected,
+                'avg_wait': sum(waits) / len(waits) if waits else 0.0,
+                'max_wait': max(waits, default=0.0),
+                'avg_run': sum(runs) / len(runs) if runs else 0.0,
+                'max_run': max(runs, default=0.0)
+            }
+
+    def shutdown(self):
+        """Отмена всех запросов и остановка пула"""
+        with self._lock:
+            requests = list(self._inflight.values())
+        for request in requests:
+            self.cancel(request)
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+        self.pipeline.stop()
+
+    def _start(self, request):
+        """Запуск запроса: DeepThink - в конвейере, остальные - в пуле"""
+        if request.deep_think:
+            request.started = time.perf_counter()
+            request.trace.add('enqueue', request.wait_time)
+            request.future = self.pipeline.submit(request.prompt, request._progress,
+                                                  request._emit, request.trace, request.compose)
+            request.future.add_done_callback(
+                lambda future: self._pipeline_done(request, future))
+        else:
+            if self.executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                   thread_name_prefix="vurtix-gen")
+            request.future = self.executor.submit(self._run, request)
+
+    def _run(self, request):
+        """Выполнение запроса в потоке пула"""
+        request.started = time.perf_counter()
+        request.trace.add('enqueue', request.wait_time)
+        error = None
+        try:
+            if not request.cancelled:
+                request.stream = self.ai.generate_code_stream(
+                    request.prompt, request.deep_think, cancel=request.cancel_event,
+                    trace=request.trace, compose=request.compose)
+                for chunk in request.stream:
+                    if request.cancelled:
+                        break
+                    request._emit(chunk)
+        except Exception as e:
+            error = e
+        self._complete(request, error)
+
+    def _pipeline_done(self, request, future):
+        """Завершение запроса DeepThink (отмену обрабатывает cancel)"""
+        if future.cancelled():
+            return
+        self._complete(request, future.exception())
+
+    def _complete(self, request, error=None):
+        """Снятие запроса из работы и учет времен"""
+        if request.done:
+            return
+        request.finished = time.perf_counter()
+        with self._lock:
+            if self._inflight.get(request.key) is request:
+                del self._inflight[request.key]
+            if not request.cancelled:
+                self.completed += 1
+                self.wait_times.append(request.wait_time)
+                self.run_times.append(request.run_time)
+        if request.cancelled:
+            request.trace.finish('cancelled')
+        elif error is not None:
+            request.trace.finish('error')
         else:
-            return self._general_template(prompt)
+            request.trace.mark('generated')
+            request.trace.finish()
+        request._finish(error)
+
+class HistoryPanel(tk.Toplevel):
+    """Окно истории: поиск по запросам и ответам, восстановление без генерации"""
+    def __init__(self, master, history, on_restore):
+        super().__init__(master, bg='#0d1117')
+        self.title("📜 История запросов")
+        self.geometry("760x480")
+        self.history = history
+        self.on_restore = on_restore
+        self._entries = []
+        self._search_id = None
+        
+        self.query_var = tk.StringVar()
+        entry = tk.Entry(self, textvariable=self.query_var, font=('Segoe UI', 11),
+                         bg='#161b22', fg='white', relief=tk.FLAT, insertbackground='white')
+        entry.pack(fill=tk.X, padx=10, pady=(10, 0), ipady=6)
+        entry.focus_set()
+        self.query_var.trace_add('write', lambda *args: self._schedule_search())
+        
+        self.listbox = tk.Listbox(self, bg='#161b22', fg='#e6edf3', font=('Cascadia Code', 10),
+                                  selectbackground='#10a37f', relief=tk.FLAT, bd=0,
+                                  activestyle='none')
+        self.listbox.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.listbox.bind('<Double-Button-1>', lambda event: self.restore())
+        self.listbox.bind('<Return>', lambda event: self.restore())
+        entry.bind('<Return>', lambda event: self.restore())
+        
+        self.info_var = tk.StringVar()
+        tk.Label(self, textvariable=self.info_var, bg='#0d1117', fg='#8b949e',
+                 font=('Segoe UI', 9)).pack(anchor=tk.W, padx=10, pady=(0, 10))
+        self.search()
+
+    def search(self):
+        """Обновление списка по строке поиска"""
+        self._search_id = None
+        started = time.perf_counter()
+        self._entries = self.history.search(self.query_var.get())
+        elapsed = (time.perf_counter() - started) * 1000
+        
+        self.listbox.delete(0, tk.END)
+        for entry in self._entries:
+            created = datetime.fromtimestamp(entry.created).strftime('%H:%M:%S')
+            mode = "🤔" if entry.deep_think else "  "
+            self.listbox.insert(tk.END, f"{created} {mode} {entry.route or 'general':<14} {entry.prompt}")
+        if self._entries:
+            self.listbox.selection_set(0)
+        stats = self.history.stats()
+        self.info_var.set(f"Найдено: {len(self._entries)} за {elapsed:.1f} мс | "
+                          f"записей: {stats['entries']}, уникальных ответов: {stats['unique_outputs']}, "
+                          f"{stats['bytes'] / 1024 / 1024:.1f} из {stats['byte_budget'] / 1024 / 1024:.0f} МБ")
+
+    def restore(self):
+        """Вывод выбранной записи в основное окно"""
+        selection = self.listbox.curselection()
+        if selection:
+            self.on_restore(self._entries[selection[0]])
+
+    def _schedule_search(self):
+        if self._search_id is not None:
+            self.after_cancel(self._search_id)
+        self._search_id = self.after(50, self.search)
+
+class DocSearchPanel(tk.Toplevel):
+    """Окно офлайн-поиска по документации: результаты BM25 и текст выбранного документа"""
+    def __init__(self, master, get_index, on_rebuild, query=""):
+        super().__init__(master, bg='#0d1117')
+        self.title("📚 Документация")
+        self.geometry("860x600")
+        self.get_index = get_index
+        self.on_rebuild = on_rebuild
+        self._hits = []
+        self._search_id = None
+        
+        toolbar = tk.Frame(self, bg='#0d1117')
+        toolbar.pack(fill=tk.X, padx=10, pady=(10, 0))
+        self.query_var = tk.StringVar(value=query)
+        entry = tk.Entry(toolbar, textvariable=self.query_var, font=('Segoe UI', 11),
+                         bg='#161b22', fg='white', relief=tk.FLAT, insertbackground='white')
+        entry.pack(side=tk.LEFT, fill=tk.X, expand=True, ipady=6)
+        entry.focus_set()
+        entry.bind('<Return>', lambda event: self.search())
+        self.query_var.trace_add('write', lambda *args: self._schedule_search())
+        SmoothButton(toolbar, text="🔄 Обновить индекс", command=self.on_rebuild,
+                     width=170, height=34, bg_color='#0d1117',
+                     font=('Segoe UI', 10, 'bold')).pack(side=tk.LEFT, padx=(10, 0))
+        
+        self.listbox = tk.Listbox(self, bg='#161b22', fg='#e6edf3', font=('Cascadia Code', 10),
+                                  selectbackground='#10a37f', relief=tk.FLAT, bd=0,
+                                  activestyle='none', height=12, exportselection=False)
+        self.listbox.pack(fill=tk.X, padx=10, pady=10)
+        self.listbox.bind('<<ListboxSelect>>', lambda event: self.show_selected())
+        
+        self.text = tk.Text(self, bg='#161b22', fg='#e6edf3', font=('Cascadia Code', 10),
+                            relief=tk.FLAT, bd=0, wrap=tk.WORD, state=tk.DISABLED)
+        self.text.pack(fill=tk.BOTH, expand=True, padx=10)
+        
+        self.info_var = tk.StringVar()
+        tk.Label(self, textvariable=self.info_var, bg='#0d1117', fg='#8b949e',
+                 font=('Segoe UI', 9)).pack(anchor=tk.W, padx=10, pady=(5, 10))
+        self.search()
+
+    def search(self):
+        """Поиск по строке запроса в текущем индексе"""
+        self._search_id = None
+        index = self.get_index()
+        self.listbox.delete(0, tk.END)
+        self._hits = []
+        if index is None:
+            return
+        started = time.perf_counter()
+        self._hits = index.search(self.query_var.get())
+        elapsed = (time.perf_counter() - started) * 1000
+        for hit in self._hits:
+            self.listbox.insert(tk.END, f"{hit.score:6.1f}  {hit.title}")
+        if self._hits:
+            self.listbox.selection_set(0)
+        self.show_selected()
+        self.info_var.set(f"Найдено: {len(self._hits)} за {elapsed:.1f} мс | документов в индексе: {len(index)}")
+
+    def show_selected(self):
+        """Фрагмент, место и полный текст выбранного документа"""
+        selection = self.listbox.curselection()
+        self.text.configure(state=tk.NORMAL)
+        self.text.delete(1.0, tk.END)
+        if selection:
+            hit = self._hits[selection[0]]
+            _, _, text, _ = self.get_index().document(hit.doc_id)
+            self.text.insert(tk.END, f"{hit.title}\n{hit.location}\n\n{hit.snippet}\n\n{'─' * 40}\n{text}")
+        self.text.configure(state=tk.DISABLED)
+
+    def set_status(self, message):
+        self.info_var.set(message)
+
+    def _schedule_search(self):
+        if self._search_id is not None:
+            self.after_cancel(self._search_id)
+        self._search_id = self.after(150, self.search)
+
+class MetricsPanel(tk.Toplevel):
+    """Окно живых метрик: перцентили этапов и шаблонов, обновление раз в секунду"""
+    STAGE_NAMES = {
+        'enqueue': "Ожидание в очереди",
+        'cache_lookup': "Поиск в кэше",
+        'route': "Маршрутизация",
+        'render': "Рендер шаблона",
+        'deepthink_wait': "Ожидание DeepThink",
+        'generated': "Генерация завершена",
+        'first_chunk_displayed': "Первый фрагмент на экране",
+        'typing_complete': "Печать завершена"
+    }
+
+    def __init__(self, master, tracer, scheduler, cache=None, dispatcher=None, interval=1000):
+        super().__init__(master, bg='#0d1117')
+        self.title("⏱ Метрики запросов")
+        self.geometry("760x520")
+        self.tracer = tracer
+        self.scheduler = scheduler
+        self.cache = cache
+        self.dispatcher = dispatcher
+        self.interval = interval
+        
+        toolbar = tk.Frame(self, bg='#0d1117')
+        toolbar.pack(fill=tk.X, padx=10, pady=(10, 0))
+        SmoothButton(toolbar, text="💾 Сохранить JSON", command=self.save_json,
+                     width=160, height=34, bg_color='#0d1117',
+                     font=('Segoe UI', 10, 'bold')).pack(side=tk.LEFT)
+        
+        self.text = tk.Text(self, bg='#161b22', fg='#e6edf3', font=('Cascadia Code', 10),
+                            relief=tk.FLAT, bd=0, wrap=tk.NONE)
+        self.text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self._after_id = None
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self.refresh()
+
+    def refresh(self):
+        """Перерисовка таблицы метрик"""
+        snapshot = self.tracer.snapshot()
+        queue = self.scheduler.stats()
+        lines = [f"{'Этап':<28}{'N':>7}{'p50, мс':>11}{'p95, мс':>11}{'p99, мс':>11}"]
+        for stage, summary in snapshot['stages'].items():
+            lines.append(self._row(self.STAGE_NAMES.get(stage, stage), summary))
+        lines += ["", f"{'Шаблон':<28}{'N':>7}{'p50, мс':>11}{'p95, мс':>11}{'p99, мс':>11}"]
+        for template, summary in sorted(snapshot['templates'].items()):
+            lines.append(self._row(template, summary))
+        lines += ["", f"Очередь: ожидают {queue['queue_depth']}, выполняются {queue['running']}, "
+                      f"готово {queue['completed']}, отменено {queue['cancelled']}, "
+                      f"отклонено {queue['rejected']}"]
+        if self.cache is not None:
+            cache = self.cache.stats()
+            lines.append(f"Кэш: попаданий {cache['memory_hits'] + cache['disk_hits']}, "
+                         f"промахов {cache['misses']} ({cache['hit_rate']:.0%})")
+        if self.dispatcher is not None:
+            ui = self.dispatcher.stats()
+            lines.append(f"UI: сообщений {ui['posted']}, схлопнуто {ui['coalesced']}, "
+                         f"в очереди {ui['pending']}, макс. за кадр {ui['max_batch']}, "
+                         f"опрос {ui['poll_ms']} мс")
+        if not self.tracer.enabled:
+            lines += ["", "Трассировка выключена"]
+        
+        self.text.configure(state=tk.NORMAL)
+        self.text.delete(1.0, tk.END)
+        self.text.insert(tk.END, "\n".join(lines))
+        self.text.configure(state=tk.DISABLED)
+        self._after_id = self.after(self.interval, self.refresh)
+
+    def _row(self, name, summary):
+        return (f"{name:<28}{summary['count']:>7}{summary['p50_ms']:>11.1f}"
+                f"{summary['p95_ms']:>11.1f}{summary['p99_ms']:>11.1f}")
+
+    def save_json(self):
+        """Сохранение сводки метрик в файл"""
+        from tkinter import filedialog
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=".json",
+                                            filetypes=[("JSON", "*.json")],
+                                            initialfile="vurtix-metrics.json")
+        if path:
+            self.tracer.dump(path)
+
+    def close(self):
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+        self.destroy()
 
 class DeepSeekAIApp:
-    def __init__(self, root):
+    def __init__(self, root, fast_start=True):
         self.root = root
         self.root.title("DeepSeek AI Assistant")
         self.root.geometry("1200x800")
@@ -548,12 +4906,54 @@ class DeepSeekAIApp:
         self.style.configure('TEntry', fieldbackground='#161b22', foreground='white')
         self.style.configure('TCombobox', fieldbackground='#161b22', foreground='white')
         
+        self.ui = UIDispatcher(self.root)
+        self.ui.start()
         self.ai = ChatGPTStyleAI()
+        self.tracer = Tracer()
+        self.scheduler = GenerationScheduler(self.ai, tracer=self.tracer)
+        self.active_request = None
+        self.metrics_panel = None
+        self.history = HistoryStore()
+        self.history_panel = None
+        self.docs = None
+        self.docs_panel = None
+        self._docs_thread = None
+        self.exporter = Exporter(self.history, on_progress=self._on_export_progress,
+                                 on_done=self._on_export_done)
         self.learner = AISelfLearner()
         self.typewriter = None
+        self.on_ready = None
         
         self.setup_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        STARTUP.mark("Интерфейс построен")
+        
+        if fast_start:
+            # Окно показывается сразу, остальное - после первой отрисовки
+            self.root.bind('<Map>', self._on_first_map, add='+')
+        else:
+            self._deferred_init()
+    
+    def _on_first_map(self, event):
+        """Первая отрисовка окна - запуск отложенной инициализации"""
+        if event.widget is not self.root:
+            return
+        self.root.unbind('<Map>')
+        STARTUP.mark("Окно отображено")
+        self.root.after_idle(self._deferred_init)
+    
+    def _deferred_init(self):
+        """Некритичная инициализация: дисковый кэш, наборы шаблонов,
+        нечеткий маршрутизатор и автообучение"""
+        self.ai.cache = ResponseCache(CACHE_PATH)
+        self.ai.packs = load_template_packs()
+        self.ai.fuzzy_router()
+        self.learner.subscribe(self._on_learning_update)
+        self.learner.load_knowledge()
         self.learner.auto_learn()  # Автообучение при запуске
+        STARTUP.mark("Фоновая инициализация")
+        if self.on_ready:
+            self.on_ready()
     
     def setup_ui(self):
         main_frame = ttk.Frame(self.root, padding=20)
@@ -569,7 +4969,7 @@ class DeepSeekAIApp:
         title_label.pack(side=tk.LEFT)
         
         # Статус обучения
-        self.learning_status = tk.StringVar(value="🔄 Автообучение: 0/1000")
+        self.learning_status = tk.StringVar(value=f"🔄 Автообучение: 0/{self.learner.total_capacity}")
         status_label = tk.Label(header_frame, textvariable=self.learning_status,
                                font=('Segoe UI', 10), bg='#0d1117', fg='#8b949e')
         status_label.pack(side=tk.RIGHT)
@@ -591,6 +4991,13 @@ class DeepSeekAIApp:
         self.prompt_entry.pack(fill=tk.X, padx=10, pady=8)
         self.prompt_entry.bind('<Return>', lambda e: self.generate_code())
         
+        # Составной режим: код из шаблонов всех найденных намерений
+        self.compose_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(input_frame, text="🧩 Собрать из всех подходящих шаблонов",
+                       variable=self.compose_var, font=('Segoe UI', 10),
+                       bg='#0d1117', fg='#8b949e', selectcolor='#161b22',
+                       activebackground='#0d1117', activeforeground='white').pack(anchor=tk.W)
+        
         # Кнопки действий
         button_frame = ttk.Frame(main_frame)
         button_frame.pack(fill=tk.X, pady=10)
@@ -599,8 +5006,11 @@ class DeepSeekAIApp:
         buttons = [
             ("🚀 Сгенерировать код", self.generate_code, "#10a37f", "#0d8a72", 180),
             ("🤔 DeepThink", self.deep_think_generate, "#8b5cf6", "#7c3aed", 120),
-            ("🌐 Поиск в интернете", self.web_search, "#0ea5e9", "#0284c7", 160),
-            ("📊 Статус обучения", self.show_learning_status, "#f59e0b", "#d97706", 140)
+            ("📚 Документация", self.show_docs, "#0ea5e9", "#0284c7", 150),
+            ("📊 Статус обучения", self.show_learning_status, "#f59e0b", "#d97706", 140),
+            ("📜 История", self.show_history, "#ec4899", "#db2777", 110),
+            ("💾 Экспорт", self.show_export_menu, "#14b8a6", "#0d9488", 110),
+            ("⏱ Метрики", self.show_metrics, "#64748b", "#475569", 110)
         ]
         
         for text, command, color, hover_color, width in buttons:
@@ -614,18 +5024,42 @@ class DeepSeekAIApp:
         output_frame = ttk.Frame(main_frame)
         output_frame.pack(fill=tk.BOTH, expand=True, pady=10)
         
-        tk.Label(output_frame, text="Сгенерированный код:", 
-                font=('Segoe UI', 11, 'bold'), bg='#0d1117', fg='white').pack(anchor=tk.W)
+        output_header = tk.Frame(output_frame, bg='#0d1117')
+        output_header.pack(fill=tk.X)
+        tk.Label(output_header, text="Сгенерированный код:", 
+                font=('Segoe UI', 11, 'bold'), bg='#0d1117', fg='white').pack(side=tk.LEFT)
         
-        # Текстовое поле с стилем code editor
-        self.code_text = scrolledtext.ScrolledText(output_frame, height=20,
-                                                  bg='#161b22', fg='#e6edf3',
-                                                  font=('Cascadia Code', 10),
-                                                  relief=tk.FLAT, bd=0,
-                                                  insertbackground='#e6edf3')
+        # Поиск по выводу и переход к строке
+        self.goto_var = tk.StringVar()
+        goto_entry = tk.Entry(output_header, textvariable=self.goto_var, width=7,
+                              bg='#161b22', fg='#e6edf3', insertbackground='#e6edf3',
+                              relief=tk.FLAT, font=('Segoe UI', 10))
+        goto_entry.pack(side=tk.RIGHT, padx=(5, 0))
+        goto_entry.bind('<Return>', lambda event: self.goto_line())
+        tk.Label(output_header, text="Строка:", font=('Segoe UI', 10),
+                 bg='#0d1117', fg='#8b949e').pack(side=tk.RIGHT, padx=(10, 0))
+        
+        self.search_var = tk.StringVar()
+        self.search_entry = tk.Entry(output_header, textvariable=self.search_var, width=24,
+                                     bg='#161b22', fg='#e6edf3', insertbackground='#e6edf3',
+                                     relief=tk.FLAT, font=('Segoe UI', 10))
+        self.search_entry.pack(side=tk.RIGHT, padx=(5, 0))
+        self.search_entry.bind('<Return>', lambda event: self.find_in_output())
+        tk.Label(output_header, text="🔍", font=('Segoe UI', 10),
+                 bg='#0d1117', fg='#8b949e').pack(side=tk.RIGHT)
+        self.root.bind('<Control-f>', lambda event: self.search_entry.focus_set())
+        self.root.bind('<Control-g>', lambda event: goto_entry.focus_set())
+        
+        # Поле вывода в стиле code editor: в виджете только видимое окно строк
+        self.code_text = CodeView(output_frame, height=20,
+                                  bg='#161b22', fg='#e6edf3',
+                                  font=('Cascadia Code', 10),
+                                  relief=tk.FLAT, bd=0)
         self.code_text.pack(fill=tk.BOTH, expand=True, pady=5)
         
+        self.highlighter = SyntaxHighlighter(self.code_text)
         self.typewriter = TypeWriter(self.code_text)
+        self.typewriter.on_complete = self._on_typing_complete
         
         # Статус бар
         status_bar = tk.Frame(main_frame, bg='#161b22', height=30)
@@ -636,15 +5070,36 @@ class DeepSeekAIApp:
         status_label = tk.Label(status_bar, textvariable=self.status_var,
                                bg='#161b22', fg='#8b949e', font=('Segoe UI', 9))
         status_label.pack(side=tk.LEFT, padx=10)
-        
-        # Обновление статуса обучения
-        self.update_learning_status()
+    
+    def on_close(self):
+        """Закрытие окна: сохранение базы знаний и остановка фоновых задач"""
+        self.learner.stop_learning()
+        try:
+            self.learner.save_knowledge()
+        except OSError as e:
+            print(f"Ошибка сохранения базы знаний: {e}")
+        self.scheduler.shutdown()
+        self.highlighter.stop()
+        if self.exporter.running:
+            # Экспорт проверяет отмену после каждой записи - файл закрывается сразу
+            self.exporter.cancel()
+            self.exporter.wait(2.0)
+        if self.ai.cache is not None:
+            # Время попаданий в память копится пачкой - дописываем его на диск
+            self.ai.cache.close()
+        self.ui.close()
+        self.root.destroy()
+    
+    def _on_learning_update(self, learner):
+        """Изменение состояния обучения (поток планировщика) - передаем в UI"""
+        self.ui.post_latest('learning_status', self.update_learning_status)
     
     def update_learning_status(self):
         """Обновление статуса обучения"""
         if self.learner.is_learning:
-            self.learning_status.set(f"🔄 Автообучение: {self.learner.learning_progress}/1000")
-            self.root.after(5000, self.update_learning_status)  # Обновлять каждые 5 сек
+            self.learning_status.set(f"🔄 Автообучение: {len(self.learner.knowledge_base)}/{self.learner.total_capacity}")
+        else:
+            self.learning_status.set(f"⏸ Автообучение: {len(self.learner.knowledge_base)}/{self.learner.total_capacity}")
     
     def generate_code(self):
         """Генерация кода"""
@@ -653,10 +5108,7 @@ class DeepSeekAIApp:
             messagebox.showwarning("Внимание", "Пожалуйста, введите запрос!")
             return
         
-        self.status_var.set("🤖 Генерирую код...")
-        thread = threading.Thread(target=self._generate_thread, args=(prompt, False))
-        thread.daemon = True
-        thread.start()
+        self._submit(prompt, False, "🤖 Генерирую код...")
     
     def deep_think_generate(self):
         """Генерация с DeepThink"""
@@ -665,57 +5117,798 @@ class DeepSeekAIApp:
             messagebox.showwarning("Внимание", "Пожалуйста, введите запрос!")
             return
         
-        self.status_var.set("🤔 DeepThink - обдумываю...")
-        thread = threading.Thread(target=self._generate_thread, args=(prompt, True))
-        thread.daemon = True
-        thread.start()
+        self._submit(prompt, True, "🤔 DeepThink - обдумываю...")
+    
+    def _submit(self, prompt, deep_think, status):
+        """Постановка запроса в планировщик; на экране - последний запрос"""
+        request = self.scheduler.submit(prompt, deep_think,
+                                        on_chunk=self._on_chunk, on_done=self._on_done,
+                                        on_progress=self._on_progress,
+                                        compose=self.compose_var.get())
+        self.ui.wake()
+        if request is None:
+            self.status_var.set("⏳ Очередь генерации заполнена, попробуйте позже")
+            return
+        
+        # Фрагменты приходят через ui.post - поток открывается раньше первого из них
+        self.typewriter.start_stream(0.03)
+        self.active_request = request
+        self.status_var.set(f"{status} | В очереди: {self.scheduler.queue_depth}")
+    
+    def _on_chunk(self, request, chunk):
+        """Фрагмент от потока пула - передаем в UI"""
+        self.ui.post(self._show_chunk, request, chunk)
+    
+    def _on_done(self, request):
+        """Завершение запроса в потоке пула - передаем в UI"""
+        self.ui.post(self._finish_request, request)
+    
+    def _on_progress(self, request, stage, index, total):
+        """Этап DeepThink - передаем в UI"""
+        self.ui.post_latest(('progress', id(request)), self._show_progress, request, stage, index, total)
+    
+    def _show_progress(self, request, stage, index, total):
+        if request is self.active_request and not request.done:
+            self.status_var.set(f"🤔 DeepThink: {stage} ({index + 1}/{total})")
+    
+    def _show_chunk(self, request, chunk):
+        if request is self.active_request:
+            self.typewriter.feed(chunk)
+            request.trace.mark('first_chunk_displayed')
+    
+    def _on_typing_complete(self):
+        """Печать результата завершена (трассу закрыл планировщик - учитывается только этап)"""
+        request = self.active_request
+        if request is not None and request.done and request.error is None:
+            request.trace.mark('typing_complete')
+    
+    def _finish_request(self, request):
+        """Итог генерации в статус баре"""
+        if request is not self.active_request or request.cancelled:
+            return
+        
+        self.typewriter.end_stream()
+        if request.error is not None:
+            self.status_var.set(f"❌ Ошибка: {str(request.error)}")
+            return
+        
+        stream = request.stream
+        route = stream.route if stream is not None else self.ai.route_for(request.prompt, request.compose)
+        self.history.add(request.prompt, request.code, route, request.deep_think, request.compose)
+        source = "⚡ Из кэша" if stream is not None and stream.cached else "✅ Код сгенерирован!"
+        first_chunk = stream.first_chunk_time if stream is not None and stream.first_chunk_time else 0.0
+        self.status_var.set(f"{source} Ожидание: {request.wait_time * 1000:.0f} мс, "
+                            f"первый фрагмент: {first_chunk * 1000:.0f} мс, "
+                            f"всего: {request.run_time * 1000:.0f} мс")
+    
+    def show_docs(self):
+        """Окно офлайн-поиска по документации; без индекса - запуск сборки"""
+        if self.docs is None:
+            try:
+                self.docs = DocIndex(DOC_INDEX_PATH)
+            except ImportError:
+                messagebox.showerror("Документация", "Для поиска по документации нужен NumPy")
+                return
+            except (OSError, ValueError, struct.error):
+                self.docs = None
+        if self.docs_panel is not None and self.docs_panel.winfo_exists():
+            self.docs_panel.query_var.set(self.prompt_var.get())
+            self.docs_panel.lift()
+        else:
+            self.docs_panel = DocSearchPanel(self.root, lambda: self.docs, self.rebuild_docs,
+                                             self.prompt_var.get())
+        if self.docs is None:
+            self.rebuild_docs()
+    
+    def rebuild_docs(self):
+        """Инкрементальное обновление индекса документации в фоновом потоке"""
+        if self._docs_thread is not None and self._docs_thread.is_alive():
+            return
+        self._docs_thread = threading.Thread(target=self._build_docs, daemon=True,
+                                             name="vurtix-docs")
+        self._docs_thread.start()
     
-    def _generate_thread(self, prompt, deep_think):
-        """Поток генерации кода"""
+    def _build_docs(self):
+        """Сборка индекса (фоновый поток); результат передается в UI"""
         try:
-            code = self.ai.generate_code(prompt, deep_think)
-            
-            self.root.after(0, lambda: self.typewriter.type_text(code, 0.03))
-            self.root.after(0, lambda: self.status_var.set("✅ Код сгенерирован!"))
-            
+            # Открытый индекс заменяет поток UI, закрыв его отображение
+            stats = DocIndex.update(DOC_INDEX_PATH, on_progress=self._on_docs_progress,
+                                    install=False)
+            error = None
         except Exception as e:
-            self.root.after(0, lambda: self.status_var.set(f"❌ Ошибка: {str(e)}"))
+            stats, error = None, e
+        self.ui.post(self._on_docs_built, stats, error)
     
-    def web_search(self):
-        """Поиск в интернете"""
-        prompt = self.prompt_var.get()
-        if not prompt:
-            messagebox.showwarning("Внимание", "Пожалуйста, введите запрос для поиска!")
+    def _on_docs_progress(self, done, total):
+        """Прогресс сборки индекса (фоновый поток) - передаем в UI"""
+        self.ui.post_latest('docs_progress', self._set_docs_status,
+                            f"📚 Индексация документации: {done}/{total}")
+    
+    def _on_docs_built(self, stats, error):
+        """Новый индекс готов: замена файла, переоткрытие и повтор поиска"""
+        if error is None:
+            if self.docs is not None:
+                self.docs.close()
+                self.docs = None
+            try:
+                DocIndex.install(stats['pending'], DOC_INDEX_PATH)
+            except OSError as e:
+                error = e
+            try:
+                # После неудачной замены открываем прежний индекс, если он есть
+                self.docs = DocIndex(DOC_INDEX_PATH)
+            except (OSError, ValueError, struct.error) as e:
+                error = error or e
+        if error is not None:
+            self._set_docs_status(f"❌ Ошибка индексации: {error}")
+            if self.docs_panel is not None and self.docs_panel.winfo_exists():
+                self.docs_panel.search()
             return
-        
-        search_query = f"python programming {prompt}"
-        search_url = f"https://www.google.com/search?q={search_query.replace(' ', '+')}"
-        webbrowser.open(search_url)
-        self.status_var.set("🌐 Открываю поиск в браузере...")
+        if self.docs_panel is not None and self.docs_panel.winfo_exists():
+            self.docs_panel.search()
+        self._set_docs_status(f"📚 Индекс обновлен за {stats['seconds']:.1f} с: "
+                              f"разобрано {stats['parsed']}, без изменений {stats['reused']} "
+                              f"из {stats['sources']} источников, документов {stats['docs']}")
+    
+    def _set_docs_status(self, message):
+        self.status_var.set(message)
+        if self.docs_panel is not None and self.docs_panel.winfo_exists():
+            self.docs_panel.set_status(message)
+    
+    def find_in_output(self):
+        """Поиск следующего вхождения в выводе"""
+        pattern = self.search_var.get()
+        if not pattern:
+            return
+        line = self.code_text.find_next(pattern)
+        if line is None:
+            self.status_var.set(f"🔍 «{pattern}» не найдено")
+        else:
+            self.status_var.set(f"🔍 «{pattern}»: строка {line} из {self.code_text.line_count}")
+    
+    def goto_line(self):
+        """Переход к строке вывода по номеру"""
+        try:
+            number = int(self.goto_var.get())
+        except ValueError:
+            return
+        line = self.code_text.goto_line(number)
+        self.status_var.set(f"↪ Строка {line} из {self.code_text.line_count}")
+    
+    def show_history(self):
+        """Окно истории запросов сессии"""
+        if self.history_panel is not None and self.history_panel.winfo_exists():
+            self.history_panel.lift()
+            return
+        self.history_panel = HistoryPanel(self.root, self.history, self.restore_history)
+    
+    def restore_history(self, entry):
+        """Вывод кода из истории без повторной генерации"""
+        code = self.history.code(entry)
+        if code is None:
+            return
+        if self.active_request is not None:
+            self.scheduler.cancel(self.active_request)
+            self.active_request = None
+        self.prompt_var.set(entry.prompt)
+        self.typewriter.type_text(code, 0)
+        self.status_var.set(f"📜 Из истории: {entry.prompt}")
+    
+    def show_export_menu(self):
+        """Меню экспорта у курсора"""
+        menu = tk.Menu(self.root, tearoff=0, bg='#161b22', fg='#e6edf3',
+                       activebackground='#10a37f', activeforeground='white')
+        menu.add_command(label="Текущий код в файл...", command=self.export_code)
+        menu.add_separator()
+        menu.add_command(label="История в JSONL...", command=lambda: self.export_history('jsonl'))
+        menu.add_command(label="История в ZIP-архив...", command=lambda: self.export_history('zip'))
+        menu.add_command(label="История: файл на запись...", command=lambda: self.export_history('files'))
+        if self.exporter.running:
+            menu.add_separator()
+            menu.add_command(label="Прервать экспорт", command=self.exporter.cancel)
+        menu.tk_popup(self.root.winfo_pointerx(), self.root.winfo_pointery())
+    
+    def export_code(self):
+        """Сохранение выведенного кода в файл"""
+        from tkinter import filedialog
+        if self.exporter.running:
+            messagebox.showinfo("Экспорт", "Экспорт уже выполняется")
+            return
+        path = filedialog.asksaveasfilename(parent=self.root, defaultextension=".py",
+                                            filetypes=[("Python", "*.py"), ("Все файлы", "*.*")],
+                                            initialfile="vurtix_code.py")
+        if path:
+            self.exporter.export_code(self.code_text.buffer.chunks(), path)
+            self.status_var.set(f"💾 Экспорт кода: {path}")
+    
+    def export_history(self, fmt):
+        """Экспорт всей истории сессии"""
+        from tkinter import filedialog
+        if self.exporter.running:
+            messagebox.showinfo("Экспорт", "Экспорт уже выполняется")
+            return
+        if not len(self.history):
+            messagebox.showinfo("Экспорт", "История пуста")
+            return
+        if fmt == 'files':
+            path = filedialog.askdirectory(parent=self.root, mustexist=False)
+        else:
+            path = filedialog.asksaveasfilename(parent=self.root, defaultextension=f".{fmt}",
+                                                filetypes=[(fmt.upper(), f"*.{fmt}")],
+                                                initialfile=f"vurtix_history.{fmt}")
+        if path:
+            entries = reversed(self.history.recent(len(self.history)))
+            self.exporter.export_history(entries, path, fmt)
+            self.status_var.set(f"💾 Экспорт истории: {path}")
+    
+    def _on_export_progress(self, done, total, written):
+        """Прогресс экспорта (фоновый поток) - передаем в UI"""
+        self.ui.post_latest('export_progress', self.status_var.set,
+                            f"💾 Экспорт: {done}/{total}, {written / 1024 / 1024:.1f} МБ")
+    
+    def _on_export_done(self, path, done, written, elapsed, error, cancelled):
+        """Завершение экспорта (фоновый поток) - передаем в UI"""
+        if error is not None:
+            message = f"❌ Ошибка экспорта: {error}"
+        elif cancelled:
+            message = (f"⏹ Экспорт прерван: записано {done} шт., "
+                       f"{written / 1024 / 1024:.1f} МБ → {path}")
+        else:
+            speed = written / 1024 / 1024 / elapsed if elapsed else 0.0
+            message = (f"💾 Экспорт завершен: {done} шт., {written / 1024 / 1024:.1f} МБ "
+                       f"за {elapsed:.1f} с ({speed:.0f} МБ/с) → {path}")
+        self.ui.post(self.status_var.set, message)
+    
+    def show_metrics(self):
+        """Окно живых метрик запросов"""
+        if self.metrics_panel is not None and self.metrics_panel.winfo_exists():
+            self.metrics_panel.lift()
+            return
+        self.metrics_panel = MetricsPanel(self.root, self.tracer, self.scheduler, self.ai.cache, self.ui)
     
     def show_learning_status(self):
         """Показать статус обучения"""
+        queue = self.scheduler.stats()
+        knowledge = self.learner.knowledge_base
+        topics = sorted(knowledge.topics().items(), key=lambda item: -item[1])[:3]
+        top_topics = ", ".join(f"{topic} ({count})" for topic, count in topics) or "нет"
         status = f"""
 📊 Статус обучения DeepSeek AI:
 
-• Прогресс обучения: {self.learner.learning_progress}/1000
+• Прогресс обучения: {len(knowledge)}/{knowledge.capacity}
 • Автообучение: {'🟢 Включено' if self.learner.is_learning else '🔴 Выключено'}
 • Последнее обновление: {self.learner.last_learn_time.strftime('%H:%M:%S')}
 • Изучено концептов: {self.learner.learning_progress}
+• Основные темы: {top_topics}
+{self._cache_status()}
+• Очередь генерации: ожидают {queue['queue_depth']}, выполняются {queue['running']}, отклонено {queue['rejected']}
+• Ожидание/выполнение: {queue['avg_wait'] * 1000:.0f} / {queue['avg_run'] * 1000:.0f} мс
 
 AI автоматически обучается каждые 10 секунд!
         """
         messagebox.showinfo("Статус обучения", status)
+    
+    def _cache_status(self):
+        """Строки статуса кэша ответов"""
+        if self.ai.cache is None:
+            return "• Кэш ответов: выключен"
+        cache = self.ai.cache.stats()
+        return (f"• Кэш ответов: попаданий {cache['memory_hits']} (память) + {cache['disk_hits']} (диск), "
+                f"промахов {cache['misses']}\n"
+                f"• Время ответа: из кэша {cache['avg_hit_time'] * 1000:.1f} мс, "
+                f"без кэша {cache['avg_miss_time'] * 1000:.1f} мс")
+
+class GenerationServer:
+    """Локальный HTTP-сервис генерации на asyncio
+
+    POST /generate  {"prompt": "...", "deep_think": false, "stream": false, "compose": false}
+    GET  /health    состояние сервиса
+    GET  /metrics   счетчики запросов, задержки, кэш
+
+    Соединения HTTP/1.1 keep-alive; при "stream": true ответ отдается
+    фрагментами (chunked). Одновременно выполняется не больше
+    max_concurrency генераций, остальные получают 429. DeepThink ждет
+    этапы через asyncio.sleep и не блокирует другие соединения.
+    """
+    MAX_BODY = 1024 * 1024
+    MAX_HEADERS = 100
+    REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               411: "Length Required", 413: "Payload Too Large", 429: "Too Many Requests",
+               431: "Request Header Fields Too Large", 500: "Internal Server Error"}
+
+    class RequestError(Exception):
+        """Некорректный запрос: ответ status и закрытие соединения"""
+        def __init__(self, status, message):
+            super().__init__(message)
+            self.status = status
 
-def main():
+    def __init__(self, ai=None, host="127.0.0.1", port=8765, max_concurrency=64):
+        self.ai = ai or ChatGPTStyleAI(cache=ResponseCache())
+        self.pipeline = DeepThinkPipeline(self.ai)
+        self.host = host
+        self.port = port
+        self.max_concurrency = max_concurrency
+        self.active = 0
+        self.connections = 0
+        self.requests = 0
+        self.statuses = {}
+        self.latencies = deque(maxlen=2048)
+        self.tracer = Tracer()
+        self.started = time.time()
+        self.server = None
+
+    async def start(self):
+        """Запуск прослушивания порта"""
+        import asyncio
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    def serve_forever(self):
+        """Блокирующий запуск сервиса"""
+        import asyncio
+        
+        async def serve():
+            await self.start()
+            print(f"🌐 Сервис генерации: http://{self.host}:{self.port} "
+                  f"(одновременно: {self.max_concurrency})")
+            async with self.server:
+                await self.server.serve_forever()
+        
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            pass
+
+    def metrics(self):
+        """Счетчики и перцентили задержек"""
+        latencies = sorted(self.latencies)
+        
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+        
+        return {
+            'uptime_s': time.time() - self.started,
+            'requests': self.requests,
+            'statuses': {str(code): count for code, count in sorted(self.statuses.items())},
+            'active': self.active,
+            'connections': self.connections,
+            'deep_think_active': self.pipeline.active,
+            'max_concurrency': self.max_concurrency,
+            'latency_ms': {'p50': percentile(0.5), 'p95': percentile(0.95), 'p99': percentile(0.99)},
+            'templates': self.tracer.snapshot()['templates'],
+            'cache': self.ai.cache.stats() if self.ai.cache is not None else None
+        }
+
+    async def _handle(self, reader, writer):
+        """Обработка соединения: последовательные запросы keep-alive"""
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except self.RequestError as e:
+                    # После ошибки разбора граница следующего запроса неизвестна - закрываем
+                    await self._send_json(writer, e.status, {'error': str(e)}, False)
+                    self.requests += 1
+                    self.statuses[e.status] = self.statuses.get(e.status, 0) + 1
+                    break
+                if request is None:
+                    break
+                method, path, headers, body, keep_alive = request
+                started = time.perf_counter()
+                try:
+                    status = await self._dispatch(method, path, body, writer, keep_alive)
+                except ConnectionError:
+                    raise
+                except Exception as e:
+                    # Ошибка генерации (шаблон, набор на диске) - 500, соединение закрывается
+                    status = await self._send_json(writer, 500, {'error': f"внутренняя ошибка: {e}"},
+                                                   False)
+                self.requests += 1
+                self.statuses[status] = self.statuses.get(status, 0) + 1
+                if status == 200 and path == "/generate":
+                    self.latencies.append(time.perf_counter() - started)
+                if not keep_alive or status == 500:
+                    break
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _read_request(self, reader):
+        """Разбор запроса: (метод, путь, заголовки, тело, keep-alive) или None - соединение закрыто
+
+        Ошибки разбора - RequestError с кодом ответа: 400 (строка запроса,
+        заголовок, Content-Length), 411 (POST без длины), 413 (тело больше
+        MAX_BODY), 431 (больше MAX_HEADERS заголовков или слишком длинная строка).
+        """
+        import asyncio
+        try:
+            line = await reader.readline()
+            if not line:
+                return None
+            parts = line.decode('latin-1').split()
+            if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+                raise self.RequestError(400, "некорректная строка запроса")
+            method, path, version = parts
+            headers = {}
+            count = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                count += 1
+                if count > self.MAX_HEADERS:
+                    raise self.RequestError(431, "слишком много заголовков")
+                name, separator, value = line.decode('latin-1').partition(":")
+                if not separator or not name.strip():
+                    raise self.RequestError(400, "некорректный заголовок")
+                headers[name.strip().lower()] = value.strip()
+            
+            if 'content-length' in headers:
+                try:
+                    length = int(headers['content-length'])
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    raise self.RequestError(400, "некорректный Content-Length")
+            elif method.upper() == "POST":
+                raise self.RequestError(411, "нужен Content-Length")
+            else:
+                length = 0
+            if length > self.MAX_BODY:
+                raise self.RequestError(413, "тело запроса слишком большое")
+            body = await reader.readexactly(length) if length else b""
+        except (ValueError, asyncio.LimitOverrunError):
+            # readline: строка длиннее лимита буфера потока
+            raise self.RequestError(431, "слишком длинная строка запроса или заголовка")
+        except asyncio.IncompleteReadError:
+            return None
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+        return method.upper(), path.split("?", 1)[0], headers, body, keep_alive
+
+    async def _dispatch(self, method, path, body, writer, keep_alive):
+        """Маршрутизация запроса; возвращает код ответа"""
+        if path == "/health":
+            return await self._send_json(writer, 200, {'status': 'ok', 'active': self.active}, keep_alive)
+        if path == "/metrics":
+            return await self._send_json(writer, 200, self.metrics(), keep_alive)
+        if path != "/generate":
+            return await self._send_json(writer, 404, {'error': 'не найдено'}, keep_alive)
+        if method != "POST":
+            return await self._send_json(writer, 405, {'error': 'нужен POST'}, keep_alive)
+        
+        import json
+        try:
+            payload = json.loads(body or b"{}")
+            prompt = payload['prompt']
+            if not isinstance(prompt, str) or not prompt:
+                raise ValueError
+        except (ValueError, KeyError, TypeError):
+            return await self._send_json(writer, 400, {'error': 'ожидается JSON с полем prompt'}, keep_alive)
+        
+        if self.active >= self.max_concurrency:
+            return await self._send_json(writer, 429, {'error': 'сервис перегружен'}, keep_alive,
+                                         extra_headers={'Retry-After': '1'})
+        
+        self.active += 1
+        try:
+            return await self._generate(writer, prompt, bool(payload.get('deep_think')),
+                                        bool(payload.get('stream')), keep_alive,
+                                        bool(payload.get('compose')))
+        finally:
+            self.active -= 1
+
+    async def _generate(self, writer, prompt, deep_think, stream, keep_alive, compose=False):
+        """Генерация с ответом целиком или фрагментами"""
+        trace = self.tracer.start()
+        status = 'error'
+        try:
+            result = await self._respond(writer, prompt, deep_think, stream, keep_alive, compose, trace)
+            if result == 200:
+                status = 'ok'
+            return result
+        except ConnectionError:
+            status = 'cancelled'
+            raise
+        finally:
+            trace.finish(status)
+
+    async def _respond(self, writer, prompt, deep_think, stream, keep_alive, compose, trace):
+        """Ответ целиком (JSON) или фрагментами (chunked); возвращает код ответа"""
+        started = time.perf_counter()
+        if stream:
+            chunks = self._chunks(prompt, deep_think, compose, trace)
+            # Первый фрагмент - до заголовка: ошибка маршрутизации и рендера еще может стать 500
+            try:
+                first = [await chunks.__anext__()]
+            except StopAsyncIteration:
+                first = []
+            writer.write(self._head(200, "text/plain; charset=utf-8", keep_alive,
+                                    {'Transfer-Encoding': 'chunked'}))
+            try:
+                for chunk in first:
+                    self._write_chunk(writer, chunk)
+                async for chunk in chunks:
+                    self._write_chunk(writer, chunk)
+                    await writer.drain()
+            except ConnectionError:
+                raise
+            except Exception:
+                # Заголовок 200 уже отправлен: ответ обрывается без завершающего фрагмента
+                return 500
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+            return 200
+        
+        chunks = [chunk async for chunk in self._chunks(prompt, deep_think, compose, trace)]
+        return await self._send_json(writer, 200, {
+            'code': "".join(chunks),
+            'elapsed_ms': (time.perf_counter() - started) * 1000
+        }, keep_alive)
+
+    async def _chunks(self, prompt, deep_think, compose=False, trace=NULL_TRACE):
+        """Фрагменты кода: DeepThink - через асинхронный конвейер"""
+        if deep_think:
+            async for _, _, _, chunk in self.pipeline.stream(prompt, trace, compose):
+                if chunk is not None:
+                    yield chunk
+        else:
+            plan = self.ai.plan_code(prompt, trace=trace, compose=compose)
+            for _, _, chunks in plan.stages:
+                for chunk in chunks:
+                    yield chunk
+            self.ai.finish_plan(plan)
+
+    @staticmethod
+    def _write_chunk(writer, chunk):
+        data = chunk.encode('utf-8')
+        writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+    def _head(self, status, content_type, keep_alive, extra_headers=None, length=None):
+        lines = [f"HTTP/1.1 {status} {self.REASONS.get(status, '')}",
+                 f"Content-Type: {content_type}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if length is not None:
+            lines.append(f"Content-Length: {length}")
+        for name, value in (extra_headers or {}).items():
+            lines.append(f"{name}: {value}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1')
+
+    async def _send_json(self, writer, status, payload, keep_alive, extra_headers=None):
+        import json
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        writer.write(self._head(status, "application/json; charset=utf-8", keep_alive,
+                                extra_headers, len(body)) + body)
+        await writer.drain()
+        return status
+
+_BATCH_AI = None
+BATCH_CHUNK = 1024          # запросов в пачке, отправляемой процессу
+BATCH_PARALLEL_MIN = 8192   # на входе меньше - пул процессов не окупает запуск
+
+def _batch_worker_init():
+    """Инициализация процесса-исполнителя пакетного режима"""
+    global _BATCH_AI
+    _BATCH_AI = ChatGPTStyleAI(packs=load_template_packs())
+
+def _batch_generate(items):
+    """Генерация пачки запросов: [(номер, запрос)] -> строки JSONL результатов
+
+    Результаты сериализуются здесь же: из процесса возвращается одна
+    строка, а не список словарей, и JSON кодируется параллельно.
+    """
+    import json
+    ai = _BATCH_AI or ChatGPTStyleAI()
+    ai.prefetch_routes([item['prompt'] for _, item in items if 'error' not in item])
+    results = []
+    for index, item in items:
+        if 'error' in item:
+            results.append(json.dumps(dict(item, index=index), ensure_ascii=False))
+            continue
+        try:
+            # Паузы DeepThink - темп вывода на экран, в пакетном режиме не нужны
+            plan = ai.plan_code(item['prompt'], item.get('deep_think', False),
+                                compose=item.get('compose', False))
+            result = {'route': plan.route, 'code': plan.code}
+        except Exception as e:
+            result = {'error': str(e)}
+        results.append(json.dumps(dict(item, index=index, **result), ensure_ascii=False))
+    return "\n".join(results) + "\n"
+
+def _read_batch(lines, chunk_size):
+    """Пачки запросов из JSONL: объект с полем prompt или JSON-строка"""
+    import json
+    chunk = []
+    for index, line in enumerate(lines):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {'prompt': item}
+            if not isinstance(item, dict) or not isinstance(item.get('prompt'), str):
+                raise ValueError("ожидается объект с полем prompt")
+        except ValueError as e:
+            item = {'error': f"строка {index + 1}: {e}"}
+        chunk.append((index, item))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def run_batch(lines, output, workers=None, order="input", chunk_size=BATCH_CHUNK):
+    """Пакетная генерация без интерфейса: JSONL на входе и выходе
+
+    Запросы обрабатываются пачками по chunk_size в пуле процессов; в работе
+    одновременно не больше workers * 2 пачек, поэтому память не зависит от
+    объема входа. Запрос генерируется за десятки микросекунд, и запуск пула
+    окупается только на больших входах: если во входе меньше
+    BATCH_PARALLEL_MIN запросов, он обрабатывается в текущем процессе.
+    order="input" сохраняет порядок входа, "completion" - порядок готовности.
+    """
+    import itertools
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+    
+    workers = workers or os.cpu_count() or 1
+    window = workers * 2
+    count = 0
+    started = time.perf_counter()
+    
+    def emit(text):
+        nonlocal count
+        output.write(text)
+        count += text.count("\n")
+    
+    chunks = _read_batch(lines, chunk_size)
+    head = []
+    if workers > 1:
+        # Начало входа читается заранее: по нему видно, нужен ли пул
+        while sum(map(len, head)) < BATCH_PARALLEL_MIN:
+            chunk = next(chunks, None)
+            if chunk is None:
+                workers = 1
+                break
+            head.append(chunk)
+    chunks = itertools.chain(head, chunks)
+    if workers == 1:
+        _batch_worker_init()
+        for chunk in chunks:
+            emit(_batch_generate(chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_batch_worker_init) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(_batch_generate, chunk))
+                while len(pending) >= window:
+                    if order == "input":
+                        emit(pending.popleft().result())
+                    else:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            pending.remove(future)
+                            emit(future.result())
+            while pending:
+                if order == "input":
+                    emit(pending.popleft().result())
+                else:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pending.remove(future)
+                        emit(future.result())
+    output.flush()
+    
+    elapsed = time.perf_counter() - started
+    return {
+        'prompts': count,
+        'seconds': elapsed,
+        'prompts_per_sec': count / elapsed if elapsed else 0.0,
+        'workers': workers
+    }
+
+def main(argv=None):
     """Запуск приложения"""
+    import argparse
+    parser = argparse.ArgumentParser(description="DeepSeek AI Assistant")
+    parser.add_argument("--no-fast-start", action="store_true",
+                        help="полная инициализация до показа окна")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="вывести профиль этапов запуска")
+    parser.add_argument("--startup-benchmark", action="store_true",
+                        help="замерить время до появления окна, вывести JSON и выйти")
+    parser.add_argument("--batch", metavar="PATH",
+                        help="пакетная генерация без интерфейса из JSONL (- для stdin)")
+    parser.add_argument("--output", metavar="PATH",
+                        help="файл результатов пакетного режима (по умолчанию stdout)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="число процессов пакетного режима (по умолчанию - число ядер)")
+    parser.add_argument("--order", choices=("input", "completion"), default="input",
+                        help="порядок вывода результатов пакетного режима")
+    parser.add_argument("--serve", action="store_true",
+                        help="локальный HTTP-сервис генерации без интерфейса")
+    parser.add_argument("--host", default="127.0.0.1", help="адрес HTTP-сервиса")
+    parser.add_argument("--port", type=int, default=8765, help="порт HTTP-сервиса")
+    parser.add_argument("--max-concurrency", type=int, default=64,
+                        help="предел одновременных генераций HTTP-сервиса")
+    parser.add_argument("--build-pack", metavar="DIR",
+                        help="собрать набор шаблонов из каталога *.py (путь - --output)")
+    parser.add_argument("--index-docs", action="store_true",
+                        help="собрать или обновить индекс офлайн-документации и выйти")
+    args = parser.parse_args(argv)
+    STARTUP.mark("Импорт модулей")
+    
+    if args.build_pack:
+        name = os.path.basename(os.path.normpath(args.build_pack))
+        path = args.output or os.path.join(TEMPLATE_PACK_DIR, name + ".vtp")
+        TemplatePack.build_from_directory(args.build_pack, path)
+        pack = TemplatePack(path)
+        print(f"📦 Набор {pack.name}: {len(pack)} шаблонов → {path}")
+        pack.close()
+        return
+    
+    if args.index_docs:
+        path = args.output or DOC_INDEX_PATH
+        stats = DocIndex.update(path)
+        print(f"📚 Индекс документации: {stats['docs']} документов, {stats['terms']} терминов "
+              f"за {stats['seconds']:.1f} с (разобрано {stats['parsed']}, без изменений "
+              f"{stats['reused']}, ошибок {stats['failed']}) → {path}")
+        return
+    
+    if args.serve:
+        ai = ChatGPTStyleAI(cache=ResponseCache(CACHE_PATH), packs=load_template_packs())
+        try:
+            GenerationServer(ai, host=args.host, port=args.port,
+                             max_concurrency=args.max_concurrency).serve_forever()
+        finally:
+            ai.cache.close()
+        return
+    
+    if args.batch:
+        source = sys.stdin if args.batch == "-" else open(args.batch, encoding='utf-8')
+        output = sys.stdout if not args.output else open(args.output, 'w', encoding='utf-8')
+        try:
+            stats = run_batch(source, output, args.workers, args.order)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if output is not sys.stdout:
+                output.close()
+        print(f"⚡ Обработано запросов: {stats['prompts']} за {stats['seconds']:.2f} с "
+              f"({stats['prompts_per_sec']:.0f} запросов/с, процессов: {stats['workers']})",
+              file=sys.stderr)
+        return
+    
     print("🚀 Запуск DeepSeek AI Assistant...")
     print("Стиль: ChatGPT/DeepSeek")
     print("Функции: Автообучение, DeepThink, Поиск")
-    time.sleep(1)
     
     root = tk.Tk()
-    app = DeepSeekAIApp(root)
+    STARTUP.mark("Создание Tk")
+    app = DeepSeekAIApp(root, fast_start=not args.no_fast_start)
+    
+    def on_ready():
+        if args.profile_startup:
+            print(STARTUP.report())
+        if args.startup_benchmark:
+            import json
+            visible = STARTUP.elapsed("Окно отображено") or STARTUP.elapsed("Фоновая инициализация")
+            print(json.dumps({
+                'window_visible_ms': visible * 1000,
+                'ready_ms': STARTUP.elapsed("Фоновая инициализация") * 1000,
+                'fast_start': not args.no_fast_start
+            }))
+            root.destroy()
+    
+    app.on_ready = on_ready
+    if args.no_fast_start:
+        root.after_idle(on_ready)
     root.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,681 @@
+"""Бенчмарки Vurtix AI
+
+Запуск: python benchmarks.py suite [--group engine|tk|all] [--output results.json]
+                                   [--baseline baseline.json] [--threshold 0.1]
+        python benchmarks.py startup [--runs N]
+        python benchmarks.py knowledge [--sizes 1000,100000,1000000]
+        python benchmarks.py loadtest [--url http://127.0.0.1:8765] [--connections 32]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+import VurtixAI
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(HERE, "VurtixAI.py")
+
+
+def bench_startup(runs=5, fast_start=True):
+    """Время до появления окна: изнутри процесса и по часам снаружи"""
+    command = [sys.executable, APP, "--startup-benchmark"]
+    if not fast_start:
+        command.append("--no-fast-start")
+
+    visible, ready, wall = [], [], []
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run(command, capture_output=True, text=True,
+                                check=True, cwd=HERE).stdout
+        wall.append((time.perf_counter() - started) * 1000)
+        report = json.loads(output.strip().splitlines()[-1])
+        visible.append(report['window_visible_ms'])
+        ready.append(report['ready_ms'])
+
+    return {
+        'window_visible_ms': statistics.median(visible),
+        'ready_ms': statistics.median(ready),
+        'process_ms': statistics.median(wall)
+    }
+
+
+def run_startup(args):
+    """Сравнение быстрого и полного запуска"""
+    if not os.environ.get("DISPLAY") and sys.platform.startswith("linux"):
+        sys.exit("Нужен дисплей: запустите под xvfb-run или с DISPLAY")
+    for fast_start in (True, False):
+        result = bench_startup(args.runs, fast_start)
+        mode = "быстрый запуск" if fast_start else "полный запуск"
+        print(f"{mode:<16} окно: {result['window_visible_ms']:7.1f} мс  "
+              f"готово: {result['ready_ms']:7.1f} мс  "
+              f"процесс: {result['process_ms']:7.1f} мс")
+
+
+def bench_knowledge(size, lookups=100_000):
+    """Хранилище знаний: вставка, память на запись, поиск, снимок"""
+    topics = [f"Topic {i}" for i in range(64)]
+    concepts = [f"Concept {i}" for i in range(1024)]
+    rng = random.Random(size)
+    rows = [(rng.choice(topics), rng.choice(concepts)) for _ in range(size)]
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    store = VurtixAI.KnowledgeStore(size)
+    for topic, concept in rows:
+        store.add(topic, concept, 0.0)
+    insert_time = time.perf_counter() - started
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    queries = [rng.choice(topics) for _ in range(lookups)]
+    started = time.perf_counter()
+    for topic in queries:
+        store.count(topic)
+        store.latest(topic)
+    lookup_time = time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "knowledge.bin")
+        started = time.perf_counter()
+        store.save(path)
+        save_time = time.perf_counter() - started
+        started = time.perf_counter()
+        VurtixAI.KnowledgeStore.load(path)
+        load_time = time.perf_counter() - started
+
+    return {
+        'entries': size,
+        'insert_us': insert_time / size * 1e6,
+        'bytes_per_entry': allocated / size,
+        'lookup_us': lookup_time / lookups * 1e6,
+        'save_ms': save_time * 1000,
+        'load_ms': load_time * 1000
+    }
+
+
+def run_knowledge(args):
+    """Масштабирование хранилища знаний"""
+    for size in (int(value) for value in args.sizes.split(",")):
+        result = bench_knowledge(size)
+        print(f"{result['entries']:>9} записей  вставка: {result['insert_us']:5.2f} мкс  "
+              f"память: {result['bytes_per_entry']:5.1f} Б/запись  "
+              f"поиск: {result['lookup_us']:5.2f} мкс  "
+              f"снимок: {result['save_ms']:6.1f} / {result['load_ms']:6.1f} мс")
+
+
+async def _http_post(reader, writer, host, body):
+    """POST /generate по открытому keep-alive соединению; возвращает код ответа"""
+    writer.write((f"POST /generate HTTP/1.1\r\nHost: {host}\r\n"
+                  f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+                  ).encode('latin-1') + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode('latin-1').partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def _load_client(host, port, deadline, deep_think_ratio, rng, latencies, statuses):
+    """Один клиент: запросы подряд по одному соединению"""
+    prompts = ["sort a list", "factorial", "calculator", "web scraping", "gui form", "hello world"]
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            body = json.dumps({
+                'prompt': f"{rng.choice(prompts)} {rng.randint(0, 50)}",
+                'deep_think': rng.random() < deep_think_ratio
+            }).encode('utf-8')
+            started = time.perf_counter()
+            status = await _http_post(reader, writer, host, body)
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies.append(time.perf_counter() - started)
+    finally:
+        writer.close()
+
+
+async def load_test(host, port, connections=32, duration=10.0, deep_think_ratio=0.0):
+    """Нагрузочный тест сервиса: запросов в секунду и перцентили задержки"""
+    latencies, statuses = [], {}
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(
+        _load_client(host, port, deadline, deep_think_ratio, random.Random(i), latencies, statuses)
+        for i in range(connections)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+
+    return {
+        'requests': sum(statuses.values()),
+        'ok_per_sec': len(latencies) / elapsed,
+        'statuses': statuses,
+        'p50_ms': percentile(0.5),
+        'p99_ms': percentile(0.99)
+    }
+
+
+def run_loadtest(args):
+    """Нагрузочный тест; без --url поднимается локальный сервис"""
+    server = None
+    if args.url:
+        address = args.url.split("://", 1)[-1].rstrip("/")
+        host, _, port = address.partition(":")
+        port = int(port or 80)
+    else:
+        import socket
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            host, port = probe.getsockname()
+        server = subprocess.Popen([sys.executable, APP, "--serve", "--port", str(port),
+                                   "--max-concurrency", str(args.max_concurrency)], cwd=HERE,
+                                  stdout=subprocess.DEVNULL)
+        for _ in range(100):
+            try:
+                socket.create_connection((host, port), timeout=0.1).close()
+                break
+            except OSError:
+                time.sleep(0.05)
+    try:
+        result = asyncio.run(load_test(host, port, args.connections, args.duration,
+                                       args.deep_think_ratio))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    print(f"соединений: {args.connections}  запросов: {result['requests']}  "
+          f"успешных/с: {result['ok_per_sec']:.0f}  p50: {result['p50_ms']:.1f} мс  "
+          f"p99: {result['p99_ms']:.1f} мс  коды: {result['statuses']}")
+
+
+BENCHMARKS = {}
+SUITE_PROMPTS = [
+    "напиши факториал числа", "simple calculator class", "сортировка списка",
+    "web scraping script", "gui for notes", "parse a csv file and plot it",
+    "калькулятор с интерфейсом который сортирует историю"
+]
+
+
+def benchmark(name, group="engine"):
+    """Регистрация бенчмарка: функция готовит данные и возвращает замеряемый вызов"""
+    def register(setup):
+        BENCHMARKS[name] = (group, setup)
+        return setup
+    return register
+
+
+def time_call(func, repeat=5, min_time=0.2):
+    """Время одного вызова: медиана и минимум по повторам, сек"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    samples = [total / number for total in timer.repeat(repeat, number)]
+    return {
+        'median_us': statistics.median(samples) * 1e6,
+        'min_us': min(samples) * 1e6,
+        'stdev_us': statistics.stdev(samples) * 1e6 if len(samples) > 1 else 0.0,
+        'number': number,
+        'repeat': repeat
+    }
+
+
+@benchmark("route_prompts")
+def _bench_route():
+    ai = VurtixAI.ChatGPTStyleAI()
+    return lambda: [ai._route(prompt) for prompt in SUITE_PROMPTS]
+
+
+@benchmark("route_5000_keywords")
+def _bench_route_large():
+    rng = random.Random(0)
+    letters = "abcdefghijklmnopqrstuvwxyzабвгдежзиклмнопрст"
+    keywords = {f"intent{i}": tuple("".join(rng.choices(letters, k=rng.randint(4, 10)))
+                                    for _ in range(5)) for i in range(1000)}
+    index = VurtixAI.IntentIndex(keywords)
+    prompt = " ".join(SUITE_PROMPTS) * 4
+    return lambda: index.rank(prompt)
+
+
+@benchmark("fuzzy_route_prompts")
+def _bench_fuzzy_route():
+    # Без кэша слов: замеряется сама векторная оценка
+    router = VurtixAI.FuzzyRouter(VurtixAI.ChatGPTStyleAI().template_descriptions, cache_size=0)
+    prompts = ["factoral of a number", "калькулятр", "sorted list of names", "scrapper for news",
+               "окошко с кнопкой", "hello world"]
+    return lambda: router.match_batch(prompts)
+
+
+@benchmark("fuzzy_route_10000x10000")
+def _bench_fuzzy_route_large():
+    rng = random.Random(0)
+    letters = "abcdefghijklmnopqrstuvwxyzабвгдежзиклмнопрст"
+    vocabulary = ["".join(rng.choices(letters, k=rng.randint(5, 10))) for _ in range(20_000)]
+    router = VurtixAI.FuzzyRouter({f"template{i}": rng.sample(vocabulary, 5) for i in range(10_000)},
+                                  cache_size=0)
+
+    def typo(word):
+        position = rng.randrange(1, len(word))
+        return word[:position] + word[position + 1:]
+    prompts = [f"напиши {typo(rng.choice(vocabulary))} пожалуйста" for _ in range(10_000)]
+    return lambda: router.match_batch(prompts)
+
+
+@benchmark("render_templates")
+def _bench_render():
+    ai = VurtixAI.ChatGPTStyleAI()
+    templates = list(ai.code_templates.values())
+    return lambda: [template() for template in templates]
+
+
+@benchmark("render_general_template")
+def _bench_general():
+    ai = VurtixAI.ChatGPTStyleAI()
+    prompt = "parse a csv file and plot it " * 4
+    return lambda: ai._general_template(prompt)
+
+
+@benchmark("generate_code")
+def _bench_generate():
+    ai = VurtixAI.ChatGPTStyleAI()
+    return lambda: [ai.generate_code(prompt) for prompt in SUITE_PROMPTS]
+
+
+@benchmark("generate_code_cached")
+def _bench_generate_cached():
+    ai = VurtixAI.ChatGPTStyleAI(cache=VurtixAI.ResponseCache())
+    for prompt in SUITE_PROMPTS:
+        ai.generate_code(prompt)
+    return lambda: [ai.generate_code(prompt) for prompt in SUITE_PROMPTS]
+
+
+@benchmark("compose_all_intents")
+def _bench_compose():
+    ai = VurtixAI.ChatGPTStyleAI()
+    prompt = "factorial calculator sort web gui"
+    return lambda: ai.plan_code(prompt, compose=True)
+
+
+@benchmark("knowledge_lookup")
+def _bench_knowledge_lookup():
+    store = VurtixAI.KnowledgeStore(100_000)
+    for i in range(100_000):
+        store.add(f"Topic {i % 64}", f"Concept {i % 1024}", float(i))
+    return lambda: [(store.count(f"Topic {i}"), store.latest(f"Topic {i}")) for i in range(64)]
+
+
+_TEMP_DIRS = []
+
+
+def _template_pack(size):
+    """Путь к набору из size шаблонов во временном каталоге (живет до конца прогона)"""
+    directory = tempfile.TemporaryDirectory()
+    _TEMP_DIRS.append(directory)
+    path = os.path.join(directory.name, "bench.vtp")
+    body = VurtixAI.ChatGPTStyleAI()._sorting_template()
+    VurtixAI.TemplatePack.build(path, [(f"template{i}", (f"kw{i}", f"topic{i % 500}", "common"), body)
+                                       for i in range(size)])
+    return path
+
+
+@benchmark("template_pack_open_50000")
+def _bench_pack_open():
+    path = _template_pack(50_000)
+    return lambda: VurtixAI.TemplatePack(path).close()
+
+
+@benchmark("template_pack_route_50000")
+def _bench_pack_route():
+    path = _template_pack(50_000)
+    ai = VurtixAI.ChatGPTStyleAI(packs=[VurtixAI.TemplatePack(path)])
+    prompts = [f"{prompt} kw{i * 7919 % 50_000}" for i, prompt in enumerate(SUITE_PROMPTS)]
+    return lambda: [ai.generate_code(prompt) for prompt in prompts]
+
+
+def _doc_corpus(files=200, sections=100):
+    """Markdown-документы со словами по закону Ципфа: (каталог, источники, словарь)"""
+    rng = random.Random(0)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    vocabulary = ["".join(rng.choices(letters, k=rng.randint(3, 10))) for _ in range(30_000)]
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    directory = tempfile.TemporaryDirectory()
+    _TEMP_DIRS.append(directory)
+    for index in range(files):
+        with open(os.path.join(directory.name, f"doc{index}.md"), 'w', encoding='utf-8') as f:
+            for section in range(sections):
+                f.write(f"## {' '.join(rng.choices(vocabulary, weights, k=3))}\n")
+                f.write(" ".join(rng.choices(vocabulary, weights, k=rng.randint(20, 120))) + "\n\n")
+    return directory.name, VurtixAI.doc_sources((directory.name,), modules=False), vocabulary
+
+
+@benchmark("docs_search_20000")
+def _bench_docs_search():
+    directory, sources, vocabulary = _doc_corpus()
+    path = os.path.join(directory, "docs.vdi")
+    VurtixAI.DocIndex.update(path, sources)
+    index = VurtixAI.DocIndex(path)
+    # Частые, средние и редкие слова; последнее - префикс
+    queries = [" ".join(vocabulary[:3]), " ".join(vocabulary[100:103]),
+               " ".join(vocabulary[5000:5002]), vocabulary[20_000][:3]]
+    return lambda: [index.search(query) for query in queries]
+
+
+@benchmark("docs_update_unchanged_20000")
+def _bench_docs_update():
+    directory, sources, _ = _doc_corpus()
+    path = os.path.join(directory, "docs.vdi")
+    VurtixAI.DocIndex.update(path, sources)
+    return lambda: VurtixAI.DocIndex.update(path, sources)
+
+
+@benchmark("typewriter_stream_100kb", group="tk")
+def _bench_typewriter():
+    root = _tk_root()
+    widget = VurtixAI.tk.Text(root)
+    widget.pack()
+    typewriter = VurtixAI.TypeWriter(widget, frame_budget=0.001, max_duration=0.05)
+    text = VurtixAI.ChatGPTStyleAI()._sorting_template()
+    payload = (text * (100_000 // len(text) + 1))[:100_000]
+
+    def run():
+        typewriter.start_stream(0.001)
+        for start in range(0, len(payload), 4096):
+            typewriter.feed(payload[start:start + 4096])
+        typewriter.end_stream()
+        while typewriter.is_typing:
+            root.update()
+    return run
+
+
+def _code_payload(size):
+    text = VurtixAI.ChatGPTStyleAI()._sorting_template()
+    return (text * (size // len(text) + 1))[:size]
+
+
+@benchmark("textbuffer_window_50mb")
+def _bench_textbuffer():
+    buffer = VurtixAI.TextBuffer()
+    payload = _code_payload(1_000_000)
+    for _ in range(50):
+        buffer.append(payload)
+    rng = random.Random(0)
+    tops = [rng.randrange(buffer.line_count - 500) for _ in range(100)]
+    return lambda: [buffer.lines(top, top + 500) for top in tops]
+
+
+@benchmark("highlight_lex_100kb")
+def _bench_highlight_lex():
+    lexer = VurtixAI.PythonLexer()
+    lines = _code_payload(100_000).split("\n")
+
+    def run():
+        state = 0
+        for line in lines:
+            state = lexer.tokenize(line, state)[1]
+    return run
+
+
+@benchmark("highlight_scan_1mb")
+def _bench_highlight_scan():
+    lexer = VurtixAI.PythonLexer()
+    lines = _code_payload(1_000_000).split("\n")
+
+    def run():
+        state = 0
+        for line in lines:
+            state = lexer.scan(line, state)
+    return run
+
+
+def _bench_codeview_scroll(size):
+    root = _tk_root()
+    view = VurtixAI.CodeView(root, height=40)
+    view.pack()
+    payload = _code_payload(min(size, 1_000_000))
+    for _ in range(max(1, size // len(payload))):
+        view.insert(VurtixAI.tk.END, payload)
+    root.update()
+    rng = random.Random(0)
+    tops = [rng.randrange(view.line_count) for _ in range(20)]
+
+    def run():
+        # Прыжки по всему буферу и прокрутка колесом в пределах окна
+        for top in tops:
+            view.scroll_to(top)
+            for _ in range(5):
+                view.yview(VurtixAI.tk.SCROLL, 3, VurtixAI.tk.UNITS)
+            root.update_idletasks()
+    return run
+
+
+@benchmark("codeview_scroll_1kb", group="tk")
+def _bench_codeview_small():
+    return _bench_codeview_scroll(1_000)
+
+
+@benchmark("codeview_scroll_50mb", group="tk")
+def _bench_codeview_large():
+    return _bench_codeview_scroll(50_000_000)
+
+
+@benchmark("smoothbutton_hover_frame", group="tk")
+def _bench_button_frame():
+    root = _tk_root()
+    button = VurtixAI.SmoothButton(root, text="Кнопка", fg_color="#10a37f", hover_color="#0d8a72")
+    button.pack()
+    root.update()
+    colors = VurtixAI.color_ramp("#10a37f", "#0d8a72") + VurtixAI.color_ramp("#0d8a72", "#10a37f")
+
+    def run():
+        for color in colors:
+            button.draw_button(color)
+        root.update_idletasks()
+    return run
+
+
+@benchmark("smoothbutton_hover_storm", group="tk")
+def _bench_button_storm():
+    root = _tk_root()
+    buttons = [VurtixAI.SmoothButton(root, text=f"Кнопка {i}") for i in range(8)]
+    for button in buttons:
+        button.pack()
+    root.update()
+
+    def run():
+        # Быстрое движение курсора: вход/выход на каждой кнопке, затем кадры таймера
+        for button in buttons:
+            button.on_enter(None)
+            button.on_leave(None)
+        clock = buttons[0].clock
+        while clock.pending:
+            root.after_cancel(clock._after_id)
+            clock._tick()
+    return run
+
+
+_TK_ROOT = None
+
+
+def _tk_root():
+    global _TK_ROOT
+    if _TK_ROOT is None:
+        _TK_ROOT = VurtixAI.tk.Tk()
+        _TK_ROOT.withdraw()
+    return _TK_ROOT
+
+
+def ensure_display():
+    """Дисплей для Tk: существующий DISPLAY или виртуальный Xvfb; None - недоступно"""
+    if os.environ.get("DISPLAY") or not sys.platform.startswith("linux"):
+        return True
+    xvfb = shutil.which("Xvfb")
+    if xvfb is None:
+        return None
+    for number in range(99, 120):
+        if os.path.exists(f"/tmp/.X{number}-lock"):
+            continue
+        process = subprocess.Popen([xvfb, f":{number}", "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for _ in range(50):
+            if os.path.exists(f"/tmp/.X11-unix/X{number}"):
+                os.environ["DISPLAY"] = f":{number}"
+                return process
+            if process.poll() is not None:
+                break
+            time.sleep(0.1)
+        process.kill()
+    return None
+
+
+def run_suite_benchmarks(group="all", names=None, repeat=5):
+    """Запуск набора; результаты в машиночитаемом виде"""
+    selected = {name: entry for name, entry in BENCHMARKS.items()
+                if (group == "all" or entry[0] == group) and (not names or name in names)}
+    display = None
+    if any(entry[0] == "tk" for entry in selected.values()):
+        display = ensure_display()
+
+    results, skipped = {}, {}
+    try:
+        for name, (bench_group, setup) in selected.items():
+            if bench_group == "tk" and display is None:
+                skipped[name] = "нет дисплея и Xvfb"
+                continue
+            results[name] = dict(time_call(setup(), repeat), group=bench_group)
+    finally:
+        if _TK_ROOT is not None:
+            _TK_ROOT.destroy()
+        if display not in (None, True):
+            display.terminate()
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S")
+        },
+        'results': results,
+        'skipped': skipped
+    }
+
+
+def compare_to_baseline(report, baseline, threshold):
+    """Сравнение медиан с базовыми: список (имя, изменение) и регрессии"""
+    rows, regressions = [], []
+    for name, result in report['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            rows.append((name, None))
+            continue
+        change = result['median_us'] / base['median_us'] - 1
+        rows.append((name, change))
+        if change > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def load_baseline(path):
+    """Базовые результаты из JSON; нечитаемый файл - выход с ошибкой"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            baseline = json.load(f)
+    except (OSError, ValueError) as e:
+        sys.exit(f"Не удалось прочитать базовые результаты {path}: {e}")
+    if not isinstance(baseline, dict) or not isinstance(baseline.get('results'), dict):
+        sys.exit(f"Не удалось прочитать базовые результаты {path}: нет раздела results")
+    return baseline
+
+
+def run_suite(args):
+    """Набор бенчмарков с сохранением и сравнением результатов"""
+    names = set(args.only.split(",")) if args.only else None
+    # Базовый файл проверяется до прогона: опечатка в пути не должна выключать сравнение
+    baseline = load_baseline(args.baseline) if args.baseline else None
+    report = run_suite_benchmarks(args.group, names, args.repeat)
+
+    changes = {}
+    regressions = []
+    if baseline is not None:
+        rows, regressions = compare_to_baseline(report, baseline, args.threshold)
+        changes = dict(rows)
+    report['threshold'] = args.threshold
+    report['regressions'] = regressions
+
+    for name, result in report['results'].items():
+        change = changes.get(name)
+        mark = "" if change is None else f"{change * 100:+6.1f}%"
+        if name in regressions:
+            mark += "  ⚠ регрессия"
+        print(f"{name:<28} {result['median_us']:12.2f} мкс  (мин {result['min_us']:.2f})  {mark}")
+    for name, reason in report['skipped'].items():
+        print(f"{name:<28} пропущен: {reason}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if regressions:
+        sys.exit(f"Регрессии выше порога {args.threshold:.0%}: {', '.join(regressions)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки Vurtix AI")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    suite = commands.add_parser("suite", help="микробенчмарки движка и виджетов Tk")
+    suite.add_argument("--group", choices=("engine", "tk", "all"), default="all")
+    suite.add_argument("--only", help="имена бенчмарков через запятую")
+    suite.add_argument("--repeat", type=int, default=5)
+    suite.add_argument("--output", help="JSON с результатами")
+    suite.add_argument("--baseline", help="JSON базовых результатов для сравнения")
+    suite.add_argument("--save-baseline", help="сохранить результаты как базовые")
+    suite.add_argument("--threshold", type=float, default=0.10,
+                       help="допустимое замедление медианы (0.10 = 10%%)")
+    suite.set_defaults(handler=run_suite)
+
+    startup = commands.add_parser("startup", help="время запуска приложения")
+    startup.add_argument("--runs", type=int, default=5)
+    startup.set_defaults(handler=run_startup)
+
+    knowledge = commands.add_parser("knowledge", help="хранилище знаний обучения")
+    knowledge.add_argument("--sizes", default="1000,100000,1000000")
+    knowledge.set_defaults(handler=run_knowledge)
+
+    loadtest = commands.add_parser("loadtest", help="нагрузка на HTTP-сервис генерации")
+    loadtest.add_argument("--url", help="адрес работающего сервиса (по умолчанию - запустить свой)")
+    loadtest.add_argument("--connections", type=int, default=32)
+    loadtest.add_argument("--duration", type=float, default=10.0)
+    loadtest.add_argument("--deep-think-ratio", type=float, default=0.1,
+                          help="доля запросов DeepThink")
+    loadtest.add_argument("--max-concurrency", type=int, default=64,
+                          help="предел сервиса, запущенного тестом")
+    loadtest.set_defaults(handler=run_loadtest)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()